@@ -0,0 +1,18 @@
+"""
+回測套件
+
+- data        歷史 K 線 / 資金費率 (npz 區間快取)、信號與交易紀錄
+- strategies  各研究的 Strategy 外掛 (ADX / tail / 資金費率 / 信號結果 / OB)
+- runner      依幣種分片的 ProcessPoolExecutor 執行器，結果依原順序合併
+- sweep       參數掃描 (K 線放 shared memory、多 process、checkpoint 續跑、排名表)
+
+各 backtest_*.py 腳本用 run(Strategy(...)) 取得逐筆結果，統計報表留在腳本裡
+"""
+from backtest.data import (
+    load_klines, load_funding, load_signals, load_closed_trades, to_klines, klines_asof, funding_at
+)
+from backtest.strategies import (
+    Strategy, AdxStudy, TailStudy, FundingStudy, SignalOutcomeStudy, ObStudy, estimate_entry_ts
+)
+from backtest.runner import run
+from backtest.sweep import combos, SharedFrames   # sweep() 用 from backtest.sweep import sweep (同名不覆蓋子模組)
@@ -2,10 +2,15 @@
 回測 monitor.py 的 OB 進場信號準確度
 用歷史 K 線找 OB → 模擬進場 → 看後續是否達到 TP1/TP2/TP3 或 SL
 """
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 import requests
 import numpy as np
 from datetime import datetime, timezone, timedelta
 from collections import defaultdict
+from ob_engine import find_swing_points
+from indicators import rsi as calc_rsi_value
 
 def get_klines(symbol, interval, limit):
     try:
@@ -21,15 +26,7 @@ def get_klines(symbol, interval, limit):
 def calculate_rsi(klines, period=14):
     if len(klines) < period + 1:
         return 50
-    closes = [k["close"] for k in klines]
-    gains, losses = [], []
-    for i in range(len(closes)-period, len(closes)):
-        diff = closes[i] - closes[i-1]
-        gains.append(diff if diff > 0 else 0)
-        losses.append(-diff if diff < 0 else 0)
-    avg_gain = sum(gains) / len(gains)
-    avg_loss = sum(losses) / len(losses) if sum(losses) > 0 else 0.001
-    return 100 - (100 / (1 + avg_gain / avg_loss))
+    return calc_rsi_value([k["close"] for k in klines], period, method="sma_last", zero_loss="floor")
 
 def find_order_blocks(klines, swing_length=3):
     if len(klines) < swing_length * 2 + 5:
@@ -37,14 +34,13 @@ def find_order_blocks(klines, swing_length=3):
     obs = []
     avg_vol = np.mean([k["volume"] for k in klines[-50:]]) if len(klines) >= 50 else np.mean([k["volume"] for k in klines])
     
-    for i in range(swing_length, len(klines) - swing_length - 1):
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        
-        is_swing_high = all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
-                        all(highs[i] > highs[i+j] for j in range(1, swing_length+1))
-        is_swing_low = all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
-                       all(lows[i] < lows[i+j] for j in range(1, swing_length+1))
+    swing_highs, swing_lows = find_swing_points(
+        [k["high"] for k in klines], [k["low"] for k in klines], swing_length)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
+    
+    for i in sorted(swing_highs | swing_lows):
+        is_swing_high = i in swing_highs
+        is_swing_low = i in swing_lows
         
         vol_ratio = klines[i]["volume"] / avg_vol if avg_vol > 0 else 1
         rsi_at_ob = calculate_rsi(klines[:i+1])
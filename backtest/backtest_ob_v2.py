@@ -14,23 +14,14 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 import numpy as np
 from collections import defaultdict
-from exchange_api import get_klines
+from ob_engine import find_swing_points, suffix_count_ge
+from indicators import rsi as calc_rsi_value
 
 # ─── RSI ───
 def calc_rsi(closes, period=14):
     if len(closes) < period + 1:
         return 50
-    deltas = np.diff(closes)
-    gains = np.where(deltas > 0, deltas, 0)
-    losses = np.where(deltas < 0, -deltas, 0)
-    avg_g = np.mean(gains[:period])
-    avg_l = np.mean(losses[:period])
-    for i in range(period, len(gains)):
-        avg_g = (avg_g * (period - 1) + gains[i]) / period
-        avg_l = (avg_l * (period - 1) + losses[i]) / period
-    if avg_l == 0:
-        return 100
-    return 100 - (100 / (1 + avg_g / avg_l))
+    return calc_rsi_value(closes, period, method="wilder", zero_loss="max")
 
 # ─── V1: 現有 OB 偵測 (原版) ───
 def find_obs_v1(klines, swing_length=3):
@@ -39,14 +30,13 @@ def find_obs_v1(klines, swing_length=3):
     obs = []
     avg_vol = np.mean([k["volume"] for k in klines[-50:]]) if len(klines) >= 50 else np.mean([k["volume"] for k in klines])
     
-    for i in range(swing_length, len(klines) - swing_length - 1):
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        
-        is_swing_high = all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
-                        all(highs[i] > highs[i+j] for j in range(1, swing_length+1))
-        is_swing_low = all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
-                       all(lows[i] < lows[i+j] for j in range(1, swing_length+1))
+    swing_highs, swing_lows = find_swing_points(
+        [k["high"] for k in klines], [k["low"] for k in klines], swing_length)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
+    
+    for i in sorted(swing_highs | swing_lows):
+        is_swing_high = i in swing_highs
+        is_swing_low = i in swing_lows
         
         vol_ratio = klines[i]["volume"] / avg_vol if avg_vol > 0 else 1
         
@@ -82,14 +72,22 @@ def find_obs_v2(klines, swing_length=3):
     obs = []
     avg_vol = np.mean([k["volume"] for k in klines[-50:]]) if len(klines) >= 50 else np.mean([k["volume"] for k in klines])
     
-    for i in range(swing_length, len(klines) - swing_length - 1):
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        
-        is_swing_high = all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
-                        all(highs[i] > highs[i+j] for j in range(1, swing_length+1))
-        is_swing_low = all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
-                       all(lows[i] < lows[i+j] for j in range(1, swing_length+1))
+    highs = np.array([k["high"] for k in klines], dtype=float)
+    lows = np.array([k["low"] for k in klines], dtype=float)
+    closes = np.array([k["close"] for k in klines], dtype=float)
+    # 後綴極值: 之後任一收盤穿破 ⇔ 後綴最高/最低收盤穿破
+    suffix_max = np.maximum.accumulate(closes[::-1])[::-1]
+    suffix_min = np.minimum.accumulate(closes[::-1])[::-1]
+    
+    swing_highs, swing_lows = find_swing_points(highs, lows, swing_length)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
+    
+    # 候選 OB 先收集，測試次數批次計算後再過濾 (保持原本順序)
+    candidates, bear_q, bull_q = [], [], []
+    
+    for i in sorted(swing_highs | swing_lows):
+        is_swing_high = i in swing_highs
+        is_swing_low = i in swing_lows
         
         vol_ratio = klines[i]["volume"] / avg_vol if avg_vol > 0 else 1
         
@@ -100,22 +98,15 @@ def find_obs_v2(klines, swing_length=3):
                     ob_bottom = klines[i-j]["low"]
                     
                     # ✅ 失效檢查: 後續收盤價突破 OB top = 失效
-                    invalidated = False
-                    test_count = 0
-                    for k in range(i+1, len(klines)):
-                        if klines[k]["close"] > ob_top:
-                            invalidated = True
-                            break
-                        # 測試次數: 價格觸及但未穿破
-                        if klines[k]["high"] >= ob_bottom:
-                            test_count += 1
-                    
-                    if not invalidated and test_count <= 3:
-                        obs.append({
+                    if suffix_max[i+1] <= ob_top:
+                        ob = {
                             "type": "bearish", "top": ob_top, "bottom": ob_bottom,
-                            "vol_ratio": vol_ratio, "index": i, "tests": test_count,
+                            "vol_ratio": vol_ratio, "index": i, "tests": 0,
                             "age": len(klines) - 1 - i
-                        })
+                        }
+                        candidates.append(ob)
+                        # 測試次數: 價格觸及但未穿破
+                        bear_q.append((ob, i + 1, ob_bottom))
                     break
         
         if is_swing_low and vol_ratio > 0.5:
@@ -125,24 +116,161 @@ def find_obs_v2(klines, swing_length=3):
                     ob_bottom = klines[i-j]["low"]
                     
                     # ✅ 失效檢查: 後續收盤價跌破 OB bottom = 失效
-                    invalidated = False
-                    test_count = 0
-                    for k in range(i+1, len(klines)):
-                        if klines[k]["close"] < ob_bottom:
-                            invalidated = True
-                            break
-                        if klines[k]["low"] <= ob_top:
-                            test_count += 1
-                    
-                    if not invalidated and test_count <= 3:
-                        obs.append({
+                    if suffix_min[i+1] >= ob_bottom:
+                        ob = {
                             "type": "bullish", "top": ob_top, "bottom": ob_bottom,
-                            "vol_ratio": vol_ratio, "index": i, "tests": test_count,
+                            "vol_ratio": vol_ratio, "index": i, "tests": 0,
                             "age": len(klines) - 1 - i
-                        })
+                        }
+                        candidates.append(ob)
+                        bull_q.append((ob, i + 1, -ob_top))
+                    break
+    
+    for values, pending in ((highs, bear_q), (-lows, bull_q)):
+        if pending:
+            counts = suffix_count_ge(values, [p[1] for p in pending], [p[2] for p in pending])
+            for (ob, _, _), c in zip(pending, counts):
+                ob["tests"] = c
+    
+    obs = [ob for ob in candidates if ob["tests"] <= 3]
+    return obs
+
+# ─── As-of 單次掃描 (回測用) ───
+def _first_above(values, starts, thresholds):
+    """
+    每個查詢 q: 第一個 k >= starts[q] 且 values[k] > thresholds[q]，沒有則 len(values)
+    range-max sparse table + 二進位跳躍，全部查詢一起向量化
+    """
+    n = len(values)
+    k = np.asarray(starts, dtype=np.intp)
+    th = np.asarray(thresholds, dtype=float)
+    table = [values]                                  # table[j][x] = max(values[x:x+2^j])
+    while (1 << len(table)) <= n:
+        prev, half = table[-1], 1 << (len(table) - 1)
+        table.append(np.maximum(prev[:-half], prev[half:]))
+    for j in range(len(table) - 1, -1, -1):
+        size = 1 << j
+        ok = k + size <= n
+        block_max = table[j][np.minimum(k, len(table[j]) - 1)]
+        k = np.where(ok & (block_max <= th), k + size, k)
+    return k
+
+
+OHLCV = ("open", "high", "low", "close", "volume")
+
+
+def _ohlcv(klines):
+    """K 線 dict list 或 frame (backtest.data 的 numpy 欄位) → {欄位: float ndarray}；frame 不複製"""
+    if isinstance(klines, dict):
+        return {c: np.asarray(klines[c], dtype=float) for c in OHLCV}
+    return {c: np.array([k[c] for k in klines], dtype=float) for c in OHLCV}
+
+
+def iter_obs_asof(klines, version="v1", swing_length=3, start=0, stop=None):
+    """
+    單次掃描版 find_obs_v1 / find_obs_v2：對每個 t in [start, stop) yield (t, cols)，
+    cols 就是 find_obs_{version}(klines[:t+1]) 的結果 (同順序、同數值，不偷看 t 之後)
+    klines 可以是 dict list 或 frame (直接用欄位，不轉 dict)
+
+    - swing 只看左右各 swing_length 根 → 整段算一次，i <= t - swing_length - 1 才算數
+    - avg_vol / vol_ratio 每個 t 重算 (跟窗口版一樣是最後 50 根)
+    - v2 失效 / 第 4 次測試的時間點事先算好，之後的 t 永久剔除
+    cols: numpy 欄位 {"bullish", "top", "bottom", "vol_ratio", "index" (+ v2: "tests", "age")}，
+    要 dict list 用 obs_to_dicts(cols)
+    """
+    data = _ohlcv(klines)
+    opens, highs, lows, closes, vols = (data[c] for c in OHLCV)
+    n = len(closes)
+    stop = n if stop is None else min(stop, n)
+    sl = swing_length
+
+    # 候選 OB: 依 (swing index, bearish 先) 排序，同窗口版的 append 順序
+    swing_highs, swing_lows = find_swing_points(highs, lows, sl)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
+    e_idx, e_bull, e_top, e_bottom = [], [], [], []
+    for i in sorted(swing_highs | swing_lows):
+        for bull, is_swing in ((False, i in swing_highs), (True, i in swing_lows)):
+            if not is_swing:
+                continue
+            for j in range(1, min(5, i+1)):
+                if (closes[i-j] < opens[i-j]) if bull else (closes[i-j] > opens[i-j]):
+                    e_idx.append(i)
+                    e_bull.append(bull)
+                    e_top.append(highs[i-j])
+                    e_bottom.append(lows[i-j])
                     break
+    e_idx = np.array(e_idx, dtype=np.intp)
+    e_bull = np.array(e_bull, dtype=bool)
+    e_top = np.array(e_top, dtype=float)
+    e_bottom = np.array(e_bottom, dtype=float)
+
+    v2 = version != "v1"
+    if v2:
+        # 失效 (bearish 收盤 > top / bullish 收盤 < bottom) 與前 4 次測試
+        # (bearish high >= bottom / bullish low <= top) 的位置；t >= expire 之後永久不出現
+        dead = np.empty(len(e_idx), dtype=np.intp)
+        touches = [np.empty(len(e_idx), dtype=np.intp) for _ in range(4)]
+        for mask, close_vals, touch_vals, dead_th, touch_th in (
+                (~e_bull, closes, highs, e_top, e_bottom),
+                (e_bull, -closes, -lows, -e_bottom, -e_top)):
+            k = e_idx[mask] + 1
+            dead[mask] = _first_above(close_vals, k, dead_th[mask])
+            ge_th = np.nextafter(touch_th[mask], -np.inf)   # x >= th ⇔ x > th 的前一個浮點數
+            for m in range(4):
+                k = _first_above(touch_vals, k, ge_th)
+                touches[m][mask] = k
+                k = k + 1
+        expire = np.minimum(dead, touches[3])
+
+    live = np.empty(0, dtype=np.intp)
+    activated = 0
+    for t in range(start, stop):
+        prev = activated
+        if t + 1 >= sl * 2 + 5:
+            while activated < len(e_idx) and e_idx[activated] <= t - sl - 1:
+                activated += 1
+        if v2:
+            live = np.concatenate([live, np.arange(prev, activated, dtype=np.intp)])
+            live = live[expire[live] > t]
+            rows = live
+        else:
+            rows = np.arange(activated, dtype=np.intp)
+        if len(rows):
+            avg_vol = np.mean(vols[max(0, t - 49):t + 1])
+            vol_ratio = vols[e_idx[rows]] / avg_vol if avg_vol > 0 else np.ones(len(rows))
+            keep = vol_ratio > 0.5
+            rows, vol_ratio = rows[keep], vol_ratio[keep]
+        else:
+            vol_ratio = np.empty(0)
+        cols = {"bullish": e_bull[rows], "top": e_top[rows], "bottom": e_bottom[rows],
+                "vol_ratio": vol_ratio, "index": e_idx[rows]}
+        if v2:
+            cols["tests"] = sum((touches[m][rows] <= t).astype(np.intp) for m in range(3))
+            cols["age"] = t - cols["index"]
+        yield t, cols
+
+
+def obs_to_dicts(cols, rows=None):
+    """iter_obs_asof 的欄位 → find_obs_v1 / v2 格式的 dict list (rows: 只轉部分列)"""
+    rows = range(len(cols["index"])) if rows is None else rows
+    extra = [k for k in ("tests", "age") if k in cols]
+    obs = []
+    for r in rows:
+        ob = {"type": "bullish" if cols["bullish"][r] else "bearish",
+              "top": float(cols["top"][r]), "bottom": float(cols["bottom"][r]),
+              "vol_ratio": cols["vol_ratio"][r], "index": int(cols["index"][r])}
+        for k in extra:
+            ob[k] = int(cols[k][r])
+        obs.append(ob)
     return obs
 
+
+def _near_obs(cols, price, max_distance_pct):
+    """只轉出距離在 (0, max_distance_pct) 的 OB (其他在 backtest_version 也會被濾掉)"""
+    mid = (cols["top"] + cols["bottom"]) / 2
+    distance = np.where(cols["bullish"], (price - mid) / price * 100, (mid - price) / price * 100)
+    return obs_to_dicts(cols, np.flatnonzero((distance > 0) & (distance < max_distance_pct)))
+
 # ─── V2 品質評分 ───
 TF_WEIGHT = {"4H": 70, "1H": 55, "15M": 40}
 
@@ -163,28 +291,37 @@ def score_ob_v2(ob, tf):
     return max(0, base)
 
 # ─── 回測引擎 ───
-def backtest_version(klines_dict, version="v1", max_distance_pct=3.0):
+def backtest_version(klines_dict, version="v1", max_distance_pct=3.0, asof=True,
+                     swing_length=3, sl_buffer=0.3, tp1_rr=1.5, tp2_rr=2.5):
     """
     用滑動窗口模擬即時信號產生 + 追蹤結果
-    klines_dict: {"15M": [...], "1H": [...], "4H": [...]}
+    klines_dict: {"15M": [...], "1H": [...], "4H": [...]}，值可以是 dict list 或 frame
+    asof: True = iter_obs_asof 單次掃描 (結果同窗口版)；False = 每個 tick 重跑 find_obs_*(window)
+    sl_buffer / tp1_rr / tp2_rr: SL = OB 邊界外 OB 高度 × sl_buffer，TP = 風險 × rr (參數掃描用)
     """
     # 用 1H K線作為主時間軸 tick
     klines_1h = klines_dict.get("1H", [])
-    if len(klines_1h) < 50:
+    data = _ohlcv(klines_1h)
+    n = len(data["close"])
+    if n < 50:
         return []
+    closes, highs, lows = (data[c].tolist() for c in ("close", "high", "low"))
     
     trades = []
     cooldown = {}  # v2 冷卻追蹤: key=(type, round(mid)) -> last_trigger_idx
     
-    for tick in range(60, len(klines_1h) - 6):  # 留 6 根做 outcome
-        price = klines_1h[tick]["close"]
-        window = klines_1h[:tick+1]
-        
-        # 找 OB
-        if version == "v1":
-            obs = find_obs_v1(window, swing_length=3)
-        else:
-            obs = find_obs_v2(window, swing_length=3)
+    # 找 OB (留 6 根做 outcome)
+    if asof:
+        ticks = ((tick, _near_obs(cols, closes[tick], max_distance_pct))
+                 for tick, cols in iter_obs_asof(data, version, swing_length, start=60, stop=n - 6))
+    else:
+        find_obs = find_obs_v1 if version == "v1" else find_obs_v2
+        if isinstance(klines_1h, dict):
+            klines_1h = [dict(zip(OHLCV, row)) for row in zip(*(data[c].tolist() for c in OHLCV))]
+        ticks = ((tick, find_obs(klines_1h[:tick+1], swing_length=swing_length)) for tick in range(60, n - 6))
+    
+    for tick, obs in ticks:
+        price = closes[tick]
         
         if not obs:
             continue
@@ -253,29 +390,29 @@ def backtest_version(klines_dict, version="v1", max_distance_pct=3.0):
             ob_range = ob["top"] - ob["bottom"]
             
             if sig["dir"] == "LONG":
-                sl = ob["bottom"] - ob_range * 0.3
-                tp1 = entry + (entry - sl) * 1.5
-                tp2 = entry + (entry - sl) * 2.5
+                sl = ob["bottom"] - ob_range * sl_buffer
+                tp1 = entry + (entry - sl) * tp1_rr
+                tp2 = entry + (entry - sl) * tp2_rr
             else:
-                sl = ob["top"] + ob_range * 0.3
-                tp1 = entry - (sl - entry) * 1.5
-                tp2 = entry - (sl - entry) * 2.5
+                sl = ob["top"] + ob_range * sl_buffer
+                tp1 = entry - (sl - entry) * tp1_rr
+                tp2 = entry - (sl - entry) * tp2_rr
             
             # 追蹤未來 6 根 1H
             outcomes = {}
             hit_sl = False
             hit_tp1 = False
-            for h in range(1, min(7, len(klines_1h) - tick)):
-                future = klines_1h[tick + h]
-                pnl_pct = ((future["close"] - entry) / entry * 100) if sig["dir"] == "LONG" else ((entry - future["close"]) / entry * 100)
+            for h in range(1, min(7, n - tick)):
+                close, high, low = closes[tick + h], highs[tick + h], lows[tick + h]
+                pnl_pct = ((close - entry) / entry * 100) if sig["dir"] == "LONG" else ((entry - close) / entry * 100)
                 outcomes[f"{h}h"] = round(pnl_pct, 3)
                 
                 if sig["dir"] == "LONG":
-                    if future["low"] <= sl: hit_sl = True
-                    if future["high"] >= tp1: hit_tp1 = True
+                    if low <= sl: hit_sl = True
+                    if high >= tp1: hit_tp1 = True
                 else:
-                    if future["high"] >= sl: hit_sl = True
-                    if future["low"] <= tp1: hit_tp1 = True
+                    if high >= sl: hit_sl = True
+                    if low <= tp1: hit_tp1 = True
             
             trades.append({
                 "tick": tick,
@@ -330,25 +467,25 @@ def print_stats(trades, label):
         print(f"  {label2} 2h: {wins_2h}/{total_2h} = {wins_2h/total_2h*100:.1f}% | avg {avg_2h:+.2f}%")
 
 def main():
-    for symbol in ["BTC", "ETH"]:
-        print(f"\n🔍 拉取 {symbol} K 線數據...")
-        
-        klines_1h = get_klines(f"{symbol}USDT", "1h", 500)
-        
-        if not klines_1h:
-            print(f"  ❌ 無法取得 {symbol} K 線")
+    from backtest import run, ObStudy
+    
+    symbols = ["BTC", "ETH"]
+    print(f"\n🔍 拉取 {', '.join(symbols)} K 線數據並回測 (依幣種平行)...")
+    results = run(ObStudy(symbols, bars=500))
+    
+    for symbol, result in zip(symbols, results):
+        if not result or not result["bars"]:
+            print(f"\n  ❌ 無法取得 {symbol} K 線")
             continue
         
-        print(f"  ✅ 1H: {len(klines_1h)} 根")
-        
-        klines_dict = {"1H": klines_1h}
+        print(f"\n  ✅ {symbol} 1H: {result['bars']} 根")
         
         # V1 回測
-        trades_v1 = backtest_version(klines_dict, version="v1")
+        trades_v1 = result["v1"]
         print_stats(trades_v1, f"{symbol} V1 (現有)")
         
         # V2 回測
-        trades_v2 = backtest_version(klines_dict, version="v2")
+        trades_v2 = result["v2"]
         print_stats(trades_v2, f"{symbol} V2 (優化)")
         
         # 對比
@@ -0,0 +1,175 @@
+"""
+回測資料層 — 歷史 K 線 / 資金費率 / 信號與交易紀錄
+
+- K 線、資金費率用 exchange_api 的分頁 API 抓，存成 BACKTEST_CACHE_DIR/{種類}/{幣}_{週期}.npz
+- 快取記錄已涵蓋的區間，之後只補抓前後缺的部分 (只存已收盤的 K 線)；
+  分頁中途失敗時涵蓋範圍只算到實際拿到的最後一筆，下次從那裡接著補
+- 回傳 dict of numpy 欄位 (frame)，需要 dict list 時用 to_klines()
+"""
+import json
+import os
+import time
+
+import numpy as np
+
+from config import BACKTEST_CACHE_DIR, OI_SIGNAL_LOG
+from exchange_api import (
+    get_klines_range, get_funding_rate_history, interval_to_ms, candle_open_time, IncompleteRange
+)
+from paper_store import load_paper_state
+
+KLINE_COLUMNS = ("open_time", "open", "high", "low", "close", "volume")
+FUNDING_COLUMNS = ("time", "rate")
+
+
+def _cache_path(kind, symbol, interval=""):
+    name = f"{symbol}_{interval}.npz" if interval else f"{symbol}.npz"
+    return os.path.join(BACKTEST_CACHE_DIR, kind, name)
+
+
+def _read(path, columns):
+    try:
+        with np.load(path) as z:
+            frame = {c: z[c] for c in columns}
+            return frame, int(z["covered_start"]), int(z["covered_end"])
+    except:
+        return None, None, None
+
+
+def _write(path, frame, covered_start, covered_end):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = path + ".tmp.npz"
+    np.savez(tmp, covered_start=covered_start, covered_end=covered_end, **frame)
+    os.replace(tmp, path)
+
+
+def _to_frame(rows, columns):
+    return {c: np.array([r[c] for r in rows], dtype=np.int64 if c in ("open_time", "time") else float)
+            for c in columns}
+
+
+def _merge(a, b, key):
+    """依 key 合併兩個 frame (重複時間以 b 為準)"""
+    if a is None or len(a[key]) == 0:
+        return b
+    if len(b[key]) == 0:
+        return a
+    keys = np.concatenate([b[key], a[key]])
+    _, idx = np.unique(keys, return_index=True)  # 已排序，重複取第一個 (= b)
+    return {c: np.concatenate([b[c], a[c]])[idx] for c in a}
+
+
+def _slice(frame, key, start_ms, end_ms):
+    t = frame[key]
+    lo, hi = np.searchsorted(t, start_ms, side="left"), np.searchsorted(t, end_ms, side="right")
+    return {c: v[lo:hi] for c, v in frame.items()}
+
+
+def _fetch(fetch, start_ms, end_ms, key):
+    """
+    fetch(start, end, strict=True) → (rows, 實際涵蓋到的時間)
+    完整抓完 = end_ms；分頁中途失敗 = 最後一筆的時間 (一筆都沒有 = start_ms - 1)
+    """
+    try:
+        return fetch(start_ms, end_ms, strict=True), end_ms
+    except IncompleteRange as e:
+        return e.rows, (e.rows[-1][key] if e.rows else start_ms - 1)
+
+
+def _load(kind, symbol, interval, columns, key, start_ms, end_ms, fetch, closed_end):
+    """
+    通用的區間快取：缺的前段 / 後段用 fetch(start, end, strict) 補
+    closed_end: 可以寫進快取的最後時間 (未收盤的不存)
+    """
+    path = _cache_path(kind, symbol, interval)
+    frame, covered_start, covered_end = _read(path, columns)
+    end_ms = min(end_ms, closed_end)
+    if end_ms < start_ms:
+        return _to_frame([], columns)
+    changed = False
+    if frame is None:
+        rows, reached = _fetch(fetch, start_ms, end_ms, key)
+        if not rows:
+            return _to_frame([], columns)
+        frame, covered_start, covered_end = _to_frame(rows, columns), start_ms, reached
+        changed = True
+    else:
+        if start_ms < covered_start:
+            rows, reached = _fetch(fetch, start_ms, covered_start - 1, key)
+            if rows:
+                frame = _merge(frame, _to_frame(rows, columns), key)
+                changed = True
+            if reached == covered_start - 1:    # 中途失敗會留下缺口，涵蓋範圍不往前延伸
+                covered_start = start_ms
+                changed = True
+        if end_ms > covered_end:
+            rows, reached = _fetch(fetch, covered_end + 1, end_ms, key)
+            if rows:
+                frame = _merge(frame, _to_frame(rows, columns), key)
+                changed = True
+            changed = changed or reached != covered_end
+            covered_end = reached
+    if changed:
+        _write(path, frame, covered_start, covered_end)
+    return _slice(frame, key, start_ms, end_ms)
+
+
+def load_klines(symbol, interval, start_ms, end_ms):
+    """
+    open_time 在 [start_ms, end_ms] 的已收盤 K 線 → frame
+    {"open_time", "open", "high", "low", "close", "volume"} 各一個 numpy 陣列
+    """
+    step = interval_to_ms(interval)
+    start_ms = candle_open_time(start_ms, interval)
+    last_closed = candle_open_time(int(time.time() * 1000), interval) - step
+    fetch = lambda s, e, strict: get_klines_range(symbol, interval, s, e, strict)
+    return _load("klines", symbol, interval, KLINE_COLUMNS, "open_time", start_ms, end_ms, fetch, last_closed)
+
+
+def load_funding(symbol, start_ms, end_ms):
+    """[start_ms, end_ms] 已結算的資金費率 → frame {"time", "rate"}"""
+    fetch = lambda s, e, strict: get_funding_rate_history(symbol, s, e, strict)
+    return _load("funding", symbol, "", FUNDING_COLUMNS, "time", start_ms, end_ms, fetch,
+                 int(time.time() * 1000))
+
+
+def to_klines(frame):
+    """frame → exchange_api 格式的 K 線 dict list"""
+    cols = {c: frame[c].tolist() for c in KLINE_COLUMNS}
+    return [dict(zip(KLINE_COLUMNS, row)) for row in zip(*(cols[c] for c in KLINE_COLUMNS))]
+
+
+def klines_asof(frame, ts_ms, limit):
+    """open_time <= ts_ms 的最後 limit 根 (同 Binance klines endTime + limit)"""
+    hi = int(np.searchsorted(frame["open_time"], ts_ms, side="right"))
+    return {c: v[max(0, hi - limit):hi] for c, v in frame.items()}
+
+
+def funding_at(frame, ts_ms, nearest=True):
+    """
+    一批時間點的資金費率 (sorted time 上一次 searchsorted)
+    nearest=True : 最接近的一筆，距離相同取較早的
+    nearest=False: 當下最後一筆已結算 (time <= ts，不看未來)
+    Returns: 與 ts_ms 等長的 ndarray，查不到為 nan
+    """
+    times, rates = frame["time"], frame["rate"]
+    ts = np.asarray(ts_ms, dtype=np.int64)
+    if len(times) == 0:
+        return np.full(len(ts), np.nan)
+    if nearest:
+        i = np.searchsorted(times, ts)
+        lo = np.maximum(i - 1, 0)
+        hi = np.minimum(i, len(times) - 1)
+        take_lo = (i == len(times)) | ((i > 0) & (ts - times[lo] <= times[hi] - ts))
+        return rates[np.where(take_lo, lo, hi)]
+    i = np.searchsorted(times, ts, side="right") - 1
+    return np.where(i >= 0, rates[np.maximum(i, 0)], np.nan)
+
+
+def load_signals(path=OI_SIGNAL_LOG):
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_closed_trades():
+    return load_paper_state()["closed"]
@@ -5,52 +5,21 @@
 """
 
 import json
-import requests
-import time
-from datetime import datetime, timedelta, timezone
+from datetime import datetime
 from collections import defaultdict
-import sys
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# Binance FR history API
-def get_funding_rate_history(symbol, start_ms, end_ms):
-    """拉 Binance 永續合約歷史資金費率"""
-    url = "https://fapi.binance.com/fapi/v1/fundingRate"
-    params = {
-        "symbol": f"{symbol}USDT",
-        "startTime": start_ms,
-        "endTime": end_ms,
-        "limit": 1000
-    }
-    try:
-        r = requests.get(url, params=params, timeout=10)
-        if r.status_code == 200:
-            return r.json()
-    except:
-        pass
-    return []
+from backtest import run, FundingStudy, load_signals, load_closed_trades
 
-def get_nearest_fr(fr_data, target_ts_ms):
-    """找最接近目標時間的 FR（FR 每 8h 結算一次）"""
-    if not fr_data:
-        return None
-    best = None
-    best_diff = float('inf')
-    for fr in fr_data:
-        diff = abs(fr['fundingTime'] - target_ts_ms)
-        if diff < best_diff:
-            best_diff = diff
-            best = float(fr['fundingRate'])
-    return best
+RESULTS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fr_backtest_results.json")
 
 def main():
     # Load signals
-    with open('/Users/xuan/.openclaw/oi_signals_local_v2.json') as f:
-        signals = json.load(f)
+    signals = load_signals()
     
     # Load paper trades
-    with open('/Users/xuan/.openclaw/paper_state.json') as f:
-        state = json.load(f)
-    trades = state['closed']
+    trades = load_closed_trades()
     
     print(f"信號總數: {len(signals)}")
     print(f"交易總數: {len(trades)}")
@@ -77,36 +46,21 @@ def main():
     start_ms = int(min_ts.timestamp() * 1000) - 8*3600*1000  # buffer
     end_ms = int(max_ts.timestamp() * 1000) + 8*3600*1000
     
-    # Batch fetch FR for all symbols
+    # 每個幣抓一次區間 FR 歷史 (依幣種分片平行)，取最接近信號時間的一筆
     print("正在拉取 Binance 資金費率歷史...")
-    fr_cache = {}
-    total = len(symbols)
-    for i, sym in enumerate(symbols):
-        if (i+1) % 20 == 0:
-            print(f"  進度: {i+1}/{total}")
-        fr_data = get_funding_rate_history(sym, start_ms, end_ms)
-        if fr_data:
-            fr_cache[sym] = fr_data
-        time.sleep(0.1)  # rate limit
-    
-    print(f"成功取得 FR 數據: {len(fr_cache)}/{total} 幣種")
+    frs = run(FundingStudy(actionable, start_ms, end_ms))
+    print(f"成功取得 FR 數據: {len({s['symbol'] for s, fr in zip(actionable, frs) if fr is not None})}/{len(symbols)} 幣種")
     print()
     
     # Analyze: for each LONG/SHORT signal, get FR at signal time
     results = []
     no_fr = 0
-    for s in actionable:
+    for s, fr in zip(actionable, frs):
         sym = s['symbol']
-        if sym not in fr_cache:
-            no_fr += 1
-            continue
-        
-        ts = dp.parse(s['ts'])
-        ts_ms = int(ts.timestamp() * 1000)
-        fr = get_nearest_fr(fr_cache[sym], ts_ms)
         if fr is None:
             no_fr += 1
             continue
+        ts = dp.parse(s['ts'])
         
         # Find matching trade outcome
         sym_trades = trade_by_sym.get(sym, [])
@@ -241,7 +195,7 @@ def main():
         'trade_matched': len(matched),
         'results': results
     }
-    with open('/Users/xuan/.openclaw/workspace/crypto-monitor-deploy/backtest/fr_backtest_results.json', 'w') as f:
+    with open(RESULTS_FILE, 'w') as f:
         json.dump(output, f, indent=2, ensure_ascii=False)
     print("\n✅ 原始數據已存至 backtest/fr_backtest_results.json")
 
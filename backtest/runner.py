@@ -0,0 +1,54 @@
+"""
+回測執行器 — 依幣種分片，ProcessPoolExecutor 平行跑 Strategy.run_symbol
+
+- 同一個幣的工作在同一個 process，歷史資料只載一次、快取檔不會被兩個 process 同時寫
+- 結果依 items 原本的順序合併，和完成順序 / worker 數無關
+"""
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from config import BACKTEST_WORKERS
+
+
+def _run_shard(strategy, symbol, items):
+    try:
+        out = strategy.run_symbol(symbol, items)
+    except Exception as e:
+        print(f"  ❌ {strategy.name} {symbol}: {e}")
+        return [None] * len(items)
+    if len(out) != len(items):
+        raise ValueError(f"{strategy.name}.run_symbol({symbol}) 回傳 {len(out)} 筆，應為 {len(items)}")
+    return out
+
+
+def run(strategy, items=None, workers=BACKTEST_WORKERS, progress=True):
+    """
+    items 預設 strategy.items()
+    Returns: 與 items 等長的結果 list (None = 沒有結果)
+    """
+    items = list(strategy.items() if items is None else items)
+    shards = {}
+    for i, item in enumerate(items):
+        shards.setdefault(item["symbol"], []).append(i)
+    symbols = sorted(shards)
+    merged = [None] * len(items)
+
+    def collect(symbol, out):
+        for i, r in zip(shards[symbol], out):
+            merged[i] = r
+
+    def report(n):
+        if progress and (n % 20 == 0 or n == len(symbols)):
+            print(f"  進度: {n}/{len(symbols)} 幣種")
+
+    if workers <= 1 or len(symbols) <= 1:
+        for n, symbol in enumerate(symbols, 1):
+            collect(symbol, _run_shard(strategy, symbol, [items[i] for i in shards[symbol]]))
+            report(n)
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(symbols))) as pool:
+            futures = {pool.submit(_run_shard, strategy, symbol, [items[i] for i in shards[symbol]]): symbol
+                       for symbol in symbols}
+            for n, future in enumerate(as_completed(futures), 1):
+                collect(futures[future], future.result())
+                report(n)
+    return merged
@@ -0,0 +1,275 @@
+"""
+回測研究外掛 (Strategy)
+
+items()              主程序：產生工作，每個工作 dict 都有 "symbol"
+run_symbol(sym, its) worker：處理同一個幣的全部工作 (歷史資料只載一次)，
+                     回傳與 its 等長的 list，None = 這筆沒有結果
+報表 / 統計留在各 backtest_*.py 腳本
+"""
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from indicators import adx_dmi, adx_dmi_series
+from exchange_api import interval_to_ms
+from backtest.data import load_klines, load_funding, load_closed_trades, klines_asof, funding_at
+
+HOUR_MS = 3600000
+
+
+class Strategy:
+    name = ""
+
+    def items(self):
+        raise NotImplementedError
+
+    def run_symbol(self, symbol, items):
+        raise NotImplementedError
+
+
+def estimate_entry_ts(trade, rules, default_hours):
+    """平倉紀錄沒有進場時間的舊資料：用平倉時間往前推 (rules: [(reason 關鍵字, 小時)])"""
+    ct = datetime.fromisoformat(trade.get("closed_at", ""))
+    for key, hours in rules:
+        if key in trade.get("reason", ""):
+            return (ct - timedelta(hours=hours)).timestamp()
+    return (ct - timedelta(hours=default_hours)).timestamp()
+
+
+def _trade_items(trades, rules, default_hours):
+    items = []
+    for t in trades:
+        try:
+            items.append({"symbol": t["symbol"], "entry_ts": estimate_entry_ts(t, rules, default_hours), "trade": t})
+        except:
+            continue
+    return items
+
+
+class AdxStudy(Strategy):
+    """
+    進場時的 1h ADX / DMI (backtest_adx)
+    series=True : 每幣整段 K 線算一次 adx_dmi_series (最早交易前多抓 warmup 根暖機)，再批次 as-of 查詢
+    series=False: 舊版逐筆只用進場前 bars 根算 (Wilder 平滑起點不同，數值會有差異)
+    """
+    name = "adx"
+    RULES = (("TIME", 6),)
+
+    def __init__(self, trades=None, bars=30, period=14, series=True, warmup=200):
+        self.trades = trades
+        self.bars = bars
+        self.period = period
+        self.series = series
+        self.warmup = warmup
+
+    def items(self):
+        trades = load_closed_trades() if self.trades is None else self.trades
+        return _trade_items(trades, self.RULES, 3)
+
+    def _row(self, symbol, trade, adx, pdi, ndi):
+        direction = trade["direction"]
+        return {
+            "symbol": symbol,
+            "direction": direction,
+            "pnl_pct": trade["pnl_pct"],
+            "pnl_usd": trade["pnl_usd"],
+            "reason": trade["reason"],
+            "phase": trade.get("phase", "?"),
+            "adx": adx,
+            "pdi": pdi,
+            "ndi": ndi,
+            "di_align": (direction == "LONG" and pdi > ndi) or (direction == "SHORT" and ndi > pdi),
+        }
+
+    def run_symbol(self, symbol, items):
+        ends = [int(it["entry_ts"] * 1000) for it in items]
+        lookback = self.warmup if self.series else self.bars
+        frame = load_klines(symbol, "1h", min(ends) - (lookback + 1) * HOUR_MS, max(ends))
+        if self.series:
+            adx, pdi, ndi = adx_dmi_series(frame["high"], frame["low"], frame["close"], self.period)
+            # open_time <= 進場時間的最後一根 (同 klines_asof)
+            idx = np.searchsorted(frame["open_time"], np.array(ends, dtype=np.int64), side="right") - 1
+            out = []
+            for it, i in zip(items, idx.tolist()):
+                if i < 0 or np.isnan(adx[i]):
+                    out.append(None)
+                    continue
+                out.append(self._row(symbol, it["trade"], float(adx[i]), float(pdi[i]), float(ndi[i])))
+            return out
+
+        out = []
+        for it, end in zip(items, ends):
+            k = klines_asof(frame, end, self.bars)
+            if len(k["close"]) < self.period + 2:
+                out.append(None)
+                continue
+            adx, pdi, ndi = adx_dmi(k["high"].tolist(), k["low"].tolist(), k["close"].tolist(), self.period)
+            if np.isnan(adx):
+                out.append(None)
+                continue
+            out.append(self._row(symbol, it["trade"], adx, pdi, ndi))
+        return out
+
+
+class TailStudy(Strategy):
+    """進場前 48 根 1h 的走勢 / 區間位置 / 量能 (backtest_tail, backtest_tail_filter)"""
+    name = "tail"
+
+    def __init__(self, trades=None, rules=(("TIME", 6), ("TRAIL", 4), ("TP", 4)), default_hours=3,
+                 moves=(1, 3, 6, 12, 24), with_win=False):
+        self.trades = trades
+        self.rules = rules
+        self.default_hours = default_hours
+        self.moves = moves
+        self.with_win = with_win
+
+    def items(self):
+        trades = load_closed_trades() if self.trades is None else self.trades
+        return _trade_items(trades, self.rules, self.default_hours)
+
+    def run_symbol(self, symbol, items):
+        ends = [int(it["entry_ts"] * 1000) for it in items]
+        frame = load_klines(symbol, "1h", min(ends) - 49 * HOUR_MS, max(ends))
+        out = []
+        for it, end in zip(items, ends):
+            k = klines_asof(frame, end, 48)
+            if len(k["close"]) < 24:
+                out.append(None)
+                continue
+            closes = k["close"].tolist()
+            volumes = k["volume"].tolist()
+            entry_price = closes[-1]
+
+            def pct_move(n):
+                if len(closes) >= n + 1:
+                    return (closes[-1] - closes[-(n+1)]) / closes[-(n+1)] * 100
+                return None
+
+            h24 = max(k["high"][-24:].tolist())
+            l24 = min(k["low"][-24:].tolist())
+            vol_recent = sum(volumes[-3:]) / 3 if len(volumes) >= 3 else 0
+            vol_prior = sum(volumes[-24:-3]) / 21 if len(volumes) >= 24 else 0
+            t = it["trade"]
+            row = {
+                "symbol": symbol,
+                "direction": t["direction"],
+                "pnl_pct": t["pnl_pct"],
+                "pnl_usd": t["pnl_usd"],
+                "reason": t["reason"],
+                "phase": t.get("phase", ""),
+            }
+            for n in self.moves:
+                row[f"move_{n}h"] = pct_move(n)
+            row["range_pct"] = (entry_price - l24) / (h24 - l24) * 100 if h24 != l24 else 50  # 100 = 24h 高點
+            row["dist_from_high"] = (h24 - entry_price) / h24 * 100
+            row["vol_spike"] = vol_recent / vol_prior if vol_prior > 0 else 0
+            if self.with_win:
+                row["is_win"] = t["pnl_usd"] > 0
+            out.append(row)
+        return out
+
+
+class FundingStudy(Strategy):
+    """
+    信號當下的已結算資金費率 (fr_backtest)；結果為 rate 或 None
+    nearest=True 取最接近的一筆 (距離相同取較早)，False 只取信號前最後一筆
+    """
+    name = "funding"
+
+    def __init__(self, signals, start_ms, end_ms, nearest=True):
+        self.signals = signals
+        self.start_ms = start_ms
+        self.end_ms = end_ms
+        self.nearest = nearest
+
+    def items(self):
+        return [dict(s, ts_ms=int(datetime.fromisoformat(s["ts"]).timestamp() * 1000)) for s in self.signals]
+
+    def run_symbol(self, symbol, items):
+        frame = load_funding(symbol, self.start_ms, self.end_ms)
+        rates = funding_at(frame, [it["ts_ms"] for it in items], self.nearest)
+        return [None if np.isnan(r) else r for r in rates.tolist()]
+
+
+class SignalOutcomeStudy(Strategy):
+    """
+    信號後各時間點的價格 / PnL / 期間最大有利 (mfe) 與不利 (mae) 幅度 (backtest_signals_outcome)
+    結果為 outcomes dict 或 None；每幣一段連續 K 線，所有信號 × 時間點一次 searchsorted
+    """
+    name = "signal_outcome"
+    HORIZONS = (("30m", 0.5), ("1h", 1), ("2h", 2), ("4h", 4), ("6h", 6))
+
+    def __init__(self, signals, now_ts, horizons=HORIZONS, interval="5m"):
+        self.signals = signals
+        self.now_ts = now_ts
+        self.horizons = horizons
+        self.interval = interval
+
+    def items(self):
+        return list(self.signals)
+
+    def run_symbol(self, symbol, items):
+        starts = np.array([datetime.fromisoformat(s["ts"]).timestamp() for s in items])
+        entry = np.array([s["entry_price"] for s in items], dtype=float)
+        is_long = np.array([s["signal"] in ("LONG", "SQUEEZE") for s in items])  # 其餘 SHORT, SHAKEOUT
+        last = max(h for _, h in self.horizons)
+        frame = load_klines(symbol, self.interval, int(starts.min() * 1000),
+                            int((starts.max() + last * 3600) * 1000) + interval_to_ms(self.interval))
+        times, closes = frame["open_time"], frame["close"]
+        # 尾端補一格給 reduceat (區間終點 = len 時)
+        highs = np.append(frame["high"], -np.inf)
+        lows = np.append(frame["low"], np.inf)
+        n = len(times)
+
+        first = np.searchsorted(times, (starts * 1000).astype(np.int64))    # 信號後第一根
+        reached = np.ones(len(items), dtype=bool)
+        valid_entry = entry > 0
+        safe_entry = np.where(valid_entry, entry, 1.0)
+        out = [{} for _ in items]
+        for label, hours in self.horizons:
+            target = starts + hours * 3600
+            reached &= target <= self.now_ts                                 # 不看未來 (之後的時間點也不算)
+            i = np.searchsorted(times, (target * 1000).astype(np.int64))     # startTime=target 的第一根
+            ok = reached & (i < n) & valid_entry
+            if not ok.any():
+                continue
+            i = np.minimum(i, n - 1)
+            price = closes[i]
+            pnl = np.where(is_long, (price - safe_entry) / safe_entry * 100, (safe_entry - price) / safe_entry * 100)
+            # 信號後第一根 ~ 這個時間點那根的最高 / 最低
+            bounds = np.empty(2 * len(items), dtype=np.intp)
+            bounds[0::2] = np.minimum(first, i)
+            bounds[1::2] = i + 1
+            hi = np.maximum.reduceat(highs, bounds)[0::2]
+            lo = np.minimum.reduceat(lows, bounds)[0::2]
+            up = (hi - safe_entry) / safe_entry * 100
+            down = (lo - safe_entry) / safe_entry * 100
+            mfe = np.where(is_long, up, -down)
+            mae = np.where(is_long, down, -up)
+            for k in np.flatnonzero(ok):
+                out[k][label] = {"price": float(price[k]), "pnl": float(pnl[k]),
+                                 "mfe": float(mfe[k]), "mae": float(mae[k])}
+        return [o or None for o in out]
+
+
+class ObStudy(Strategy):
+    """OB V1 / V2 滑動窗口回測 (backtest_ob_v2)；結果為 {"bars", "v1", "v2"}"""
+    name = "ob"
+
+    def __init__(self, symbols=("BTC", "ETH"), bars=500, versions=("v1", "v2")):
+        self.symbols = symbols
+        self.bars = bars
+        self.versions = versions
+
+    def items(self):
+        return [{"symbol": s} for s in self.symbols]
+
+    def run_symbol(self, symbol, items):
+        from backtest.backtest_ob_v2 import backtest_version
+        end = datetime.now().timestamp() * 1000
+        frame = load_klines(symbol, "1h", int(end) - self.bars * HOUR_MS, int(end))
+        bars = len(frame["close"])
+        result = {"bars": bars}
+        for version in self.versions:
+            result[version] = backtest_version({"1H": frame}, version=version) if bars else []
+        return [result] * len(items)
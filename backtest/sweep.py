@@ -0,0 +1,258 @@
+"""
+參數掃描 — grid / 隨機抽樣，多 process 平行，可中斷續跑
+
+- 歷史 K 線 frame 只載一次，放進 shared memory，worker 直接掛上 numpy view (不複製、不 pickle)
+- 每組參數跑完就 append 到 checkpoint (BACKTEST_SWEEP_DIR/{name}.jsonl)，
+  同名再跑只補沒跑過的組合；預設 name 帶資料 hash，資料區間變了就是新檔 (--name 指定則照用)
+- 結果依 metric 排名，寫成 {name}.csv
+
+objective(params, frames) → 結果 dict (需含 metric 欄位)；必須是模組層級函式 (worker 要 pickle)
+
+用法: python backtest/sweep.py --symbols BTC,ETH --bars 2000 \
+        --grid version=v2 --grid swing_length=2,3,4 --grid tp1_rr=1,1.5,2 [--samples 20]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from config import BACKTEST_WORKERS, BACKTEST_SWEEP_DIR
+from backtest.data import load_klines
+
+HOUR_MS = 3600000
+
+
+class SharedFrames:
+    """{symbol: frame} 複製進 shared memory 一次；meta 傳給 worker 用 attach() 掛上"""
+
+    def __init__(self, frames):
+        self.blocks = []
+        self.meta = {}
+        for symbol, frame in frames.items():
+            cols = {}
+            for c, arr in frame.items():
+                arr = np.ascontiguousarray(arr)
+                shm = shared_memory.SharedMemory(create=True, size=max(arr.nbytes, 1))
+                np.ndarray(arr.shape, arr.dtype, buffer=shm.buf)[:] = arr
+                self.blocks.append(shm)
+                cols[c] = (shm.name, arr.dtype.str, arr.shape)
+            self.meta[symbol] = cols
+
+    def close(self):
+        for shm in self.blocks:
+            shm.close()
+            shm.unlink()
+        self.blocks = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_FRAMES = None      # worker 端掛上的 frames
+_BLOCKS = []        # 保持 SharedMemory 物件存活 (view 才有效)
+
+
+def attach(meta):
+    """worker initializer：依 meta 掛上 shared memory，frames 放在 _FRAMES"""
+    global _FRAMES
+    frames = {}
+    for symbol, cols in meta.items():
+        frame = {}
+        for c, (name, dtype, shape) in cols.items():
+            shm = shared_memory.SharedMemory(name=name)
+            _BLOCKS.append(shm)
+            frame[c] = np.ndarray(shape, np.dtype(dtype), buffer=shm.buf)
+        frames[symbol] = frame
+    _FRAMES = frames
+
+
+def combos(grid, samples=None, seed=0):
+    """grid {參數: [值...]} 的所有組合；samples 指定時隨機抽 samples 組 (固定 seed 可重現)"""
+    names = list(grid)
+    out = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if samples and samples < len(out):
+        out = random.Random(seed).sample(out, samples)
+    return out
+
+
+def _key(params):
+    return json.dumps(params, sort_keys=True)
+
+
+def _load_checkpoint(path):
+    done = {}
+    try:
+        with open(path) as f:
+            for line in f:
+                try:
+                    row = json.loads(line)
+                    done[_key(row["params"])] = row
+                except:
+                    continue    # 中斷時寫一半的最後一行
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _evaluate(objective, params, frames=None):
+    try:
+        return objective(params, _FRAMES if frames is None else frames)
+    except Exception as e:
+        print(f"  ❌ {params}: {e}")
+        return None
+
+
+def rank(rows, metric="score"):
+    """依 result[metric] 由大到小排名 (沒有 metric 的排最後)"""
+    def sort_key(row):
+        v = row["result"].get(metric)
+        return (v is None, -(v or 0))
+    ranked = sorted(rows, key=sort_key)
+    for i, row in enumerate(ranked, 1):
+        row["rank"] = i
+    return ranked
+
+
+def write_table(rows, path):
+    """排名表 → csv (rank, 參數欄, 結果欄)"""
+    params = list(dict.fromkeys(k for r in rows for k in r["params"]))
+    results = list(dict.fromkeys(k for r in rows for k in r["result"]))
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", newline="") as f:
+        w = csv.writer(f)
+        w.writerow(["rank"] + params + results)
+        for r in rows:
+            w.writerow([r["rank"]] + [r["params"].get(k) for k in params] + [r["result"].get(k) for k in results])
+
+
+def sweep(objective, grid, frames, samples=None, seed=0, workers=BACKTEST_WORKERS,
+          name="sweep", metric="score", progress=True):
+    """
+    跑 combos(grid, samples, seed) 的每組參數 (checkpoint 裡已有的跳過)
+    Returns: 依 metric 排名的 [{"rank", "params", "result"}]，同時寫 {name}.csv
+    """
+    plan = combos(grid, samples, seed)
+    checkpoint = os.path.join(BACKTEST_SWEEP_DIR, f"{name}.jsonl")
+    done = _load_checkpoint(checkpoint)
+    todo = [p for p in plan if _key(p) not in done]
+    if progress:
+        print(f"  參數組合: {len(plan)} (已完成 {len(plan) - len(todo)}，待跑 {len(todo)})")
+
+    os.makedirs(BACKTEST_SWEEP_DIR, exist_ok=True)
+    with open(checkpoint, "a") as f:
+        def record(n, params, result):
+            if result is not None:
+                row = {"params": params, "result": result}
+                done[_key(params)] = row
+                f.write(json.dumps(row, ensure_ascii=False) + "\n")
+                f.flush()
+            if progress and (n % 10 == 0 or n == len(todo)):
+                print(f"  進度: {n}/{len(todo)}")
+
+        if workers <= 1 or len(todo) <= 1:
+            for n, params in enumerate(todo, 1):
+                record(n, params, _evaluate(objective, params, frames))
+        elif todo:
+            with SharedFrames(frames) as shared:
+                with ProcessPoolExecutor(max_workers=min(workers, len(todo)),
+                                         initializer=attach, initargs=(shared.meta,)) as pool:
+                    futures = {pool.submit(_evaluate, objective, params): params for params in todo}
+                    for n, future in enumerate(as_completed(futures), 1):
+                        record(n, futures[future], future.result())
+
+    rows = rank([done[_key(p)] for p in plan if _key(p) in done], metric)
+    write_table(rows, os.path.join(BACKTEST_SWEEP_DIR, f"{name}.csv"))
+    return rows
+
+
+# ─── 內建 objective: OB 回測 (backtest_ob_v2.backtest_version 的參數) ───
+def ob_objective(params, frames):
+    """各幣 backtest_version(**params) 的交易合併統計；score = 2h 平均 PnL%"""
+    from backtest.backtest_ob_v2 import backtest_version
+    trades = []
+    for frame in frames.values():
+        trades += backtest_version({"1H": frame}, **params)   # 直接吃 shared memory 欄位，不轉 dict list
+    pnl_2h = [t["outcomes"]["2h"] for t in trades if "2h" in t["outcomes"]]
+    return {
+        "trades": len(trades),
+        "win_2h": round(sum(1 for p in pnl_2h if p > 0) / len(pnl_2h) * 100, 1) if pnl_2h else None,
+        "score": round(float(np.mean(pnl_2h)), 4) if pnl_2h else None,
+        "tp1_rate": round(sum(t["hit_tp1"] for t in trades) / len(trades) * 100, 1) if trades else None,
+        "sl_rate": round(sum(t["hit_sl"] for t in trades) / len(trades) * 100, 1) if trades else None,
+    }
+
+
+def _frames_digest(frames):
+    """frames 內容的短 hash (幣、欄位、數值)；預設 checkpoint 名稱用，資料區間一變就換檔"""
+    h = hashlib.sha1()
+    for symbol in sorted(frames):
+        h.update(symbol.encode())
+        for c in sorted(frames[symbol]):
+            h.update(c.encode())
+            h.update(np.ascontiguousarray(frames[symbol][c]).tobytes())
+    return h.hexdigest()[:8]
+
+
+def _parse_grid(specs):
+    """["swing_length=2,3,4", "version=v2"] → {"swing_length": [2, 3, 4], "version": ["v2"]}"""
+    grid = {}
+    for spec in specs:
+        name, values = spec.split("=", 1)
+        parsed = []
+        for v in values.split(","):
+            try:
+                parsed.append(json.loads(v))
+            except:
+                parsed.append(v)
+        grid[name] = parsed
+    return grid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OB 回測參數掃描")
+    parser.add_argument("--symbols", default="BTC,ETH")
+    parser.add_argument("--bars", type=int, default=2000)
+    parser.add_argument("--grid", action="append", default=[], help="參數=值1,值2 (可重複)")
+    parser.add_argument("--samples", type=int, default=None, help="隨機抽幾組 (預設全部組合)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=BACKTEST_WORKERS)
+    parser.add_argument("--name", default=None, help="checkpoint / 排名表檔名 (同名續跑)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    grid = _parse_grid(args.grid) or {
+        "version": ["v1", "v2"], "swing_length": [2, 3, 4], "sl_buffer": [0.2, 0.3, 0.5], "tp1_rr": [1.0, 1.5, 2.0],
+    }
+    symbols = args.symbols.split(",")
+
+    end = int(time.time() * 1000)
+    frames = {}
+    for symbol in symbols:
+        frame = load_klines(symbol, "1h", end - args.bars * HOUR_MS, end)
+        if len(frame["close"]):
+            frames[symbol] = frame
+    print("🔍 " + ", ".join(f"{s} {len(f['close'])} 根" for s, f in frames.items()))
+    name = args.name or f"ob_{'-'.join(symbols)}_{args.bars}_{_frames_digest(frames)}"
+
+    rows = sweep(ob_objective, grid, frames, args.samples, args.seed, args.workers, name)
+    print(f"\n=== 前 {args.top} 名 (score = 2h 平均 PnL%) ===")
+    for r in rows[:args.top]:
+        print(f"  #{r['rank']:<3} {r['result']}  {r['params']}")
+    print(f"\n✅ 排名表: {os.path.join(BACKTEST_SWEEP_DIR, name + '.csv')}")
+
+
+if __name__ == "__main__":
+    main()
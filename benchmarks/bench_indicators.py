@@ -0,0 +1,192 @@
+"""
+indicators 模組 benchmark
+對比原本各腳本的迴圈版 RSI / ATR / ADX 與 indicators (1-D 單幣、2-D 多幣矩陣)，
+以及每根新 K 線「整段重算」vs 增量指標 (IndicatorStream)；同時驗證結果一致 (相對誤差 1e-9 內)
+
+用法: python benchmarks/bench_indicators.py [--symbols 50] [--bars 100] [--repeat 20]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+
+import indicators as ind
+
+
+# ─── 原本的迴圈版 (baseline) ───
+
+def legacy_rsi_wilder(closes, period=14):
+    """monitor.calculate_rsi"""
+    if len(closes) < period + 1:
+        return 50
+    deltas = np.diff(closes)
+    gains = np.where(deltas > 0, deltas, 0)
+    losses = np.where(deltas < 0, -deltas, 0)
+    avg_gain = np.mean(gains[:period])
+    avg_loss = np.mean(losses[:period])
+    for i in range(period, len(gains)):
+        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
+        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
+    if avg_loss == 0:
+        return 100
+    return 100 - (100 / (1 + avg_gain / avg_loss))
+
+
+def legacy_rsi_series_overlap(closes, period=14):
+    """dump_warning.calc_rsi_series"""
+    if len(closes) < period+1:
+        return [50]*len(closes)
+    rsis = [50]*period
+    gains, losses = [], []
+    for i in range(1, period+1):
+        d = closes[i]-closes[i-1]
+        gains.append(d if d>0 else 0)
+        losses.append(-d if d<0 else 0)
+    ag = sum(gains)/period
+    al = sum(losses)/period
+    for i in range(period, len(closes)):
+        d = closes[i]-closes[i-1]
+        g = d if d>0 else 0
+        l = -d if d<0 else 0
+        ag = (ag*(period-1)+g)/period
+        al = (al*(period-1)+l)/period
+        rsis.append(100 if al==0 else 100-(100/(1+ag/al)))
+    return rsis
+
+
+def legacy_rsi_sma_last(closes, period=14):
+    """breakout_alert.calc_rsi"""
+    if len(closes) < period+1:
+        return 50
+    gains, losses = [], []
+    for i in range(len(closes)-period, len(closes)):
+        d = closes[i] - closes[i-1]
+        gains.append(d if d > 0 else 0)
+        losses.append(-d if d < 0 else 0)
+    ag = sum(gains)/len(gains)
+    al = sum(losses)/len(losses) if sum(losses) > 0 else 0.001
+    return 100-(100/(1+ag/al))
+
+
+def legacy_adx(highs, lows, closes, period=14):
+    """backtest_adx.calc_adx_dmi"""
+    tr_list, pdm_list, ndm_list = [], [], []
+    for i in range(1, len(highs)):
+        hi, lo, pc = highs[i], lows[i], closes[i-1]
+        tr_list.append(max(hi - lo, abs(hi - pc), abs(lo - pc)))
+        up_move = highs[i] - highs[i-1]
+        down_move = lows[i-1] - lows[i]
+        pdm_list.append(up_move if (up_move > down_move and up_move > 0) else 0)
+        ndm_list.append(down_move if (down_move > up_move and down_move > 0) else 0)
+    atr = sum(tr_list[:period])
+    spdm = sum(pdm_list[:period])
+    sndm = sum(ndm_list[:period])
+    dx_list = []
+    for i in range(period, len(tr_list)):
+        atr = atr - (atr / period) + tr_list[i]
+        spdm = spdm - (spdm / period) + pdm_list[i]
+        sndm = sndm - (sndm / period) + ndm_list[i]
+        if atr == 0:
+            continue
+        pdi = (spdm / atr) * 100
+        ndi = (sndm / atr) * 100
+        if pdi + ndi == 0:
+            continue
+        dx_list.append((abs(pdi - ndi) / (pdi + ndi) * 100, pdi, ndi))
+    if len(dx_list) < period:
+        return None
+    adx = sum(d[0] for d in dx_list[:period]) / period
+    for i in range(period, len(dx_list)):
+        adx = (adx * (period - 1) + dx_list[i][0]) / period
+    return (adx, dx_list[-1][1], dx_list[-1][2])
+
+
+# ─── 測試資料 ───
+
+def make_matrix(symbols, bars, seed=42):
+    rng = np.random.default_rng(seed)
+    closes = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (symbols, bars)), axis=1))
+    spread = np.abs(rng.normal(0, 0.005, (symbols, bars))) * closes
+    return closes + spread, closes - spread, closes
+
+
+def bench(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    H, L, C = make_matrix(args.symbols, args.bars)
+    rows = [(h.tolist(), l.tolist(), c.tolist()) for h, l, c in zip(H, L, C)]
+
+    cases = [
+        ("RSI wilder",
+         lambda: [legacy_rsi_wilder(c) for _, _, c in rows],
+         lambda: [ind.rsi(c) for _, _, c in rows],
+         lambda: ind.rsi(C)),
+        ("RSI series (dump_warning)",
+         lambda: [legacy_rsi_series_overlap(c) for _, _, c in rows],
+         lambda: [ind.rsi_series(c, method="wilder_overlap").tolist() for _, _, c in rows],
+         lambda: ind.rsi_series(C, method="wilder_overlap").tolist()),
+        ("RSI sma_last/floor",
+         lambda: [legacy_rsi_sma_last(c) for _, _, c in rows],
+         lambda: [ind.rsi(c, method="sma_last", zero_loss="floor") for _, _, c in rows],
+         lambda: ind.rsi(C, method="sma_last", zero_loss="floor")),
+        ("ADX/DMI",
+         lambda: [legacy_adx(h, l, c) for h, l, c in rows],
+         lambda: [ind.adx_dmi(h, l, c) for h, l, c in rows],
+         lambda: ind.adx_dmi(H, L, C)),
+    ]
+
+    print(f"{args.symbols} symbols x {args.bars} bars (best of {args.repeat}, ms)")
+    print(f"{'indicator':<28} {'loop':>8} {'1-D':>8} {'2-D':>8} {'2-D speedup':>12}")
+    for name, legacy, one_d, two_d in cases:
+        ref = legacy()
+        got_1d = one_d()
+        got_2d = two_d()
+        if name == "ADX/DMI":
+            got_2d = list(zip(*(s.tolist() for s in got_2d)))
+        else:
+            got_2d = np.asarray(got_2d).tolist()
+        for got in (got_1d, got_2d):
+            assert np.allclose(np.array(got, dtype=float), np.array(ref, dtype=float), rtol=1e-9, atol=1e-9, equal_nan=True), name
+        t_loop, t_1d, t_2d = bench(legacy, args.repeat), bench(one_d, args.repeat), bench(two_d, args.repeat)
+        print(f"{name:<28} {t_loop:>8.2f} {t_1d:>8.2f} {t_2d:>8.2f} {t_loop / t_2d:>11.1f}x")
+
+    # 每根新 K 線: 抓最近 bars 根整段重算 vs 增量更新
+    h, l, c = rows[0]
+    klines = [{"open_time": i * 60000, "high": hi, "low": lo, "close": cl, "volume": 1.0}
+              for i, (hi, lo, cl) in enumerate(zip(h, l, c))]
+    steps = range(args.bars // 2, args.bars + 1)
+
+    def batch():
+        return [(ind.rsi(c[max(0, j - args.bars):j]), ind.atr(h[:j], l[:j], c[:j]),
+                 ind.adx_dmi(h[:j], l[:j], c[:j])) for j in steps]
+
+    def streaming():
+        stream = ind.IndicatorStream({"rsi": ind.WilderRSI(), "atr": ind.WilderATR(), "adx": ind.ADXDMI()})
+        return [tuple(stream.update(klines[:j]).values()) for j in steps]
+
+    def flat(rows):
+        return np.array([[rsi, atr, *adx] for rsi, atr, adx in rows], dtype=float)
+
+    assert np.allclose(flat(batch()), flat(streaming()), rtol=1e-9, atol=1e-9, equal_nan=True), "streaming"
+    t_batch, t_stream = bench(batch, args.repeat), bench(streaming, args.repeat)
+    print(f"\n{len(steps)} 根新 K 線 RSI+ATR+ADX: 重算 {t_batch:.2f} ms / 增量 {t_stream:.2f} ms "
+          f"({t_batch / t_stream:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,49 @@
+"""
+backtest_ob_v2 as-of OB 偵測 benchmark
+對比 backtest_version 每個 tick 重跑 find_obs_*(window) vs iter_obs_asof 單次掃描
+同時驗證兩者每個 tick 的 OB 與回測結果完全一致
+
+用法: python benchmarks/bench_ob_asof.py [--bars 2000] [--long 17520]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import argparse
+import time
+
+from bench_swing_points import make_klines
+from backtest.backtest_ob_v2 import find_obs_v1, find_obs_v2, iter_obs_asof, obs_to_dicts, backtest_version
+
+
+def timed(fn):
+    t0 = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - t0
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=2000)
+    parser.add_argument("--long", type=int, default=17520, help="只跑 as-of 的長序列 (預設 2 年 1h)")
+    args = parser.parse_args()
+
+    klines = make_klines(args.bars)
+    print(f"{'ver':>4} {'bars':>6} {'trades':>7} {'window s':>9} {'as-of s':>8} {'speedup':>8}")
+    for version in ("v1", "v2"):
+        find_obs = find_obs_v1 if version == "v1" else find_obs_v2
+        for t, cols in iter_obs_asof(klines[:300], version):
+            assert obs_to_dicts(cols) == find_obs(klines[:t+1]), f"OB mismatch {version} t={t}"
+        ref, t_old = timed(lambda: backtest_version({"1H": klines}, version, asof=False))
+        new, t_new = timed(lambda: backtest_version({"1H": klines}, version))
+        assert new == ref, f"trades mismatch {version}"
+        print(f"{version:>4} {args.bars:>6} {len(new):>7} {t_old:>9.2f} {t_new:>8.2f} {t_old/t_new:>7.1f}x")
+
+    long_klines = make_klines(args.long, seed=7)
+    for version in ("v1", "v2"):
+        trades, t = timed(lambda: backtest_version({"1H": long_klines}, version))
+        print(f"{version:>4} {args.long:>6} {len(trades):>7} {'-':>9} {t:>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+paper_trader 1m 路徑重播 benchmark
+對比逐點呼叫 evaluate_position (baseline) vs evaluate_intrabar (矩陣找事件點)
+同時驗證持倉狀態、資金、平倉紀錄 (含順序) 完全一致
+
+用法: python benchmarks/bench_paper_intrabar.py [--positions 10] [--bars 360] [--books 20]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import copy
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+import paper_trader as pt
+
+TZ = timezone(timedelta(hours=8))
+
+# 平倉紀錄的市場快照要連網，benchmark 只比對交易邏輯
+pt.get_grafana_data = lambda symbol: {}
+pt.get_btc_context = lambda: {}
+
+
+def make_book(positions, bars, seed):
+    """固定 seed 的持倉 + 1m K 線路徑 (含已碰 TP2 的尾倉)"""
+    rng = np.random.default_rng(seed)
+    t0 = datetime(2026, 1, 1, tzinfo=TZ)
+    book = []
+    for k in range(positions):
+        direction = "LONG" if rng.random() < 0.5 else "SHORT"
+        sgn = 1 if direction == "LONG" else -1
+        pos = {"symbol": f"S{k}USDT", "direction": direction, "entry_price": 100.0, "size": 1000.0,
+               "sl": 100 * (1 - sgn * 0.08), "tp1": 100 * (1 + sgn * 0.03), "tp2": 100 * (1 + sgn * 0.07),
+               "tp1_hit": False, "entry_time": (t0 + timedelta(seconds=int(rng.integers(0, 3600)))).isoformat()}
+        if rng.random() < 0.2:
+            pos.update(tp2_hit=True, trailing_sl=100 * (1 - sgn * 0.03), remaining_pct=50)
+        vol = rng.choice([0.002, 0.005, 0.01])
+        closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, vol, bars))), 2)
+        opens = np.concatenate([[100.0], closes[:-1]])
+        spread = np.round(np.abs(rng.normal(0, vol * 100, bars)), 2)
+        start = pt._path_start_ms(pos)
+        klines = [{"open_time": start + i * 60000, "open": float(o), "high": float(max(o, c) + s),
+                   "low": float(min(o, c) - s), "close": float(c)}
+                  for i, (o, c, s) in enumerate(zip(opens, closes, spread))]
+        times, prices = pt.build_intrabar_path(klines, start, (start + bars * 60000) * 1000)
+        book.append((pos, times, prices))
+    return book
+
+
+def legacy_replay(state, book, closed):
+    """逐點依時間順序呼叫 evaluate_position"""
+    points = sorted((int(t), r, j) for r, (_, times, _) in enumerate(book) for j, t in enumerate(times))
+    alive = [True] * len(book)
+    for t, r, j in points:
+        if alive[r]:
+            alive[r] = pt.evaluate_position(state, state["positions"][r], float(book[r][2][j]),
+                                            pt._from_us(t, TZ), closed)
+    return alive
+
+
+def vector_replay(state, book, closed):
+    keep = pt.evaluate_intrabar(state, [(p, t, pr) for p, (_, t, pr) in zip(state["positions"], book)],
+                                closed, TZ)
+    return [keep[id(p)] for p in state["positions"]]
+
+
+def run(fn, book):
+    state = {"positions": copy.deepcopy([p for p, _, _ in book]), "closed": [], "capital": 10000.0}
+    closed = []
+    t0 = time.perf_counter()
+    alive = fn(state, book, closed)
+    return time.perf_counter() - t0, (alive, state["positions"], state["capital"], closed)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--positions", type=int, default=10)
+    parser.add_argument("--bars", type=int, default=360)
+    parser.add_argument("--books", type=int, default=20)
+    args = parser.parse_args()
+
+    t_old = t_new = 0.0
+    events = 0
+    for seed in range(args.books):
+        book = make_book(args.positions, args.bars, seed)
+        dt_old, ref = run(legacy_replay, book)
+        dt_new, got = run(vector_replay, book)
+        assert ref == got, f"mismatch seed={seed}"
+        t_old += dt_old
+        t_new += dt_new
+        events += len(ref[3])
+
+    print(f"{args.books} books x {args.positions} positions x {args.bars} 1m bars ({events} closed records)")
+    print(f"per book: legacy {t_old / args.books * 1000:.2f} ms / vector {t_new / args.books * 1000:.2f} ms "
+          f"({t_old / t_new:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+paper_replay 重播速度 benchmark
+合成 1m K 線 + OI 信號，量每秒可重播的信號數；重播兩次確認結果一致、hook 有還原
+
+用法: python benchmarks/bench_paper_replay.py [--symbols 50] [--days 3] [--signals 5000]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+import paper_trader as pt
+import paper_replay
+
+TZ = timezone(timedelta(hours=8))
+
+
+def make_market(symbols, days, seed=7):
+    rng = np.random.default_rng(seed)
+    t0 = int(datetime(2026, 1, 1, tzinfo=TZ).timestamp() * 1000)
+    bars = int(days * 1440)
+    klines = {}
+    for name in ["BTC"] + [f"S{k}" for k in range(symbols)]:
+        closes = np.round(100 * np.exp(np.cumsum(rng.normal(0, 0.003, bars))), 4)
+        opens = np.concatenate([[100.0], closes[:-1]])
+        spread = np.round(np.abs(rng.normal(0, 0.2, bars)), 4)
+        klines[name] = [{"open_time": t0 + i * 60000, "open": float(o), "high": float(max(o, c) + s),
+                         "low": float(min(o, c) - s), "close": float(c), "volume": 1.0}
+                        for i, (o, c, s) in enumerate(zip(opens, closes, spread))]
+    funding = {name: [{"time": t0 + h * 8 * 3600000, "rate": float(rng.normal(0, 0.0002))}
+                      for h in range(int(days * 3) + 1)] for name in klines}
+    return t0, paper_replay.SimMarket(klines, funding)
+
+
+def make_signals(t0, symbols, days, n, seed=7):
+    rng = np.random.default_rng(seed)
+    span = int(days * 86400000) - 86400000
+    signals = []
+    for _ in range(n):
+        # oi_scanner 每 5 分鐘掃一輪，同一輪的信號同一個時間
+        ts = t0 + 86400000 + int(rng.integers(0, span)) // 300000 * 300000 + 20000
+        signals.append({"ts": datetime.fromtimestamp(ts / 1000, TZ).isoformat(),
+                        "symbol": f"S{int(rng.integers(0, symbols))}",
+                        "signal": "LONG" if rng.random() < 0.5 else "SHORT",
+                        "entry_price": 100.0, "rsi": float(rng.uniform(20, 80)),
+                        "strength_score": int(rng.integers(0, 100)),
+                        "strength_grade": str(rng.choice(["STRONG", "MODERATE", "WEAK"])),
+                        "vol_ratio": float(rng.uniform(0.5, 5))})
+    return sorted(signals, key=lambda s: s["ts"])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--symbols", type=int, default=50)
+    parser.add_argument("--days", type=float, default=3)
+    parser.add_argument("--signals", type=int, default=5000)
+    args = parser.parse_args()
+
+    t0, market = make_market(args.symbols, args.days)
+    signals = make_signals(t0, args.symbols, args.days, args.signals)
+    # 進場價用信號當下的 K 線開盤價
+    for s in signals:
+        market.now_ms = paper_replay._ts_ms(s["ts"])
+        s["entry_price"] = market.get_price(s["symbol"])
+    market.now_ms = 0
+
+    original = pt.get_prices
+    start = time.perf_counter()
+    result = paper_replay.replay(signals, market)
+    elapsed = time.perf_counter() - start
+    again = paper_replay.replay(signals, market)
+    assert pt.get_prices is original, "hook 未還原"
+    assert result == again, "重播結果不一致"
+
+    print(f"{args.symbols} symbols x {args.days:g} days 1m, {len(signals)} signals")
+    print(f"replay {elapsed:.2f}s ({len(signals) / elapsed:.0f} signals/s)")
+    print(paper_replay.summarize(result))
+    print("skipped: " + ", ".join(f"{k} {v}" for k, v in sorted(result["skipped"].items())))
+
+
+if __name__ == "__main__":
+    main()
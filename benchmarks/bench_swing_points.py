@@ -0,0 +1,79 @@
+"""
+Swing high/low 偵測 micro-benchmark
+對比原本逐根 all(...) 迴圈 vs ob_engine.find_swing_points (sliding window)
+同時驗證兩者結果完全一致
+
+用法: python benchmarks/bench_swing_points.py [--bars 1000] [--repeat 20]
+"""
+import sys, os
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import argparse
+import time
+import numpy as np
+
+from ob_engine import find_swing_points, find_order_blocks_v2
+
+
+def make_klines(n, seed=42, start=100.0):
+    """固定 seed 的 random walk K 線 (含 tie，避免只測到嚴格不等的情況)"""
+    rng = np.random.default_rng(seed)
+    closes = start * np.exp(np.cumsum(rng.normal(0, 0.004, n)))
+    closes = np.round(closes, 1)
+    opens = np.concatenate([[start], closes[:-1]])
+    spread = np.round(np.abs(rng.normal(0, 0.003, n)) * closes, 1)
+    highs = np.maximum(opens, closes) + spread
+    lows = np.minimum(opens, closes) - spread
+    vols = rng.lognormal(10, 0.5, n)
+    return [{"open": float(o), "high": float(h), "low": float(l), "close": float(c), "volume": float(v)}
+            for o, h, l, c, v in zip(opens, highs, lows, closes, vols)]
+
+
+def legacy_swing_points(highs, lows, swing_length):
+    """原版逐根判斷 (baseline)"""
+    sh, sl = [], []
+    for i in range(swing_length, len(highs) - swing_length - 1):
+        if all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
+           all(highs[i] > highs[i+j] for j in range(1, swing_length+1)):
+            sh.append(i)
+        if all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
+           all(lows[i] < lows[i+j] for j in range(1, swing_length+1)):
+            sl.append(i)
+    return sh, sl
+
+
+def bench(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'bars':>6} {'L':>3} {'legacy ms':>10} {'vector ms':>10} {'speedup':>8}")
+    for n in sorted({100, 500, args.bars}):
+        klines = make_klines(n)
+        highs = [k["high"] for k in klines]
+        lows = [k["low"] for k in klines]
+        for L in (2, 3, 5):
+            ref = legacy_swing_points(highs, lows, L)
+            sh, sl = find_swing_points(highs, lows, L)
+            assert (sh.tolist(), sl.tolist()) == ref, f"mismatch n={n} L={L}"
+            t_old = bench(lambda: legacy_swing_points(highs, lows, L), args.repeat)
+            t_new = bench(lambda: find_swing_points(highs, lows, L), args.repeat)
+            print(f"{n:>6} {L:>3} {t_old*1000:>10.3f} {t_new*1000:>10.3f} {t_old/t_new:>7.1f}x")
+
+    klines = make_klines(args.bars)
+    t = bench(lambda: find_order_blocks_v2(klines, 3), args.repeat)
+    print(f"\nfind_order_blocks_v2 ({args.bars} bars, L=3): {t*1000:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+"""
+benchmark 用的 HTTP fixture — 取代 requests.get / requests.post，並計算請求數
+
+- SyntheticExchange: 固定 seed 的假 Binance (合約 / 現貨 K 線、ticker、OI、資金費率)，
+  K 線以「目前這根」為基準往回排，任何時間跑結果都相同；部分幣種設定成會觸發信號
+- RecordedExchange : 重播 Recorder 錄下的真實回應 (benchmarks/fixtures/http.json)
+- 其他網址 (Grafana / Bybit / OKX / CoinGecko / Discord) 一律 404，讓程式走失敗分支
+"""
+import json
+import math
+import threading
+import time
+import zlib
+from collections import Counter
+from urllib.parse import urlsplit, parse_qsl
+
+import numpy as np
+import requests
+
+INTERVAL_MS = {"1m": 60000, "3m": 180000, "5m": 300000, "15m": 900000, "30m": 1800000,
+               "1h": 3600000, "2h": 7200000, "4h": 14400000, "6h": 21600000, "12h": 43200000,
+               "1d": 86400000}
+MAX_BARS = 1500                 # 每個 (幣, 週期) 產生的 K 線數 (= Binance 單次上限)
+VARIABLE_PARAMS = ("startTime", "endTime")   # 重播時不比對 (錄製當下的時間)
+
+
+def request_key(url, params=None):
+    """網址 + 參數 → 比對用的 key (參數排序，不含時間參數)"""
+    parts = urlsplit(url)
+    query = dict(parse_qsl(parts.query))
+    query.update({k: str(v) for k, v in (params or {}).items()})
+    query = sorted((k, v) for k, v in query.items() if k not in VARIABLE_PARAMS)
+    return parts.netloc + parts.path + ("?" + "&".join(f"{k}={v}" for k, v in query) if query else "")
+
+
+def _seed(*parts):
+    return zlib.crc32(":".join(str(p) for p in parts).encode())
+
+
+def _num(x):
+    return repr(round(float(x), 8))
+
+
+class SyntheticExchange:
+    """
+    假 Binance：n_symbols 個 USDT 永續 (BTC / ETH / SOL + C001...)
+    幣種類型: mover (24h ±10% 以上、1h ±3% 以上、OI 大變動) / spike (最新 5m 爆量急漲跌) /
+              pump (5m 連續拉升後收黑，RSI 高位) / quiet
+    """
+
+    def __init__(self, seed=7, n_symbols=150):
+        self.seed = seed
+        rng = np.random.default_rng(seed)
+        names = ["BTC", "ETH", "SOL"] + [f"C{k:03d}" for k in range(1, n_symbols - 2)]
+        anchors = {"BTC": 60000.0, "ETH": 3000.0, "SOL": 150.0}
+        self.profiles = {}
+        for k, base in enumerate(names):
+            kind = "quiet" if base in anchors else rng.choice(["mover", "spike", "pump", "quiet"], p=[0.3, 0.1, 0.15, 0.45])
+            sign = 1 if rng.random() < 0.5 else -1
+            self.profiles[base] = {
+                "kind": kind,
+                "price": anchors.get(base, float(10 ** rng.uniform(-3, 3.5))),
+                "quote_volume": float(10 ** rng.uniform(9, 10.5) if base in anchors else 10 ** rng.uniform(5.5, 9.2)),
+                "sigma": float(rng.uniform(0.004, 0.012)),   # 1h 報酬標準差
+                "change_24h": float(sign * rng.uniform(10, 30) if kind == "mover" else rng.normal(0, 3)),
+                "move_1h": float(sign * rng.uniform(3, 7) if kind == "mover" else 0),
+                "oi_change": float((1 if rng.random() < 0.6 else -1) * rng.uniform(6, 20) if kind == "mover"
+                                   else rng.normal(0, 2)),
+                "spike": float(sign * rng.uniform(2, 4) if kind == "spike" else 0),
+                "funding": float(rng.normal(0, 0.0002)),
+                "status": "SETTLING" if k % 61 == 60 else "TRADING",
+            }
+        self._series = {}
+        self._lock = threading.Lock()
+
+    # ─── K 線 ───
+
+    def _make_series(self, base, interval):
+        p = self.profiles[base]
+        step = INTERVAL_MS[interval]
+        rng = np.random.default_rng(_seed(self.seed, base, interval))
+        sigma = p["sigma"] * math.sqrt(step / 3600000)
+        r = rng.normal(0, sigma, MAX_BARS)
+        vol = rng.lognormal(0, 0.4, MAX_BARS)
+        if interval == "1h" and p["move_1h"]:
+            r[-1] = math.log(1 + p["move_1h"] / 100)
+        if interval == "5m" and p["spike"]:
+            r[-1] = math.log(1 + p["spike"] / 100)
+            vol[-1] *= 5
+        if interval == "5m" and p["kind"] == "pump":
+            r[-60:-3] = np.abs(r[-60:-3]) + 0.004
+            r[-3:] = -np.abs(r[-3:])
+        cum = np.cumsum(r)
+        closes = p["price"] * np.exp(cum - cum[-1])
+        opens = np.concatenate([[closes[0] * math.exp(-r[0])], closes[:-1]])
+        wick = np.abs(rng.normal(0, sigma / 2, (2, MAX_BARS)))
+        highs = np.maximum(opens, closes) * (1 + wick[0])
+        lows = np.minimum(opens, closes) / (1 + wick[1])
+        bars_per_day = 86400000 / step
+        volume = p["quote_volume"] / bars_per_day / p["price"] * vol
+        taker = volume * rng.uniform(0.3, 0.7, MAX_BARS)
+        return np.stack([opens, highs, lows, closes, volume, taker])
+
+    def series(self, base, interval):
+        key = (base, interval)
+        if key not in self._series:
+            with self._lock:
+                if key not in self._series:
+                    self._series[key] = self._make_series(base, interval)
+        return self._series[key]
+
+    def klines(self, symbol, interval, limit=500, start=None, end=None):
+        base = symbol[:-4]
+        step = INTERVAL_MS.get(interval)
+        if base not in self.profiles or step is None:
+            return None
+        limit = min(int(limit), MAX_BARS)
+        o, h, l, c, v, tb = self.series(base, interval)
+        last_open = int(time.time() * 1000) // step * step
+        times = last_open - (MAX_BARS - 1 - np.arange(MAX_BARS)) * step
+        lo = int(np.searchsorted(times, int(start))) if start is not None else 0
+        hi = int(np.searchsorted(times, int(end), side="right")) if end is not None else MAX_BARS
+        rows = range(lo, min(hi, lo + limit)) if start is not None else range(max(lo, hi - limit), hi)
+        return [[int(times[i]), _num(o[i]), _num(h[i]), _num(l[i]), _num(c[i]), _num(v[i]),
+                 int(times[i]) + step - 1, _num(v[i] * c[i]), 1000, _num(tb[i]), _num(tb[i] * c[i]), "0"]
+                for i in rows]
+
+    # ─── 其他端點 ───
+
+    def _usdt(self):
+        return [(base + "USDT", p) for base, p in self.profiles.items()]
+
+    def ticker_24hr(self, symbol=None):
+        rows = [{"symbol": s, "lastPrice": _num(p["price"]), "priceChangePercent": _num(p["change_24h"]),
+                 "quoteVolume": _num(p["quote_volume"]), "volume": _num(p["quote_volume"] / p["price"])}
+                for s, p in self._usdt()]
+        if symbol:
+            return next((r for r in rows if r["symbol"] == symbol), None)
+        return rows
+
+    def respond(self, url, params=None):
+        """→ (status, body)；body 為 JSON 可序列化物件"""
+        parts = urlsplit(url)
+        q = dict(parse_qsl(parts.query))
+        q.update({k: str(v) for k, v in (params or {}).items()})
+        path = parts.path
+        if parts.netloc not in ("fapi.binance.com", "api.binance.com"):
+            return 404, {}
+        symbol = q.get("symbol", "")
+        p = self.profiles.get(symbol[:-4]) if symbol.endswith("USDT") else None
+        now_ms = int(time.time() * 1000)
+
+        if path in ("/fapi/v1/klines", "/api/v3/klines"):
+            rows = self.klines(symbol, q.get("interval", ""), q.get("limit", 500), q.get("startTime"), q.get("endTime"))
+            return (200, rows) if rows is not None else (400, {"code": -1121, "msg": "Invalid symbol."})
+        if path == "/fapi/v1/exchangeInfo":
+            return 200, {"symbols": [{"symbol": s, "baseAsset": s[:-4], "status": p["status"]} for s, p in self._usdt()]}
+        if path == "/fapi/v1/ticker/24hr":
+            if symbol:
+                row = self.ticker_24hr(symbol)
+                return (200, row) if row else (400, {"code": -1121})
+            return 200, self.ticker_24hr()
+        if path == "/fapi/v1/ticker/price":
+            rows = [{"symbol": s, "price": _num(p["price"]), "time": now_ms} for s, p in self._usdt()]
+            if symbol:
+                return (200, next(r for r in rows if r["symbol"] == symbol)) if p else (400, {"code": -1121})
+            return 200, rows
+        if path == "/fapi/v1/premiumIndex":
+            rows = [{"symbol": s, "markPrice": _num(p["price"]), "lastFundingRate": _num(p["funding"]), "time": now_ms}
+                    for s, p in self._usdt()]
+            if symbol:
+                return (200, next(r for r in rows if r["symbol"] == symbol)) if p else (400, {"code": -1121})
+            return 200, rows
+        if not p:
+            return 400, {"code": -1121, "msg": "Invalid symbol."}
+        if path == "/fapi/v1/openInterest":
+            return 200, {"symbol": symbol, "openInterest": _num(p["quote_volume"] / p["price"] * 0.3), "time": now_ms}
+        if path == "/futures/data/openInterestHist":
+            limit = int(q.get("limit", 30))
+            value = p["quote_volume"] * 0.3
+            rows = []
+            for k in range(limit):
+                v = value / (1 + p["oi_change"] / 100) if k < limit - 1 else value
+                rows.append({"symbol": symbol, "sumOpenInterest": _num(v / p["price"]),
+                             "sumOpenInterestValue": _num(v), "timestamp": now_ms // 3600000 * 3600000 - (limit - 1 - k) * 3600000})
+            return 200, rows
+        if path == "/fapi/v1/fundingRate":
+            limit = int(q.get("limit", 100))
+            end = int(q.get("endTime", now_ms))
+            start = int(q.get("startTime", end - limit * 28800000))
+            first = -(-start // 28800000) * 28800000
+            times = [t for t in range(first, end + 1, 28800000)][:limit]
+            return 200, [{"symbol": symbol, "fundingTime": t, "fundingRate": _num(p["funding"])} for t in times]
+        return 404, {}
+
+
+class RecordedExchange:
+    """Recorder 存下的 {key: [status, body]}；沒錄到的請求回 404"""
+
+    def __init__(self, path):
+        with open(path) as f:
+            self.responses = json.load(f)["responses"]
+
+    def respond(self, url, params=None):
+        status, body = self.responses.get(request_key(url, params), [404, {}])
+        return status, body
+
+
+class Recorder:
+    """包住真的 requests.get，把回應依 request_key 存起來 (save 寫檔)"""
+
+    def __init__(self, get=requests.get):
+        self.get = get
+        self.responses = {}
+
+    def respond(self, url, params=None):
+        try:
+            r = self.get(url, params=params, timeout=15)
+            body = r.json()
+            status = r.status_code
+        except:
+            status, body = 404, {}
+        self.responses[request_key(url, params)] = [status, body]
+        return status, body
+
+    def save(self, path):
+        with open(path, "w") as f:
+            json.dump({"recorded_at": int(time.time() * 1000), "responses": self.responses}, f)
+
+
+class FakeResponse:
+    def __init__(self, status_code, body):
+        self.status_code = status_code
+        self.text = json.dumps(body)
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code}")
+
+
+class HttpFixture:
+    """
+    patch requests.get / post / put 到 source.respond，依 host 統計請求數
+    (Discord webhook 的 post / put 一律回 204)
+    """
+
+    def __init__(self, source):
+        self.source = source
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._saved = None
+
+    def _count(self, url):
+        with self._lock:
+            self.counts[urlsplit(url).netloc] += 1
+
+    def get(self, url, params=None, **kwargs):
+        self._count(url)
+        return FakeResponse(*self.source.respond(url, params))
+
+    def post(self, url, *args, **kwargs):
+        self._count(url)
+        return FakeResponse(204, {})
+
+    put = post
+
+    @property
+    def total(self):
+        return sum(self.counts.values())
+
+    def reset(self):
+        self.counts.clear()
+
+    def install(self):
+        self._saved = (requests.get, requests.post, requests.put)
+        requests.get, requests.post, requests.put = self.get, self.post, self.put
+        return self
+
+    def uninstall(self):
+        if self._saved:
+            requests.get, requests.post, requests.put = self._saved
+            self._saved = None
@@ -6,6 +6,9 @@ import os
 import json
 from datetime import datetime
 
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
 # 使用共用模組
 from config import (
     BREAKOUT_STATE_FILE,
@@ -17,6 +20,7 @@ from config import (
 CHANNEL_ID = DISCORD_THREAD_TECH
 from exchange_api import get_klines
 from notify import send_discord_message
+from indicators import rsi as calc_rsi_value
 
 
 
@@ -87,14 +91,7 @@ def calc_rsi(closes, period=14):
     """計算 RSI"""
     if len(closes) < period+1:
         return 50
-    gains, losses = [], []
-    for i in range(len(closes)-period, len(closes)):
-        d = closes[i] - closes[i-1]
-        gains.append(d if d > 0 else 0)
-        losses.append(-d if d < 0 else 0)
-    ag = sum(gains)/len(gains)
-    al = sum(losses)/len(losses) if sum(losses) > 0 else 0.001
-    return 100-(100/(1+ag/al))
+    return calc_rsi_value(closes, period, method="sma_last", zero_loss="floor")
 
 
 def check_breakout(symbol, name, level, direction, state, now):
@@ -223,6 +220,88 @@ def check_breakout(symbol, name, level, direction, state, now):
     state[key] = s
 
 
+def backtest_grid(klines, levels, directions=("above", "below"), hold=24):
+    """
+    一次回測整組關卡 × 方向 (結果同對每個關卡各跑一次原本的逐根迴圈)
+    - 穿越: 收盤價相對關卡的位置 (>= / <=) 在 i-2 → i-1 改變 (i=1 時 i-2 為最後一根，同原本 list 索引)
+    - 向前 hold 根: sliding_window_view，假突破 (收盤 < 關卡×0.997) 取第一根
+    - 持倉期間的新觸發跳過 (依序挑，只對觸發點跑 Python 迴圈)
+    Returns: {(direction, level): [breakout dict...]}
+    """
+    n = len(klines)
+    result = {(d, level): [] for d in directions for level in levels}
+    if n < 7 or not len(levels):
+        return result
+    times = [k["open_time"] for k in klines]
+    opens = [k["open"] for k in klines]
+    vols = [k["volume"] for k in klines]
+    c = np.array([k["close"] for k in klines], dtype=float)
+    lv = np.asarray(levels, dtype=float)
+
+    bars = np.arange(1, n - 5)
+    pad = np.full(hold - 1, np.nan)
+    win_c = sliding_window_view(np.concatenate([c, pad]), hold)
+    win_l = sliding_window_view(np.concatenate([[k["low"] for k in klines], pad]), hold)
+    win_h = sliding_window_view(np.concatenate([[k["high"] for k in klines], pad]), hold)
+    steps = np.arange(hold)
+
+    for direction in directions:
+        side = c[:, None] >= lv if direction == "above" else c[:, None] <= lv
+        trig = side[bars - 1] & ~side[(bars - 2) % n]
+        ti, li = np.nonzero(trig)                   # 依 K 線順序
+        i = bars[ti]
+        if not len(i):
+            continue
+        entry = np.array(opens, dtype=float)[i][:, None]
+        inside = steps < np.minimum(hold, n - i)[:, None]
+        if direction == "above":
+            fail = inside & (win_c[i] < (lv[li] * 0.997)[:, None])
+            failed = fail.any(axis=1)
+            held = np.where(failed, fail.argmax(axis=1), inside.sum(axis=1))
+            pnl = (win_c[i] - entry) / entry * 100
+            dd = (win_l[i] - entry) / entry * 100
+        else:
+            failed = np.zeros(len(i), dtype=bool)
+            held = inside.sum(axis=1)
+            pnl = (entry - win_c[i]) / entry * 100
+            dd = (entry - win_h[i]) / entry * 100
+        counted = steps < held[:, None]
+        max_profit = np.maximum(np.where(counted, pnl, 0.0).max(axis=1), 0.0)     # 起始值 0
+        max_dd = np.minimum(np.where(counted, dd, 0.0).min(axis=1), 0.0)
+        final_price = c[np.minimum(i + hold - 1, n - 1)]
+        final_pnl = (final_price - entry[:, 0]) / entry[:, 0] * 100 if direction == "above" \
+            else (entry[:, 0] - final_price) / entry[:, 0] * 100
+
+        done = set()
+        for k, level in enumerate(levels):
+            if level in done:       # 重複的關卡
+                continue
+            done.add(level)
+            free = 1
+            out = result[(direction, level)]
+            for r in np.flatnonzero(li == k).tolist():
+                bar = int(i[r])
+                if bar < free:
+                    continue
+                avg_vol = sum(vols[max(0, bar-11):bar-1]) / min(10, max(1, bar-1))
+                vol_ratio = vols[bar-1] / avg_vol if avg_vol > 0 else 1
+                t = datetime.fromtimestamp(times[bar]/1000, tz=TW_TIMEZONE)
+                out.append({
+                    "time": t.strftime("%m/%d %H:%M"),
+                    "entry": opens[bar],
+                    "vol_ratio": vol_ratio,
+                    "held": int(held[r]),
+                    "max_profit": float(max_profit[r]),
+                    "max_dd": float(max_dd[r]),
+                    "final_pnl": float(final_pnl[r]),
+                    "failed": bool(failed[r]),
+                    "fail_bar": int(held[r]) if failed[r] else 0,
+                    "vol_confirmed": vol_ratio >= 1.2
+                })
+                free = bar + int(held[r]) + 1
+    return result
+
+
 def backtest(symbol, name, level, direction, days=30):
     """回測突破策略（保留原始功能）"""
     klines = get_klines(symbol, "1h", min(days*24, 1000))
@@ -230,70 +309,7 @@ def backtest(symbol, name, level, direction, days=30):
         print(f"{name}: 資料不足")
         return
     
-    # 轉換格式
-    candles = [{"t": k["open_time"], "o": k["open"], "h": k["high"],
-                "l": k["low"], "c": k["close"], "v": k["volume"]} for k in klines]
-
-    breakouts = []
-    i = 1
-
-    while i < len(candles) - 5:
-        prev_c = candles[i-1]["c"]
-        if direction == "above":
-            triggered = prev_c >= level and candles[i-2]["c"] < level
-        else:
-            triggered = prev_c <= level and candles[i-2]["c"] > level
-
-        if not triggered:
-            i += 1
-            continue
-
-        avg_vol = sum(c["v"] for c in candles[max(0,i-11):i-1]) / min(10, max(1, i-1))
-        vol_ratio = candles[i-1]["v"] / avg_vol if avg_vol > 0 else 1
-
-        held = 0
-        max_profit = 0
-        max_dd = 0
-        entry = candles[i]["o"]
-        failed = False
-        fail_bar = 0
-
-        for j in range(i, min(i+24, len(candles))):
-            p = candles[j]["c"]
-            if direction == "above":
-                pnl = (p - entry) / entry * 100
-                dd = (candles[j]["l"] - entry) / entry * 100
-                if p < level * 0.997:
-                    failed = True
-                    fail_bar = j - i
-                    break
-            else:
-                pnl = (entry - p) / entry * 100
-                dd = (entry - candles[j]["h"]) / entry * 100
-            max_profit = max(max_profit, pnl)
-            max_dd = min(max_dd, dd)
-            held += 1
-
-        final_price = candles[min(i+23, len(candles)-1)]["c"]
-        if direction == "above":
-            final_pnl = (final_price - entry) / entry * 100
-        else:
-            final_pnl = (entry - final_price) / entry * 100
-
-        t = datetime.fromtimestamp(candles[i]["t"]/1000, tz=TW_TIMEZONE)
-        breakouts.append({
-            "time": t.strftime("%m/%d %H:%M"),
-            "entry": entry,
-            "vol_ratio": vol_ratio,
-            "held": held,
-            "max_profit": max_profit,
-            "max_dd": max_dd,
-            "final_pnl": final_pnl,
-            "failed": failed,
-            "fail_bar": fail_bar,
-            "vol_confirmed": vol_ratio >= 1.2
-        })
-        i += held + 1
+    breakouts = backtest_grid(klines, [level], [direction])[(direction, level)]
 
     if not breakouts:
         print(f"\n{name} ${level:,} {'突破' if direction=='above' else '跌破'}: 過去{days}天無觸發")
@@ -334,6 +350,46 @@ def backtest(symbol, name, level, direction, days=30):
         print(f"  {b['time']} | 入場${b['entry']:,.0f} | Vol {b['vol_ratio']:.1f}x {vol_tag} | PnL {b['final_pnl']:+.2f}% | Max +{b['max_profit']:.2f}%/-{abs(b['max_dd']):.2f}% | {fail_tag}")
 
 
+def summarize(breakouts):
+    """一組突破結果的統計 (次數 / 勝率 / 假突破率 / 平均 PnL)"""
+    total = len(breakouts)
+    if not total:
+        return {"total": 0}
+    wins = sum(1 for b in breakouts if b["final_pnl"] > 0)
+    return {
+        "total": total,
+        "win_rate": wins / total * 100,
+        "false_rate": sum(1 for b in breakouts if b["failed"]) / total * 100,
+        "avg_pnl": sum(b["final_pnl"] for b in breakouts) / total,
+        "avg_max_profit": sum(b["max_profit"] for b in breakouts) / total,
+        "avg_max_dd": sum(b["max_dd"] for b in breakouts) / total,
+    }
+
+
+def scan_levels(symbol, name, days=30, steps=40, min_trades=3, top=5):
+    """K 線區間內等距 steps 個關卡 × 多空一次回測，依平均 PnL 列出前幾名 (挑 breakout_levels.json 用)"""
+    klines = get_klines(symbol, "1h", min(days*24, 1000))
+    if not klines or len(klines) < 50:
+        print(f"{name}: 資料不足")
+        return
+    closes = [k["close"] for k in klines]
+    levels = sorted({float(f"{x:.3g}") for x in np.linspace(min(closes), max(closes), steps)})
+    grid = backtest_grid(klines, levels)
+
+    print(f"\n{'='*60}")
+    print(f"📊 {name} 關卡掃描 ({days}天, {len(levels)} 個關卡, 現價 ${closes[-1]:,})")
+    print(f"{'='*60}")
+    for direction, label in (("above", "突破"), ("below", "跌破")):
+        rows = [(level, summarize(grid[(direction, level)])) for level in levels]
+        rows = sorted([r for r in rows if r[1]["total"] >= min_trades], key=lambda r: -r[1]["avg_pnl"])
+        print(f"\n{label} (至少 {min_trades} 次):")
+        if not rows:
+            print("  無")
+        for level, st in rows[:top]:
+            print(f"  ${level:>12,} | {st['total']:>2}次 | 勝率 {st['win_rate']:>3.0f}% | 假突破 {st['false_rate']:>3.0f}% | "
+                  f"PnL {st['avg_pnl']:+.2f}% | Max +{st['avg_max_profit']:.2f}%/-{abs(st['avg_max_dd']):.2f}%")
+
+
 def main():
     """主程序"""
     import sys
@@ -350,6 +406,14 @@ def main():
                 backtest(symbol, cfg["name"], cfg["below"], "below", days)
         return
 
+    # 關卡掃描模式: python breakout_alert.py grid [天數] [關卡數]
+    if len(sys.argv) > 1 and sys.argv[1] == "grid":
+        days = int(sys.argv[2]) if len(sys.argv) > 2 else 30
+        steps = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+        for symbol, cfg in load_levels().items():
+            scan_levels(symbol, cfg["name"], days, steps)
+        return
+
     # 監控模式
     state = load_state()
     levels = load_levels()
@@ -41,16 +41,24 @@ OI_5MIN_SNAPSHOT_FILE = os.path.join(STATE_DIR, "oi_5min_snapshots.json")
 OI_5MIN_ALERT_HISTORY = os.path.join(STATE_DIR, "oi_5min_alerts.json")
 
 # Paper Trading
-PAPER_STATE_FILE = os.path.join(STATE_DIR, "paper_state.json")
+PAPER_STATE_FILE = os.path.join(STATE_DIR, "paper_state.json")      # 舊格式，只用來 bootstrap
+PAPER_EVENT_LOG_FILE = os.path.join(STATE_DIR, "paper_events.jsonl")
+PAPER_SNAPSHOT_FILE = os.path.join(STATE_DIR, "paper_snapshot.json")
+PAPER_SNAPSHOT_EVERY = 100      # 每 100 個事件重建一次快照
+PAPER_RECENT_CLOSED = 50        # 寫入端只留最近 50 筆平倉紀錄 (SL 冷卻 / 當日黑名單只看這些)
 
 # Monitor 系統
 MONITOR_SIGNALS_FILE = os.path.join(STATE_DIR, "monitor_signals.json")
 OB_STATE_FILE = os.path.join(STATE_DIR, "ob_state.json")
+OB_ENGINE_STATE_FILE = os.path.join(STATE_DIR, "ob_engine_state.json")
+ADVISOR_OB_ENGINE_STATE_FILE = os.path.join(STATE_DIR, "advisor_ob_engine_state.json")
+INDICATOR_STREAM_STATE_FILE = os.path.join(STATE_DIR, "indicator_stream_state.json")
 BREAKOUT_STATE_FILE = os.path.join(STATE_DIR, "breakout_state.json")
 PULLBACK_STATE_FILE = os.path.join(STATE_DIR, "pullback_state.json")
 DUMP_WARNING_STATE_FILE = os.path.join(STATE_DIR, "dump_warning_state.json")
 FLASH_CRASH_STATE_FILE = os.path.join(STATE_DIR, "flash_crash_state.json")
 BREAKOUT_LEVELS_FILE = os.path.join(STATE_DIR, "breakout_levels.json")
+INDICATOR_CACHE_FILE = os.path.join(STATE_DIR, "indicator_cache.db")
 
 # Signal Tracker
 SIGNAL_TRACKER_FILE = os.path.join(STATE_DIR, "signal_tracker.json")
@@ -102,6 +110,10 @@ PAPER_CONFIG = {
     "time_exit_hours": 6       # 時間出場（小時）
 }
 
+# 持倉檢查用 1m K 線重播區間內的價格路徑 (陽線 O-L-H-C，其餘 O-H-L-C)
+PAPER_INTRABAR_INTERVAL = "1m"
+PAPER_INTRABAR_MAX_BARS = 1500  # 單次最多回補的 K 線數 (Binance 上限)
+
 # 動態 TP/SL（基於信號強度）
 DYNAMIC_TP_CONFIG = {
     "S": {"tp1": 3, "tp2": 7, "sl": 7},     # S 級信號
@@ -124,6 +136,9 @@ FUNDING_RATE_THRESHOLD_SHORT = 0.0     # SHORT 擋正費率（FR>0% 做空勝率
 # Grafana OI Dashboard API
 GRAFANA_OI_URL = "http://gf.wavelet.pro:3000/api/datasources/proxy/uid/faad6586-bcc7-4462-b66c-4d3fb4d2610c/oi"
 GRAFANA_SNAPSHOT_DIR = os.path.join(os.path.expanduser("~"), ".openclaw", "grafana_snapshots")
+GRAFANA_CACHE_TTL_SEC = 60              # 整份 payload 在記憶體沿用 60 秒
+GRAFANA_SNAPSHOT_MAX_AGE_SEC = 600      # collector 最新快照 10 分鐘內直接用，不再打 API
+GRAFANA_MAX_STALE_SEC = 900             # 更新一直失敗時，舊資料最多沿用 15 分鐘，之後查詢回傳 {}
 
 # RSI 過濾
 RSI_EXTREME_HIGH = 80          # RSI >= 80 極端超買
@@ -209,6 +224,10 @@ DUMP_WARNING_THRESHOLD = -5        # 5分鐘跌幅 <= -5%
 DUMP_WARNING_EXTREME = -8          # 極端暴跌 <= -8%
 FLASH_CRASH_THRESHOLD = -10        # 閃崩 <= -10%
 
+# OB 狀態追蹤 (ob_store)
+OB_STATE_TTL_HOURS = 72            # 超過 72 小時沒出現的 OB 淘汰
+OB_STATE_MAX_PER_SYMBOL = 50       # 每幣最多保留的 OB 狀態數 (LRU)
+
 # 突破監控
 BREAKOUT_THRESHOLD = 5             # 突破幅度 >= 5%
 BREAKOUT_VOLUME_MULTIPLIER = 2.0   # 成交量倍數 >= 2x
@@ -216,6 +235,11 @@ BREAKOUT_VOLUME_MULTIPLIER = 2.0   # 成交量倍數 >= 2x
 # 回調監控
 PULLBACK_THRESHOLD = 3             # 回調幅度 >= 3%
 
+# OB/FVG 監控清單
+MONITOR_SYMBOLS = ["BTCUSDT", "ETHUSDT"]                          # 固定清單
+MONITOR_TOP_N = int(os.environ.get("MONITOR_TOP_N", "0"))          # > 0 改用 24h 成交額前 N 名永續
+MONITOR_MAX_WORKERS = int(os.environ.get("MONITOR_MAX_WORKERS", "8"))  # 同時分析的幣種數
+
 # ============================================================
 # API 相關設定
 # ============================================================
@@ -231,6 +255,9 @@ API_RETRY_DELAY = 1  # 秒
 # Rate Limit
 API_RATE_LIMIT_DELAY = 0.1  # 秒，避免觸發 rate limit
 
+# 價格快照
+PRICE_MAX_AGE_SEC = 30  # 最新成交時間超過 30 秒視為過舊 (stale)
+
 # ============================================================
 # 排除清單
 # ============================================================
@@ -246,6 +273,17 @@ ATR_PERIOD = 14
 BOLLINGER_PERIOD = 20
 BOLLINGER_STD = 2
 
+# 跨腳本指標快取 (indicator_cache)
+INDICATOR_CACHE_CLOSED_BARS = 100  # 跨腳本共用的已收盤收盤價序列長度 (各 RSI 變體從尾段取用)
+INDICATOR_CACHE_KEEP_HOURS = 48     # 超過 48 小時的快取列清除
+
+# ============================================================
+# 回測 (backtest 套件)
+# ============================================================
+BACKTEST_CACHE_DIR = os.path.join(STATE_DIR, "backtest_cache")   # 歷史 K 線 / 資金費率快取 (npz)
+BACKTEST_WORKERS = 4            # 依幣種分片的 process 數 (1 = 不開 process)
+BACKTEST_SWEEP_DIR = os.path.join(STATE_DIR, "backtest_sweeps")  # 參數掃描 checkpoint (jsonl) / 排名表 (csv)
+
 # ============================================================
 # 其他設定
 # ============================================================
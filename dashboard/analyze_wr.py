@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """勝率優化分析 — 找出能推到 55%+ 的條件組合"""
-import json
+import os, sys
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
 
-with open('/Users/xuan/.openclaw/paper_state.json') as f:
-    data = json.load(f)
+from paper_store import load_paper_state
+
+data = load_paper_state()
 
 trades = data.get('closed', [])
 capital = data.get('capital', 10000)
@@ -2,26 +2,34 @@
 """
 Crypto Monitor Dashboard — 簡約可視化儀表板
 本地 HTTP server，讀取 state files 提供 API + 前端頁面
+多執行緒；JSON / 靜態檔 gzip，ETag 依資料版本 (檔案 mtime / size) 產生，沒變回 304
 """
+import gzip
+import hashlib
 import json
 import os
 import sys
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+import threading
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
 from urllib.parse import urlparse, parse_qs
 from datetime import datetime, timezone, timedelta
 
 # Paths
 STATE_DIR = os.path.expanduser("~/.openclaw")
-PAPER_STATE = os.path.join(STATE_DIR, "paper_state.json")
 SIGNALS_FILE = os.path.join(STATE_DIR, "oi_signals_local_v2.json")
 OI_5MIN_ALERTS = os.path.join(STATE_DIR, "oi_5min_alerts.json")
 PENDING_FILE = os.path.join(STATE_DIR, "oi_pending_v2.json")
 
 TW = timezone(timedelta(hours=8))
+JSON_TYPE = "application/json; charset=utf-8"
+GZIP_LEVEL = 6
 
 # Add parent dir for imports
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
 
+from config import PAPER_EVENT_LOG_FILE, PAPER_STATE_FILE, PAPER_CONFIG
+from paper_store import PaperProjection
+
 
 def load_json(path):
     try:
@@ -31,142 +39,228 @@ def load_json(path):
         return None
 
 
-def get_paper_stats():
-    data = load_json(PAPER_STATE)
-    if not data:
-        return {"error": "no data"}
-
-    trades = data.get("closed", [])
-    positions = data.get("positions", [])
-    capital = data.get("capital", 10000)
-
-    # Capital curve
-    cap_curve = [10000]
-    running = 10000
-    for t in trades:
-        running += t.get("pnl_usd", 0)
-        cap_curve.append(round(running, 2))
-
-    # Win rate over time (rolling 20)
-    wr_curve = []
-    for i in range(20, len(trades) + 1):
-        window = trades[i-20:i]
-        wins = sum(1 for t in window if t.get("pnl_usd", 0) > 0)
-        wr_curve.append(round(wins / 20 * 100, 1))
-
-    # Overall stats
-    total = len(trades)
-    wins = sum(1 for t in trades if t.get("pnl_usd", 0) > 0)
-    total_pnl = sum(t.get("pnl_usd", 0) for t in trades)
-
-    # By direction
-    dir_stats = {}
-    for d in ["LONG", "SHORT"]:
-        subset = [t for t in trades if t.get("direction") == d]
-        w = sum(1 for t in subset if t.get("pnl_usd", 0) > 0)
-        pnl = sum(t.get("pnl_usd", 0) for t in subset)
-        dir_stats[d] = {
-            "count": len(subset),
-            "wins": w,
-            "wr": round(w / len(subset) * 100, 1) if subset else 0,
-            "pnl": round(pnl, 2)
+def _group(stats, key):
+    if key not in stats:
+        stats[key] = {"count": 0, "pnl": 0, "wins": 0}
+    return stats[key]
+
+
+def _rounded(stats):
+    out = {}
+    for key, v in stats.items():
+        out[key] = {"count": v["count"], "pnl": round(v["pnl"], 2), "wins": v["wins"],
+                    "wr": round(v["wins"] / v["count"] * 100, 1) if v["count"] else 0}
+    return out
+
+
+class TradeStats:
+    """平倉紀錄的累計統計；新紀錄用 add() 接著累加 (累加順序同整份重算，結果一致)"""
+    WINDOW = 20     # 滾動勝率筆數
+
+    def __init__(self):
+        self.n = 0
+        self.wins = 0
+        self.total_pnl = 0
+        self.running = 10000
+        self.cap_curve = [10000]
+        self.wr_curve = []
+        self.flags = []         # 每筆是否獲利 (滾動窗口移出用)
+        self.window_wins = 0
+        self.dir_stats = {d: {"count": 0, "wins": 0, "pnl": 0} for d in ("LONG", "SHORT")}
+        self.exit_stats = {}
+        self.grade_stats = {}
+        self.phase_stats = {}
+        self.daily_pnl = {}
+
+    def add(self, trades):
+        for t in trades:
+            pnl = t.get("pnl_usd", 0)
+            win = pnl > 0
+            self.running += pnl
+            self.cap_curve.append(round(self.running, 2))
+
+            # 滾動 20 筆勝率：進一筆、出一筆
+            self.flags.append(win)
+            self.window_wins += win
+            if self.n >= self.WINDOW:
+                self.window_wins -= self.flags[self.n - self.WINDOW]
+            self.n += 1
+            if self.n >= self.WINDOW:
+                self.wr_curve.append(round(self.window_wins / self.WINDOW * 100, 1))
+
+            self.wins += win
+            self.total_pnl += pnl
+            d = self.dir_stats.get(t.get("direction"))
+            for g in (d, _group(self.exit_stats, t.get("reason", "unknown")),
+                      _group(self.grade_stats, t.get("strength_grade", "unknown")),
+                      _group(self.phase_stats, t.get("phase", "unknown"))):
+                if g is not None:
+                    g["count"] += 1
+                    g["pnl"] += pnl
+                    g["wins"] += win
+            day = t.get("closed_at", "")[:10]
+            if day:
+                self.daily_pnl[day] = self.daily_pnl.get(day, 0) + pnl
+
+    def result(self, trades, positions, capital):
+        dir_stats = {d: {"count": v["count"], "wins": v["wins"],
+                         "wr": round(v["wins"] / v["count"] * 100, 1) if v["count"] else 0,
+                         "pnl": round(v["pnl"], 2)}
+                     for d, v in self.dir_stats.items()}
+
+        # Recent trades
+        recent = []
+        for t in trades[-30:]:
+            recent.append({
+                "symbol": t.get("symbol", "?"),
+                "direction": t.get("direction", "?"),
+                "entry": t.get("entry", 0),
+                "exit": t.get("exit", 0),
+                "pnl_pct": round(t.get("pnl_pct", 0), 2),
+                "pnl_usd": round(t.get("pnl_usd", 0), 2),
+                "reason": t.get("reason", "?"),
+                "grade": t.get("strength_grade", "?"),
+                "phase": t.get("phase", "?"),
+                "rsi": round(t.get("rsi", 0), 1),
+                "vol_ratio": round(t.get("vol_ratio", 0), 2),
+                "closed_at": t.get("closed_at", "")[:19]
+            })
+
+        # Open positions
+        open_pos = []
+        for p in (positions if isinstance(positions, list) else []):
+            open_pos.append({
+                "symbol": p.get("symbol", "?"),
+                "direction": p.get("direction", "?"),
+                "entry": p.get("entry", 0),
+                "grade": p.get("strength_grade", "?"),
+                "phase": p.get("phase", "?"),
+                "opened_at": p.get("opened_at", p.get("open_time", ""))[:19]
+            })
+
+        return {
+            "capital": round(capital, 2),
+            "total_trades": self.n,
+            "win_rate": round(self.wins / self.n * 100, 1) if self.n else 0,
+            "total_pnl": round(self.total_pnl, 2),
+            "open_positions": open_pos,
+            "capital_curve": self.cap_curve,
+            "wr_curve": self.wr_curve,
+            "dir_stats": dir_stats,
+            "exit_stats": _rounded(self.exit_stats),
+            "grade_stats": _rounded(self.grade_stats),
+            "phase_stats": _rounded(self.phase_stats),
+            "recent_trades": recent,
+            "daily_pnl": {k: round(v, 2) for k, v in sorted(self.daily_pnl.items())}
         }
 
-    # By exit reason
-    exit_stats = {}
-    for t in trades:
-        reason = t.get("reason", "unknown")
-        if reason not in exit_stats:
-            exit_stats[reason] = {"count": 0, "pnl": 0, "wins": 0}
-        exit_stats[reason]["count"] += 1
-        exit_stats[reason]["pnl"] += t.get("pnl_usd", 0)
-        if t.get("pnl_usd", 0) > 0:
-            exit_stats[reason]["wins"] += 1
-    for v in exit_stats.values():
-        v["pnl"] = round(v["pnl"], 2)
-        v["wr"] = round(v["wins"] / v["count"] * 100, 1) if v["count"] else 0
-
-    # By grade
-    grade_stats = {}
-    for t in trades:
-        g = t.get("strength_grade", "unknown")
-        if g not in grade_stats:
-            grade_stats[g] = {"count": 0, "pnl": 0, "wins": 0}
-        grade_stats[g]["count"] += 1
-        grade_stats[g]["pnl"] += t.get("pnl_usd", 0)
-        if t.get("pnl_usd", 0) > 0:
-            grade_stats[g]["wins"] += 1
-    for v in grade_stats.values():
-        v["pnl"] = round(v["pnl"], 2)
-        v["wr"] = round(v["wins"] / v["count"] * 100, 1) if v["count"] else 0
-
-    # By phase
-    phase_stats = {}
-    for t in trades:
-        p = t.get("phase", "unknown")
-        if p not in phase_stats:
-            phase_stats[p] = {"count": 0, "pnl": 0, "wins": 0}
-        phase_stats[p]["count"] += 1
-        phase_stats[p]["pnl"] += t.get("pnl_usd", 0)
-        if t.get("pnl_usd", 0) > 0:
-            phase_stats[p]["wins"] += 1
-    for v in phase_stats.values():
-        v["pnl"] = round(v["pnl"], 2)
-        v["wr"] = round(v["wins"] / v["count"] * 100, 1) if v["count"] else 0
-
-    # Recent trades
-    recent = []
-    for t in trades[-30:]:
-        recent.append({
-            "symbol": t.get("symbol", "?"),
-            "direction": t.get("direction", "?"),
-            "entry": t.get("entry", 0),
-            "exit": t.get("exit", 0),
-            "pnl_pct": round(t.get("pnl_pct", 0), 2),
-            "pnl_usd": round(t.get("pnl_usd", 0), 2),
-            "reason": t.get("reason", "?"),
-            "grade": t.get("strength_grade", "?"),
-            "phase": t.get("phase", "?"),
-            "rsi": round(t.get("rsi", 0), 1),
-            "vol_ratio": round(t.get("vol_ratio", 0), 2),
-            "closed_at": t.get("closed_at", "")[:19]
-        })
 
-    # Open positions
-    open_pos = []
-    for p in (positions if isinstance(positions, list) else []):
-        open_pos.append({
-            "symbol": p.get("symbol", "?"),
-            "direction": p.get("direction", "?"),
-            "entry": p.get("entry", 0),
-            "grade": p.get("strength_grade", "?"),
-            "phase": p.get("phase", "?"),
-            "opened_at": p.get("opened_at", p.get("open_time", ""))[:19]
-        })
+class PaperStatsCache:
+    """
+    /api/stats 快取
+    - 事件紀錄 (沒有時用舊 paper_state.json) 的 mtime / size 沒變 → 直接回上次結果
+    - 只多了新事件 → PaperProjection.catch_up 只讀新增部分，新的平倉紀錄累加進 TradeStats
+    - reset / truncate 事件、檔案被截短或整個換掉 (已讀部分的結尾對不上)、舊格式檔不是單純 append → 整份重算
+    """
+    TAIL_BYTES = 64
+
+    def __init__(self, log_path=PAPER_EVENT_LOG_FILE, legacy_path=PAPER_STATE_FILE):
+        self.log_path = log_path
+        self.legacy_path = legacy_path
+        self.version = None     # (來源檔, inode, mtime_ns, size)
+        self.result = None
+        self.lock = threading.Lock()
+        self._rebuild()
+
+    def _rebuild(self):
+        self.source = None
+        self.projection = PaperProjection()
+        self.trades = []
+        self.tail = b""
+        self.stats = TradeStats()
+
+    def _version(self):
+        for path in (self.log_path, self.legacy_path):
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if st.st_size > 0:
+                return (path, st.st_ino, st.st_mtime_ns, st.st_size)
+        return None
+
+    def _read_tail(self):
+        """已讀位移前的最後 TAIL_BYTES bytes (比對檔案是否只是接著 append)"""
+        start = max(0, self.projection.offset - self.TAIL_BYTES)
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(start)
+                return f.read(self.projection.offset - start)
+        except OSError:
+            return None
+
+    def _catch_up_events(self, version):
+        appended = (self.source == "events" and version[3] >= self.projection.offset
+                    and self._read_tail() == self.tail)
+        if not appended:
+            self._rebuild()
+            self.source = "events"
+        n = len(self.projection.closed)
+        events = self.projection.catch_up(self.log_path)
+        if any(e["type"] in ("reset", "truncate") for e in events):
+            self.stats = TradeStats()
+            n = 0
+        self.tail = self._read_tail()
+        self.trades = self.projection.closed
+        self.stats.add(self.trades[n:])
+        return self.projection.state()
+
+    def _read_legacy(self):
+        data = load_json(self.legacy_path) or {}
+        trades = data.get("closed", [])
+        n = self.stats.n
+        appended = (self.source == "legacy" and len(trades) >= n
+                    and (n == 0 or trades[n - 1] == self.trades[n - 1]))
+        if not appended:
+            self._rebuild()
+            self.source = "legacy"
+            n = 0
+        self.trades = trades
+        self.stats.add(trades[n:])
+        return {"positions": data.get("positions", []), "closed": trades,
+                "capital": data.get("capital", PAPER_CONFIG["capital"])}
+
+    def versioned(self):
+        """→ (result, version)；ThreadingHTTPServer 的各執行緒共用，更新時加鎖"""
+        with self.lock:
+            version = self._version()
+            if self.result is None or version != self.version:
+                self._refresh(version)
+            return self.result, self.version
+
+    def get(self):
+        return self.versioned()[0]
+
+    def _refresh(self, version):
+        if version is None:
+            self._rebuild()
+            data = {"positions": [], "closed": [], "capital": PAPER_CONFIG["capital"]}
+        elif version[0] == self.log_path:
+            data = self._catch_up_events(version)
+        else:
+            data = self._read_legacy()
+        if not data["closed"] and not data["positions"]:
+            self.result = {"error": "no data"}
+        else:
+            self.result = self.stats.result(self.trades, data["positions"], data.get("capital", 10000))
+        self.version = version
+
 
-    # Daily PnL
-    daily_pnl = {}
-    for t in trades:
-        day = t.get("closed_at", "")[:10]
-        if day:
-            daily_pnl[day] = daily_pnl.get(day, 0) + t.get("pnl_usd", 0)
-    daily_pnl = {k: round(v, 2) for k, v in sorted(daily_pnl.items())}
-
-    return {
-        "capital": round(capital, 2),
-        "total_trades": total,
-        "win_rate": round(wins / total * 100, 1) if total else 0,
-        "total_pnl": round(total_pnl, 2),
-        "open_positions": open_pos,
-        "capital_curve": cap_curve,
-        "wr_curve": wr_curve,
-        "dir_stats": dir_stats,
-        "exit_stats": exit_stats,
-        "grade_stats": grade_stats,
-        "phase_stats": phase_stats,
-        "recent_trades": recent,
-        "daily_pnl": daily_pnl
-    }
+_paper_stats = PaperStatsCache()
+
+
+def get_paper_stats():
+    return _paper_stats.get()
 
 
 def get_signals(limit=50):
@@ -190,6 +284,50 @@ def get_signals(limit=50):
     return signals
 
 
+def file_version(path):
+    """檔案版本 (inode, mtime_ns, size)，不存在為 None"""
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def make_etag(*parts):
+    """資料版本 → strong ETag (同版本 = 同內容)"""
+    return '"' + hashlib.sha1(repr(parts).encode()).hexdigest()[:24] + '"'
+
+
+class ResponseCache:
+    """
+    key → (etag, body, gzip body)，只留每個 key 最新版本
+    etag 用不分表示法的基本 ETag，原文與 gzip 共用一筆，兩種 client 交替也不會互相踢掉
+    版本沒變時不再 json.dumps / gzip；超過 max_keys 個 key 全部清掉
+    """
+
+    def __init__(self, max_keys=64):
+        self.max_keys = max_keys
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key, etag, build, gzipped):
+        with self.lock:
+            entry = self.entries.get(key)
+        if entry is None or entry[0] != etag:
+            body = build()
+            entry = (etag, body, None)
+        if gzipped and entry[2] is None:
+            entry = (etag, entry[1], gzip.compress(entry[1], GZIP_LEVEL))
+        with self.lock:
+            if len(self.entries) >= self.max_keys and key not in self.entries:
+                self.entries.clear()
+            self.entries[key] = entry
+        return entry[2] if gzipped else entry[1]
+
+
+_responses = ResponseCache()
+
+
 class DashboardHandler(SimpleHTTPRequestHandler):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, directory=os.path.dirname(__file__), **kwargs)
@@ -199,33 +337,84 @@ class DashboardHandler(SimpleHTTPRequestHandler):
         path = parsed.path
 
         if path == "/api/stats":
-            self._json_response(get_paper_stats())
+            data, version = _paper_stats.versioned()
+            self._cached_response("stats", version, lambda: _json_bytes(data), JSON_TYPE)
         elif path == "/api/signals":
             qs = parse_qs(parsed.query)
             limit = int(qs.get("limit", [100])[0])
-            self._json_response(get_signals(limit))
-        elif path == "/" or path == "/index.html":
-            self.path = "/index.html"
-            super().do_GET()
+            self._cached_response(f"signals:{limit}", file_version(SIGNALS_FILE),
+                                  lambda: _json_bytes(get_signals(limit)), JSON_TYPE)
         else:
-            super().do_GET()
+            if path == "/":
+                path = "/index.html"
+            fs_path = self.translate_path(path)
+            if os.path.isfile(fs_path):
+                self._cached_response(f"file:{fs_path}", file_version(fs_path),
+                                      lambda: _read_bytes(fs_path), self.guess_type(fs_path), api=False)
+            else:
+                super().do_GET()
+
+    def _cached_response(self, key, version, build, content_type, api=True):
+        """
+        ETag 由資料版本算，先比 If-None-Match → 304 (不用產生內容)
+        gzip 是另一種表示法，ETag 加 -gzip 區分
+        """
+        gzipped = _compressible(content_type) and "gzip" in self.headers.get("Accept-Encoding", "")
+        base_etag = make_etag(key, version)
+        etag = base_etag[:-1] + '-gzip"' if gzipped else base_etag
 
-    def _json_response(self, data):
-        body = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        if _etag_matches(self.headers.get("If-None-Match"), etag):
+            self.send_response(304)
+            self._cache_headers(etag, api)
+            self.end_headers()
+            return
+
+        body = _responses.get(key, base_etag, build, gzipped)
         self.send_response(200)
-        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Type", content_type)
         self.send_header("Content-Length", len(body))
-        self.send_header("Access-Control-Allow-Origin", "*")
+        if gzipped:
+            self.send_header("Content-Encoding", "gzip")
+        self._cache_headers(etag, api)
         self.end_headers()
         self.wfile.write(body)
 
+    def _cache_headers(self, etag, api):
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")     # 可以存，但每次都要帶 ETag 回來驗證
+        self.send_header("Vary", "Accept-Encoding")
+        if api:
+            self.send_header("Access-Control-Allow-Origin", "*")
+
     def log_message(self, format, *args):
         pass  # Suppress logs
 
 
+def _json_bytes(data):
+    return json.dumps(data, ensure_ascii=False).encode("utf-8")
+
+
+def _read_bytes(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _compressible(content_type):
+    return content_type.startswith("text/") or content_type.split(";")[0] in (
+        "application/json", "application/javascript", "image/svg+xml")
+
+
+def _etag_matches(header, etag):
+    """If-None-Match (可能多個、W/ 前綴、*) 是否包含 etag"""
+    if not header:
+        return False
+    tags = [t.strip() for t in header.split(",")]
+    return "*" in tags or etag in (t[2:] if t.startswith("W/") else t for t in tags)
+
+
 def main():
     port = int(sys.argv[1]) if len(sys.argv) > 1 else 8088
-    server = HTTPServer(("0.0.0.0", port), DashboardHandler)
+    server = ThreadingHTTPServer(("0.0.0.0", port), DashboardHandler)   # 每個連線一條執行緒，慢的 client 不會卡住其他人
     print(f"🚀 Dashboard running at http://localhost:{port}")
     try:
         server.serve_forever()
@@ -15,6 +15,8 @@ from config import (
 )
 from exchange_api import get_klines, get_all_tickers
 from notify import send_discord_message
+from indicators import rsi_series
+from indicator_cache import closed_closes
 
 
 def load_state():
@@ -35,29 +37,9 @@ def save_state(state):
 
 def calc_rsi_series(closes, period=14):
     """計算 RSI 序列"""
-    if len(closes) < period+1:
-        return [50]*len(closes)
-    
-    rsis = [50]*period
-    gains, losses = [], []
-    
-    for i in range(1, period+1):
-        d = closes[i]-closes[i-1]
-        gains.append(d if d>0 else 0)
-        losses.append(-d if d<0 else 0)
-    
-    ag = sum(gains)/period
-    al = sum(losses)/period
-    
-    for i in range(period, len(closes)):
-        d = closes[i]-closes[i-1]
-        g = d if d>0 else 0
-        l = -d if d<0 else 0
-        ag = (ag*(period-1)+g)/period
-        al = (al*(period-1)+l)/period
-        rsis.append(100 if al==0 else 100-(100/(1+ag/al)))
-    
-    return rsis
+    if len(closes) == 0:
+        return []
+    return rsi_series(closes, period, method="wilder_overlap", zero_loss="max").tolist()
 
 
 def get_top_coins(limit=50):
@@ -221,14 +203,12 @@ def scan_coin(symbol, candles_1h_map=None):
 
 
 def get_btc_trend():
-    """判斷 BTC 大盤趨勢 (1H RSI，更早捕捉轉勢)"""
+    """判斷 BTC 大盤趨勢 (最近 20 根已收盤 1H RSI，更早捕捉轉勢；和 paper_trader 共用收盤價快取)"""
     try:
-        klines = get_klines("BTC", "1h", 20)
-        if not klines or len(klines) < 15:
+        closes = closed_closes("BTC", "1h", lambda limit: get_klines("BTC", "1h", limit))
+        if not closes or len(closes) < 15:
             return "neutral", 50
-        closes = [k["close"] for k in klines]
-        rsis = calc_rsi_series(closes)
-        rsi = rsis[-1] if rsis else 50
+        rsi = calc_rsi_series(closes[-20:])[-1]
         if rsi > 55:
             return "bullish", rsi
         elif rsi < 45:
@@ -12,10 +12,19 @@ from config import (
     API_TIMEOUT_LONG,
     API_RETRY_MAX,
     API_RETRY_DELAY,
-    API_RATE_LIMIT_DELAY
+    API_RATE_LIMIT_DELAY,
+    PRICE_MAX_AGE_SEC
 )
 
 
+class IncompleteRange(Exception):
+    """分頁抓取中途失敗 (strict=True 時)；rows = 失敗前已抓到的資料"""
+
+    def __init__(self, rows):
+        super().__init__(f"range fetch stopped after {len(rows)} rows")
+        self.rows = rows
+
+
 class ExchangeAPI:
     """統一交易所 API 介面"""
     
@@ -73,7 +82,8 @@ class BinanceAPI(ExchangeAPI):
                     "symbol": data["symbol"],
                     "price": float(data["lastPrice"]),
                     "volume_24h": float(data["quoteVolume"]),
-                    "price_change_pct": float(data["priceChangePercent"])
+                    "price_change_pct": float(data["priceChangePercent"]),
+                    "time": int(data.get("closeTime", 0))
                 }
         except:
             pass
@@ -99,6 +109,49 @@ class BinanceAPI(ExchangeAPI):
             pass
         return []
     
+    def get_all_prices(self) -> Dict[str, Dict[str, Any]]:
+        """一次取得所有永續最新成交價 {"BTCUSDT": {"price", "time"(ms)}}"""
+        try:
+            url = f"{self.BASE_URL}/fapi/v1/ticker/price"
+            r = requests.get(url, timeout=API_TIMEOUT_NORMAL)
+            if r.status_code == 200:
+                return {
+                    t["symbol"]: {"price": float(t["price"]), "time": int(t.get("time", 0))}
+                    for t in r.json()
+                    if t["symbol"].endswith("USDT")
+                }
+        except:
+            pass
+        return {}
+    
+    def get_mark_price(self, symbol: str) -> Optional[Dict[str, Any]]:
+        """標記價格 {"price", "time"(ms)} (premiumIndex)；沒有成交也會持續更新"""
+        try:
+            url = f"{self.BASE_URL}/fapi/v1/premiumIndex"
+            params = {"symbol": f"{symbol}USDT"}
+            r = requests.get(url, params=params, timeout=API_TIMEOUT_SHORT)
+            if r.status_code == 200:
+                data = r.json()
+                return {"price": float(data["markPrice"]), "time": int(data.get("time", 0))}
+        except:
+            pass
+        return None
+    
+    def get_all_funding_rates(self) -> Dict[str, float]:
+        """一次取得所有永續最近一次結算的資金費率 {"BTCUSDT": rate} (premiumIndex.lastFundingRate)"""
+        try:
+            url = f"{self.BASE_URL}/fapi/v1/premiumIndex"
+            r = requests.get(url, timeout=API_TIMEOUT_NORMAL)
+            if r.status_code == 200:
+                return {
+                    t["symbol"]: float(t["lastFundingRate"])
+                    for t in r.json()
+                    if t["symbol"].endswith("USDT") and t.get("lastFundingRate") not in (None, "")
+                }
+        except:
+            pass
+        return {}
+    
     def get_klines(self, symbol: str, interval: str, limit: int = 100) -> List[Dict[str, Any]]:
         """取得 K 線資料"""
         try:
@@ -126,6 +179,67 @@ class BinanceAPI(ExchangeAPI):
             pass
         return []
     
+    def get_klines_range(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+                         strict: bool = False) -> List[Dict[str, Any]]:
+        """
+        取得 [start_ms, end_ms] 之間的 K 線（startTime 分頁，每頁 1500 根）
+        strict=True：某一頁請求失敗時丟 IncompleteRange (帶已抓到的部分)，否則回傳已抓到的部分
+        """
+        url = f"{self.BASE_URL}/fapi/v1/klines"
+        result = []
+        cursor = start_ms
+        while cursor <= end_ms:
+            params = {"symbol": f"{symbol}USDT", "interval": interval,
+                      "startTime": cursor, "endTime": end_ms, "limit": 1500}
+            try:
+                r = self._retry_request(requests.get, url, params=params, timeout=API_TIMEOUT_LONG)
+                page = r.json() if r is not None and r.status_code == 200 else None
+            except:
+                page = None
+            if page is None and strict:
+                raise IncompleteRange(result)
+            if not page:
+                break
+            result.extend({
+                "open_time": int(k[0]),
+                "open": float(k[1]),
+                "high": float(k[2]),
+                "low": float(k[3]),
+                "close": float(k[4]),
+                "volume": float(k[5]),
+                "close_time": int(k[6])
+            } for k in page)
+            cursor = int(page[-1][0]) + 1
+            if len(page) < 1500:
+                break
+        return result
+    
+    def get_funding_rate_history(self, symbol: str, start_ms: int, end_ms: int,
+                                 strict: bool = False) -> List[Dict[str, Any]]:
+        """
+        取得 [start_ms, end_ms] 之間已結算的資金費率 [{"time", "rate"}]（分頁，每頁 1000 筆）
+        strict=True：某一頁請求失敗時丟 IncompleteRange (帶已抓到的部分)
+        """
+        url = f"{self.BASE_URL}/fapi/v1/fundingRate"
+        result = []
+        cursor = start_ms
+        while cursor <= end_ms:
+            params = {"symbol": f"{symbol}USDT", "startTime": cursor, "endTime": end_ms, "limit": 1000}
+            try:
+                r = self._retry_request(requests.get, url, params=params, timeout=API_TIMEOUT_LONG)
+                page = r.json() if r is not None and r.status_code == 200 else None
+            except:
+                page = None
+            if not isinstance(page, list) and strict:
+                raise IncompleteRange(result)
+            if not isinstance(page, list) or not page:
+                break
+            result.extend({"time": int(x["fundingTime"]), "rate": float(x["fundingRate"])} for x in page)
+            cursor = int(page[-1]["fundingTime"]) + 1
+            if len(page) < 1000:
+                break
+        return result
+    
     def get_funding_rate(self, symbol: str) -> Optional[float]:
         """取得資金費率"""
         try:
@@ -227,7 +341,8 @@ class BybitAPI(ExchangeAPI):
                         "symbol": t["symbol"],
                         "price": float(t["lastPrice"]),
                         "volume_24h": float(t["turnover24h"]),
-                        "price_change_pct": float(t.get("price24hPcnt", 0)) * 100
+                        "price_change_pct": float(t.get("price24hPcnt", 0)) * 100,
+                        "time": int(data.get("time", 0))
                     }
         except:
             pass
@@ -326,7 +441,8 @@ class OKXAPI(ExchangeAPI):
                         "symbol": symbol + "USDT",
                         "price": float(t["last"]),
                         "volume_24h": float(t.get("volCcy24h", 0)),
-                        "price_change_pct": 0  # OKX 沒有直接提供
+                        "price_change_pct": 0,  # OKX 沒有直接提供
+                        "time": int(t.get("ts", 0))
                     }
         except:
             pass
@@ -462,12 +578,150 @@ class UnifiedExchangeAPI:
         """取得所有 ticker（僅 Binance）"""
         return self.binance.get_all_tickers()
     
+    def get_all_prices(self) -> Dict[str, Dict[str, Any]]:
+        """取得所有最新成交價（僅 Binance）"""
+        return self.binance.get_all_prices()
+    
+    def get_prices(self, symbols: List[str], max_age: float = PRICE_MAX_AGE_SEC) -> Dict[str, Dict[str, Any]]:
+        """
+        批次取得價格：先用一次全市場快照，沒有的幣再逐一走三層 fallback
+        Returns: {symbol: {"price", "age"(秒), "stale", "source"}}，都抓不到的幣不在結果內
+        快照成交時間早於 max_age 秒的幣和沒有的幣一樣逐一走 fallback：
+        Binance 標記價格 → Bybit ticker → OKX ticker (ticker 的 lastPrice 跟快照是同一筆成交，不再問 Binance)
+        age 一律用報價本身的時間算，fallback 仍超過 max_age 就照樣標 stale；
+        快照和 fallback 都舊時取較新的那個 (只供顯示，價格仍可用)
+        """
+        result = {}
+        snapshot = self.get_all_prices() if symbols else {}
+        now_ms = time.time() * 1000
+        for symbol in symbols:
+            base_symbol = symbol.replace("USDT", "")
+            hit = snapshot.get(f"{base_symbol}USDT")
+            if hit:
+                age = max(0.0, (now_ms - hit["time"]) / 1000) if hit["time"] else 0.0
+                result[symbol] = {"price": hit["price"], "age": age,
+                                  "stale": age > max_age, "source": "snapshot"}
+                if age <= max_age:
+                    continue
+            quote, source = self.binance.get_mark_price(base_symbol), "mark"
+            if quote is None:
+                quote, source = self.bybit.get_ticker(base_symbol) or self.okx.get_ticker(base_symbol), "ticker"
+            if quote:
+                age = max(0.0, (now_ms - quote["time"]) / 1000) if quote["time"] else 0.0
+                if hit is None or age < result[symbol]["age"]:
+                    result[symbol] = {"price": quote["price"], "age": age,
+                                      "stale": age > max_age, "source": source}
+        return result
+    
+    def get_funding_rates(self, symbols: List[str]) -> Dict[str, Optional[float]]:
+        """
+        批次取得資金費率：先用一次全市場 premiumIndex，沒有的幣再逐一走三層 fallback
+        Returns: {symbol: rate}，都抓不到的幣為 None
+        """
+        snapshot = self.binance.get_all_funding_rates() if symbols else {}
+        result = {}
+        for symbol in symbols:
+            base_symbol = symbol.replace("USDT", "")
+            rate = snapshot.get(f"{base_symbol}USDT")
+            result[symbol] = rate if rate is not None else self.get_funding_rate(base_symbol)
+        return result
+    
+    def get_klines_range(self, symbol: str, interval: str, start_ms: int, end_ms: int,
+                         strict: bool = False) -> List[Dict[str, Any]]:
+        """取得區間 K 線（僅 Binance）"""
+        return self.binance.get_klines_range(symbol.replace("USDT", ""), interval, start_ms, end_ms, strict)
+    
+    def get_funding_rate_history(self, symbol: str, start_ms: int, end_ms: int,
+                                 strict: bool = False) -> List[Dict[str, Any]]:
+        """取得資金費率歷史（僅 Binance）"""
+        return self.binance.get_funding_rate_history(symbol.replace("USDT", ""), start_ms, end_ms, strict)
+    
     def get_oi_history(self, symbol: str, period: str = "1h", limit: int = 2) -> List[Dict[str, Any]]:
         """取得 OI 歷史（僅 Binance）"""
         base_symbol = symbol.replace("USDT", "")
         return self.binance.get_oi_history(base_symbol, period, limit)
 
 
+# ============================================================
+# K 線重採樣（本地合成高時框）
+# ============================================================
+_INTERVAL_UNIT_MS = {"m": 60000, "h": 3600000, "d": 86400000, "w": 604800000}
+_WEEK_OFFSET_MS = 4 * 86400000  # 1970-01-01 是週四，週 K 從週一 00:00 UTC 起算
+
+
+def interval_to_ms(interval: str) -> int:
+    """
+    '15m' / '1H' / '4h' / '1D' → 毫秒（不分大小寫）
+    'M' 在 Binance 是月 K，長度不固定，不能當分鐘處理 → ValueError
+    """
+    if interval.endswith("M"):
+        raise ValueError(f"month interval not supported: {interval}")
+    num = int(interval[:-1]) if interval[:-1] else 1
+    return num * _INTERVAL_UNIT_MS[interval[-1].lower()]
+
+
+def candle_open_time(ts_ms: int, interval: str) -> int:
+    """ts_ms 所在 K 線的開盤時間（UTC 對齊，週 K 從週一起算）"""
+    offset = _WEEK_OFFSET_MS if interval[-1].lower() == "w" else 0
+    return ts_ms - (ts_ms - offset) % interval_to_ms(interval)
+
+
+def resample_klines(klines: List[Dict[str, Any]], interval: str) -> List[Dict[str, Any]]:
+    """
+    用低時框 K 線合成高時框 OHLCV
+    - 以 UTC 對齊（與 Binance K 線邊界相同）
+    - 開頭不完整的區間捨棄
+    - 最後一個區間未滿也保留（= 目前未收盤的 K 線）
+    """
+    if not klines:
+        return []
+    target = interval_to_ms(interval)
+    
+    result = []
+    for k in klines:
+        start = candle_open_time(k["open_time"], interval)
+        if result and result[-1]["open_time"] == start:
+            bar = result[-1]
+            bar["high"] = max(bar["high"], k["high"])
+            bar["low"] = min(bar["low"], k["low"])
+            bar["close"] = k["close"]
+            bar["volume"] += k["volume"]
+        else:
+            result.append({
+                "open_time": start,
+                "open": k["open"],
+                "high": k["high"],
+                "low": k["low"],
+                "close": k["close"],
+                "volume": k["volume"],
+                "close_time": start + target - 1
+            })
+    
+    if result and result[0]["open_time"] != klines[0]["open_time"]:
+        result.pop(0)
+    return result
+
+
+def get_klines_multi(symbol: str, base_interval: str, targets: Dict[str, tuple]) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    一次抓 base_interval K 線，合成多個時框
+    targets: {名稱: (interval, 根數)}
+    根數不足（例如 fallback 到單次上限較小的交易所）的時框改為直接抓取
+    """
+    base_ms = interval_to_ms(base_interval)
+    limit = max(n * interval_to_ms(iv) // base_ms + interval_to_ms(iv) // base_ms
+                for iv, n in targets.values())
+    base = get_klines(symbol, base_interval, min(limit, 1500))
+    
+    result = {}
+    for name, (iv, n) in targets.items():
+        bars = resample_klines(base, iv)[-n:] if interval_to_ms(iv) != base_ms else base[-n:]
+        if len(bars) < n:
+            bars = get_klines(symbol, iv, n) or bars
+        result[name] = bars
+    return result
+
+
 # ============================================================
 # 全域 API 實例
 # ============================================================
@@ -497,6 +751,11 @@ def get_funding_rate(symbol: str) -> Optional[float]:
     return api.get_funding_rate(symbol)
 
 
+def get_funding_rates(symbols: List[str]) -> Dict[str, Optional[float]]:
+    """批次取得資金費率 (premiumIndex 快照 + 逐幣 fallback)"""
+    return api.get_funding_rates(symbols)
+
+
 def get_exchange_info() -> Dict[str, Any]:
     """取得交易所資訊"""
     return api.get_exchange_info()
@@ -511,3 +770,25 @@ def get_price(symbol: str) -> Optional[float]:
     """取得當前價格"""
     ticker = get_ticker(symbol)
     return ticker["price"] if ticker else None
+
+
+def get_all_prices() -> Dict[str, Dict[str, Any]]:
+    """取得所有最新成交價"""
+    return api.get_all_prices()
+
+
+def get_prices(symbols: List[str], max_age: float = PRICE_MAX_AGE_SEC) -> Dict[str, Dict[str, Any]]:
+    """批次取得價格 (快照 + 沒有 / 過舊的幣逐幣 fallback，都失敗才標記 stale)"""
+    return api.get_prices(symbols, max_age)
+
+
+def get_klines_range(symbol: str, interval: str, start_ms: int, end_ms: int,
+                     strict: bool = False) -> List[Dict[str, Any]]:
+    """取得區間 K 線 (分頁；strict=True 中途失敗丟 IncompleteRange)"""
+    return api.get_klines_range(symbol, interval, start_ms, end_ms, strict)
+
+
+def get_funding_rate_history(symbol: str, start_ms: int, end_ms: int,
+                             strict: bool = False) -> List[Dict[str, Any]]:
+    """取得資金費率歷史 (分頁；strict=True 中途失敗丟 IncompleteRange)"""
+    return api.get_funding_rate_history(symbol, start_ms, end_ms, strict)
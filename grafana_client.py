@@ -0,0 +1,139 @@
+"""
+Grafana OI Dashboard client
+
+- 整份 payload (所有幣) 抓一次，TTL 內沿用，依 symbol 建 dict 索引
+- grafana_collector 最新的快照檔夠新時直接讀檔，不打 API
+- get_grafana_data(symbol) 只查索引，不連網
+- 更新失敗沿用舊索引，但資料超過 GRAFANA_MAX_STALE_SEC 就當作沒有 (回傳 {})，不把舊 OI 當現值
+"""
+import json
+import os
+import time
+from datetime import datetime
+
+import requests
+
+from config import (
+    GRAFANA_OI_URL, GRAFANA_SNAPSHOT_DIR, GRAFANA_CACHE_TTL_SEC, GRAFANA_SNAPSHOT_MAX_AGE_SEC, GRAFANA_MAX_STALE_SEC
+)
+
+# get_grafana_data 欄位 → (API 欄位, 快照欄位)
+FIELDS = {
+    "fr": ("FR", "fr"),
+    "lsur": ("LSUR", "lsur"),
+    "ps_bias": ("PS_Bias", "ps"),
+    "idi_1h": ("iDI_1h", "idi"),
+    "adi_1h": ("aDI_1h", "adi"),
+    "oi_usd": ("OI$M", "oi"),
+    "oi_1h": ("OI_1h", "oi1h"),
+    "oi_4h": ("OI_4h", "oi4h"),
+    "ls_1h": ("LS_1h", "ls1h"),
+    "ls_4h": ("LS_4h", "ls4h"),
+}
+
+
+def slim(coin):
+    """API 單幣資料 → 快照格式 (collector 存檔用)"""
+    row = {"s": coin.get("symbol")}
+    for api_key, snap_key in FIELDS.values():
+        row[snap_key] = coin.get(api_key)
+    row["p"] = coin.get("Price")
+    return row
+
+
+class GrafanaClient:
+    def __init__(self, url=GRAFANA_OI_URL, snapshot_dir=GRAFANA_SNAPSHOT_DIR,
+                 ttl=GRAFANA_CACHE_TTL_SEC, snapshot_max_age=GRAFANA_SNAPSHOT_MAX_AGE_SEC,
+                 max_stale=GRAFANA_MAX_STALE_SEC):
+        self.url = url
+        self.snapshot_dir = snapshot_dir
+        self.ttl = ttl
+        self.snapshot_max_age = snapshot_max_age
+        self.max_stale = max_stale
+        self.index = {}         # symbol → get_grafana_data 格式
+        self.loaded_at = 0      # 上次嘗試更新 (time.time())
+        self.data_at = 0        # 索引資料本身的時間 (API 抓到的時間 / 快照 ts)
+        self.source = None      # "api" / 快照檔路徑
+
+    def fetch(self, timeout=10):
+        """打 API 抓整份 payload (原始 list) 並重建索引；失敗回傳 None"""
+        r = requests.get(self.url, timeout=timeout)
+        if r.status_code != 200:
+            return None
+        data = r.json().get("data", [])
+        if data:
+            self.index = {coin.get("symbol"): {k: coin.get(api_key) for k, (api_key, _) in FIELDS.items()}
+                          for coin in data}
+            self.loaded_at = self.data_at = time.time()
+            self.source = "api"
+        return data
+
+    def latest_snapshot(self):
+        """最新快照檔路徑 (GRAFANA_SNAPSHOT_DIR/日期/HHMM.json)"""
+        try:
+            days = sorted(d for d in os.listdir(self.snapshot_dir) if d[:2] == "20")
+            for day in reversed(days):
+                files = sorted(f for f in os.listdir(os.path.join(self.snapshot_dir, day)) if f.endswith(".json"))
+                if files:
+                    return os.path.join(self.snapshot_dir, day, files[-1])
+        except:
+            pass
+        return None
+
+    def load_snapshot(self):
+        """最新快照夠新且欄位齊全 (舊版 collector 沒存 4h 欄位) 就載入索引"""
+        path = self.latest_snapshot()
+        if not path:
+            return False
+        try:
+            with open(path) as f:
+                snapshot = json.load(f)
+            ts = datetime.fromisoformat(snapshot["ts"]).timestamp()
+            age = time.time() - ts
+            data = snapshot.get("data", [])
+            if age > self.snapshot_max_age or not data or any(k not in data[0] for _, k in FIELDS.values()):
+                return False
+        except:
+            return False
+        self.index = {coin.get("s"): {k: coin.get(snap_key) for k, (_, snap_key) in FIELDS.items()}
+                      for coin in data}
+        self.loaded_at = time.time()
+        self.data_at = ts
+        self.source = path
+        return True
+
+    def refresh(self):
+        """TTL 過期才更新：先找新快照，沒有再打 API"""
+        if time.time() - self.loaded_at < self.ttl:
+            return
+        if not self.load_snapshot():
+            try:
+                self.fetch()
+            except:
+                pass
+        self.loaded_at = time.time()    # 失敗也等下個 TTL 再試，不每次查詢都打 API
+
+    def is_stale(self):
+        """索引資料超過 max_stale (更新一直失敗)"""
+        return time.time() - self.data_at > self.max_stale
+
+    def get(self, symbol):
+        self.refresh()
+        if self.is_stale():
+            return {}
+        return dict(self.index.get(symbol, {}))
+
+
+_default = None
+
+
+def get_client():
+    global _default
+    if _default is None:
+        _default = GrafanaClient()
+    return _default
+
+
+def get_grafana_data(symbol):
+    """單幣 Grafana 數據 (查不到回傳 {})"""
+    return get_client().get(symbol)
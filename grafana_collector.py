@@ -6,22 +6,20 @@ Grafana OI Dashboard 快照收集器
 
 import json
 import os
-import requests
 from datetime import datetime, timezone, timedelta
 
-from config import GRAFANA_OI_URL, GRAFANA_SNAPSHOT_DIR
+from config import GRAFANA_SNAPSHOT_DIR
+from grafana_client import get_client, slim
 
 def collect_snapshot():
     tw_tz = timezone(timedelta(hours=8))
     now = datetime.now(tw_tz)
     
     try:
-        r = requests.get(GRAFANA_OI_URL, timeout=15)
-        if r.status_code != 200:
-            print(f"❌ Grafana API 回傳 {r.status_code}")
+        data = get_client().fetch(timeout=15)
+        if data is None:
+            print("❌ Grafana API 回傳失敗")
             return False
-        
-        data = r.json().get("data", [])
         if not data:
             print("❌ Grafana 回傳空數據")
             return False
@@ -35,20 +33,7 @@ def collect_snapshot():
         filepath = os.path.join(date_dir, filename)
         
         # 只保留回測需要的欄位，減少磁碟用量
-        slim_data = []
-        for coin in data:
-            slim_data.append({
-                "s": coin.get("symbol"),
-                "fr": coin.get("FR"),
-                "lsur": coin.get("LSUR"),
-                "ps": coin.get("PS_Bias"),
-                "idi": coin.get("iDI_1h"),
-                "adi": coin.get("aDI_1h"),
-                "oi": coin.get("OI$M"),
-                "oi1h": coin.get("OI_1h"),
-                "p": coin.get("Price"),
-                "ls1h": coin.get("LS_1h"),
-            })
+        slim_data = [slim(coin) for coin in data]
         
         snapshot = {
             "ts": now.isoformat(),
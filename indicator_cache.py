@@ -0,0 +1,147 @@
+"""
+跨腳本指標快取 (sqlite，放在 STATE_DIR)
+
+key = (symbol, interval, indicator, params, 最後一根收盤 K 線開盤時間)
+查詢時收盤 K 線時間由時鐘推算，不必先抓 K 線就能查快取；
+同一根 K 線內先算完的腳本寫入，其他腳本 (paper_trader / dump_warning ...) 直接取用。
+
+指標只用已收盤 K 線算 (依抓到的 K 線 close_time 判斷，去掉未收盤那根)，值在整根 K 線內都不變。
+寫入前確認資料真的到了那根：時鐘推算的那根要在資料裡、而且後面已經有下一根 (交易所換 K 了)；
+剛過整點交易所還沒換 K / 缺那根時只算不存，避免整根 K 線期間都讀到錯的值。
+快取壞掉 / 鎖住時一律退回直接計算，不影響主流程。
+"""
+import json
+import sqlite3
+import time
+
+from config import INDICATOR_CACHE_FILE, INDICATOR_CACHE_KEEP_HOURS, INDICATOR_CACHE_CLOSED_BARS
+from exchange_api import candle_open_time, interval_to_ms
+from indicators import rsi
+
+
+def last_closed_time(interval, now=None):
+    """目前最後一根已收盤 K 線的開盤時間 (ms)"""
+    now_ms = int((now if now is not None else time.time()) * 1000)
+    return candle_open_time(now_ms, interval) - interval_to_ms(interval)
+
+
+class IndicatorCache:
+    def __init__(self, filepath=INDICATOR_CACHE_FILE, keep_hours=INDICATOR_CACHE_KEEP_HOURS):
+        self.filepath = filepath
+        self.keep = keep_hours * 3600
+
+    def _connect(self):
+        conn = sqlite3.connect(self.filepath, timeout=5)
+        conn.execute("""CREATE TABLE IF NOT EXISTS indicator_cache (
+            symbol TEXT, interval TEXT, indicator TEXT, params TEXT, candle_time INTEGER,
+            value TEXT, computed_at REAL,
+            PRIMARY KEY (symbol, interval, indicator, params, candle_time))""")
+        return conn
+
+    @staticmethod
+    def _key(symbol, interval, indicator, params, now):
+        return (symbol.upper(), interval, indicator,
+                json.dumps(params or {}, sort_keys=True), last_closed_time(interval, now))
+
+    def get(self, symbol, interval, indicator, params=None, max_age=None, now=None):
+        """命中回傳值，否則 None"""
+        now = now if now is not None else time.time()
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute(
+                    "SELECT value, computed_at FROM indicator_cache WHERE symbol=? AND interval=? "
+                    "AND indicator=? AND params=? AND candle_time=?",
+                    self._key(symbol, interval, indicator, params, now)).fetchone()
+            finally:
+                conn.close()
+        except:
+            return None
+        if row is None or (max_age is not None and now - row[1] > max_age):
+            return None
+        return json.loads(row[0])
+
+    def put(self, symbol, interval, indicator, params, value, now=None):
+        now = now if now is not None else time.time()
+        try:
+            conn = self._connect()
+            try:
+                with conn:
+                    conn.execute("INSERT OR REPLACE INTO indicator_cache VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                 self._key(symbol, interval, indicator, params, now)
+                                 + (json.dumps(value), now))
+                    conn.execute("DELETE FROM indicator_cache WHERE computed_at < ?", (now - self.keep,))
+            finally:
+                conn.close()
+        except:
+            pass
+
+    def get_or_compute(self, symbol, interval, indicator, params, compute, max_age=None):
+        """
+        查快取，沒有就呼叫 compute() → (value, cacheable) 並寫入
+        value 為 None (抓不到資料等) 或 cacheable 為 False (資料還沒到最新收盤那根) 時不寫入
+        """
+        value = self.get(symbol, interval, indicator, params, max_age)
+        if value is not None:
+            return value
+        value, cacheable = compute()
+        if value is not None and cacheable:
+            self.put(symbol, interval, indicator, params, value)
+        return value
+
+
+_default = None
+
+
+def cached_indicator(symbol, interval, indicator, params, compute, max_age=None):
+    """用預設快取檔的 get_or_compute"""
+    global _default
+    if _default is None:
+        _default = IndicatorCache()
+    return _default.get_or_compute(symbol, interval, indicator, params, compute, max_age)
+
+
+def drop_forming(klines, interval, now=None):
+    """去掉還沒收盤的 K 線 (close_time 還沒到；沒有 close_time 用開盤時間 + 週期推算)"""
+    now_ms = int((now if now is not None else time.time()) * 1000)
+    step = interval_to_ms(interval)
+    end = len(klines)
+    while end and klines[end - 1].get("close_time", klines[end - 1]["open_time"] + step - 1) >= now_ms:
+        end -= 1
+    return klines[:end]
+
+
+def split_closed(klines, interval, now=None):
+    """
+    → (已收盤 K 線, 可否寫快取)
+    可寫快取 = 時鐘推算的最後一根收盤 K 線就是資料裡最後一根收盤的，且後面還有下一根 (交易所已換 K)
+    """
+    closed = drop_forming(klines, interval, now)
+    settled = (bool(closed) and len(closed) < len(klines)
+               and closed[-1]["open_time"] == last_closed_time(interval, now))
+    return closed, settled
+
+
+def closed_closes(symbol, interval, fetch, bars=INDICATOR_CACHE_CLOSED_BARS):
+    """
+    最近 bars 根已收盤 K 線的收盤價，跨腳本共用同一筆快取 (各指標變體從尾段自己算)
+    fetch(limit)：抓含未收盤那根的最近 limit 根 K 線
+    """
+    def compute():
+        klines, settled = split_closed(fetch(bars + 1) or [], interval)
+        return [k["close"] for k in klines[-bars:]] or None, settled
+    return cached_indicator(symbol, interval, "closes", {"bars": bars}, compute)
+
+
+def closed_rsi(symbol, interval, klines, params):
+    """
+    已收盤 K 線的 RSI；params = 呼叫端固定的變體 {period, method, zero_loss, bars}
+    klines 是呼叫端已經抓好的 K 線 (可含未收盤那根)，資料不足回 None
+    """
+    def compute():
+        closed, settled = split_closed(klines, interval)
+        closes = [k["close"] for k in closed][-params["bars"]:]
+        if len(closes) <= params["period"]:
+            return None, False
+        return rsi(closes, params["period"], method=params["method"], zero_loss=params["zero_loss"]), settled
+    return cached_indicator(symbol, interval, "rsi", params, compute)
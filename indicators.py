@@ -0,0 +1,837 @@
+"""
+共用技術指標 (NumPy)
+輸入可為 1-D 序列，或 2-D (幣種 × 時間) 矩陣 — 一律沿最後一軸計算，1-D 當成一列的矩陣走同一條路
+
+各腳本原本的寫法不盡相同，用 method / zero_loss 參數重現:
+
+RSI method:
+  wilder          — 前 period 根平均當種子，之後 Wilder 平滑 (monitor, backtest_ob_v2)
+  wilder_overlap  — 前 period 根平均當種子，平滑從第 period 根 delta 重算一次
+                    (dump_warning.calc_rsi_series)
+  sma_last        — 最後 period 根 delta 簡單平均 (oi_5min_alert, breakout_alert, paper_trader)
+  sma_first       — 最前 period 根 delta 簡單平均 (position_advisor, pullback_alert, oi_scanner)
+
+RSI zero_loss (平均跌幅為 0 時):
+  max    — RSI = 100
+  floor  — 平均跌幅改用 0.001
+  cap    — RS = 100 (RSI ≈ 99.01)
+
+簡單平均用 cumsum 的視窗差；Wilder / EMA 這類一階遞推用 _linear_scan 整個矩陣一起算
+(分段閉式解，只有段與段之間逐段遞推)。加總順序與原本迴圈版不同，結果在浮點誤差內一致。
+
+增量版 (WilderRSI / WilderATR / ADXDMI / EMA / RollingMean / RollingMax / RollingMin):
+每根收盤 K 線 update() 一次、peek() 給未收盤 K 線的暫定值，to_dict() 可跨 cron 保存；
+結果與上面的批次版在浮點誤差內相同。IndicatorStream 負責餵 K 線與斷層重建。
+"""
+import json
+from collections import deque
+
+import numpy as np
+
+_SCAN_CHUNK = 64    # _linear_scan 每段長度
+
+
+# ─── 內部工具 ───
+
+def _as_2d(x):
+    """轉成 2-D float 陣列，回傳 (陣列, 原本是否為 1-D)"""
+    arr = np.asarray(x, dtype=float)
+    return np.atleast_2d(arr), arr.ndim == 1
+
+
+def _restore(x, one_d):
+    if one_d:
+        x = x[0]
+        return float(x) if np.ndim(x) == 0 else x
+    return x
+
+
+def _linear_scan(x, a, y0):
+    """
+    y[:, t] = a * y[:, t-1] + x[:, t]，y[:, -1] = y0；a 為 [0, 1] 的純量或與 x 同形狀
+    每段 size 根: 段內 y = A * (y_前段 + cumsum(x / A))，A = 段內 a 的累乘；
+    只有段尾狀態逐段往後傳
+    """
+    rows, n = x.shape
+    y = np.asarray(y0, dtype=float)
+    if n == 0:
+        return np.empty((rows, 0))
+    scalar = np.ndim(a) == 0
+    if not (a > 0 if scalar else (a > 0).all()):
+        # 有 a = 0 (period = 1) 時累乘會歸零，退回逐根遞推
+        a = np.broadcast_to(a, x.shape)
+        out = np.empty((rows, n))
+        for t in range(n):
+            y = a[:, t] * y + x[:, t]
+            out[:, t] = y
+        return out
+    size = min(_SCAN_CHUNK, n)
+    chunks = -(-n // size)
+    pad = chunks * size - n
+    if pad:
+        x = np.concatenate([x, np.zeros((rows, pad))], axis=1)
+    x = x.reshape(rows, chunks, size)
+    if scalar:
+        growth = a ** np.arange(1, size + 1)    # 各段相同，靠廣播
+    else:
+        if pad:
+            a = np.concatenate([a, np.ones((rows, pad))], axis=1)
+        growth = np.cumprod(a.reshape(rows, chunks, size), axis=-1)
+    local = growth * np.cumsum(x / growth, axis=-1)     # 每段從 0 起算
+    if chunks == 1:
+        out = local + growth * np.reshape(y, (-1, 1, 1))
+    else:
+        carry = np.empty((rows, chunks))
+        for c in range(chunks):
+            carry[:, c] = y
+            y = (growth[-1] if scalar else growth[:, c, -1]) * y + local[:, c, -1]
+        out = local + growth * carry[..., None]
+    return out.reshape(rows, -1)[:, :n]
+
+
+def _wilder(x, seed, period):
+    """Wilder 平滑 avg = (avg * (period - 1) + x) / period，從 seed 起逐根套用 x 的每一欄"""
+    return _linear_scan(x / period, (period - 1) / period, seed)
+
+
+def _wilder_last(x, seed, period):
+    """只要 _wilder 的最後一欄: keep^n * seed + Σ keep^(n-1-t) * x_t / period，一次內積"""
+    keep = (period - 1) / period
+    n = x.shape[1]
+    return x @ (keep ** np.arange(n - 1, -1, -1) / period) + keep ** n * seed
+
+
+def _rolling_sum(x, period):
+    """長度 period 的滑動視窗和 (cumsum 相減)，回傳長度 n - period + 1"""
+    csum = np.cumsum(x, axis=-1)
+    out = csum[:, period - 1:].copy()
+    out[:, 1:] -= csum[:, :-period]
+    return out
+
+
+def _gains_losses(closes):
+    deltas = np.diff(closes, axis=-1)
+    gains = np.where(deltas > 0, deltas, 0.0)
+    losses = np.where(deltas < 0, -deltas, 0.0)
+    return gains, losses
+
+
+def _rsi_from_avg(avg_gain, avg_loss, zero_loss):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        if zero_loss == "floor":
+            avg_loss = np.where(avg_loss > 0, avg_loss, 0.001)
+            return 100 - (100 / (1 + avg_gain / avg_loss))
+        if zero_loss == "cap":
+            rs = np.where(avg_loss > 0, avg_gain / avg_loss, 100)
+            return 100 - (100 / (1 + rs))
+        if zero_loss == "max":
+            return np.where(avg_loss == 0, 100.0, 100 - (100 / (1 + avg_gain / avg_loss)))
+    raise ValueError(f"unknown zero_loss: {zero_loss}")
+
+
+# ─── RSI ───
+
+def _rsi_avgs(x, period, method, last=False):
+    """
+    → (start, avg_gain, avg_loss)：第 start 根起每根的平均漲跌幅 (rows, n - start)
+    sma_first 只有一欄 (之後都同值)；last=True 時 Wilder 只算最後一欄；資料不足回傳 None
+    """
+    if method not in ("wilder", "wilder_overlap", "sma_last", "sma_first"):
+        raise ValueError(f"unknown RSI method: {method}")
+    m = x.shape[1] - 1     # delta 數
+    if m < 1 or (m < period and method != "sma_first"):
+        return None
+    gains, losses = _gains_losses(x)
+    if method == "sma_first":
+        k = min(period, m)
+        return k, gains[:, :k].mean(axis=1, keepdims=True), losses[:, :k].mean(axis=1, keepdims=True)
+    if method == "sma_last":
+        return period, _rolling_sum(gains, period) / period, _rolling_sum(losses, period) / period
+    moves = np.concatenate([gains, losses])    # 漲跌幅疊成一個矩陣一起平滑
+    seed = moves[:, :period].mean(axis=1)
+    rows = x.shape[0]
+    if last:
+        tail = moves[:, period if method == "wilder" else period - 1:]
+        avg = _wilder_last(tail, seed, period)[:, None]
+        return period, avg[:rows], avg[rows:]
+    if method == "wilder":
+        avg = np.concatenate([seed[:, None], _wilder(moves[:, period:], seed, period)], axis=1)
+    else:
+        # wilder_overlap: 第 period 個 delta 已在種子裡，仍再平滑一次
+        avg = _wilder(moves[:, period - 1:], seed, period)
+    return period, avg[:rows], avg[rows:]
+
+
+def rsi_series(closes, period=14, method="wilder", zero_loss="max", default=50.0):
+    """
+    RSI 序列，與 closes 同形狀；資料不足的位置填 default
+    sma_first 只有一個值，從第 min(period, n-1) 根起都填同一個值
+    """
+    x, one_d = _as_2d(closes)
+    out = np.full(x.shape, float(default))
+    avgs = _rsi_avgs(x, period, method)
+    if avgs is not None:
+        start, avg_g, avg_l = avgs
+        out[:, start:] = _rsi_from_avg(avg_g, avg_l, zero_loss)
+    return _restore(out, one_d)
+
+
+def rsi(closes, period=14, method="wilder", zero_loss="max", default=50.0):
+    """最新一根的 RSI (1-D → float，2-D → 每列一個值)"""
+    x, one_d = _as_2d(closes)
+    if method == "sma_last":
+        x = x[:, -(period + 1):]     # 只用得到最後 period 個 delta
+    avgs = _rsi_avgs(x, period, method, last=True)
+    if avgs is None:
+        value = np.full(x.shape[0], float(default))
+    else:
+        _, avg_g, avg_l = avgs
+        value = _rsi_from_avg(avg_g[:, -1], avg_l[:, -1], zero_loss)
+    return float(value[0]) if one_d else value
+
+
+# ─── 均線 / 布林 ───
+
+def sma_series(values, period):
+    """簡單均線序列，前 period-1 根為 NaN"""
+    x, one_d = _as_2d(values)
+    rows, n = x.shape
+    out = np.full((rows, n), np.nan)
+    if n >= period:
+        out[:, period - 1:] = _rolling_sum(x, period) / period
+    return _restore(out, one_d)
+
+
+def sma(values, period):
+    """最後 period 根的簡單平均 (= sum(values[-period:]) / period)"""
+    x, one_d = _as_2d(values)
+    if x.shape[1] < period:
+        value = np.full(x.shape[0], np.nan)
+    else:
+        value = x[:, -period:].sum(axis=1) / period
+    return float(value[0]) if one_d else value
+
+
+def ema_series(values, period, seed="sma"):
+    """
+    指數均線序列 (alpha = 2 / (period + 1))
+    seed: sma — 前 period 根平均當起點，之前為 NaN；first — 第一根當起點
+    """
+    x, one_d = _as_2d(values)
+    rows, n = x.shape
+    out = np.full((rows, n), np.nan)
+    if seed == "sma":
+        start = period - 1
+        if n < period:
+            return _restore(out, one_d)
+        value = x[:, :period].sum(axis=1) / period
+    elif seed == "first":
+        start = 0
+        if n == 0:
+            return _restore(out, one_d)
+        value = x[:, 0]
+    else:
+        raise ValueError(f"unknown EMA seed: {seed}")
+    alpha = 2 / (period + 1)
+    out[:, start] = value
+    if alpha < 1:
+        out[:, start + 1:] = _linear_scan(alpha * x[:, start + 1:], 1 - alpha, value)
+    else:
+        out[:, start + 1:] = x[:, start + 1:]   # period = 1: EMA 就是原值
+    return _restore(out, one_d)
+
+
+def ema(values, period, seed="sma"):
+    """最新一根的 EMA"""
+    series = ema_series(values, period, seed)
+    return float(series[-1]) if np.ndim(series) == 1 else series[:, -1]
+
+
+def bollinger_series(values, period=20, num_std=2):
+    """布林通道序列 (母體標準差)，回傳 (mid, upper, lower)"""
+    x, one_d = _as_2d(values)
+    rows, n = x.shape
+    mid = np.full((rows, n), np.nan)
+    std = np.full((rows, n), np.nan)
+    if n >= period:
+        windows = np.lib.stride_tricks.sliding_window_view(x, period, axis=1)
+        mid[:, period - 1:] = _rolling_sum(x, period) / period
+        std[:, period - 1:] = windows.std(axis=-1)
+    return (_restore(mid, one_d), _restore(mid + num_std * std, one_d),
+            _restore(mid - num_std * std, one_d))
+
+
+def bollinger(values, period=20, num_std=2):
+    """最新一根的布林通道 (mid, upper, lower)"""
+    one_d = np.ndim(values) == 1
+    return tuple(float(s[-1]) if one_d else s[:, -1]
+                 for s in bollinger_series(values, period, num_std))
+
+
+def ma_distance(price, ma):
+    """價格距均線 % ((price - ma) / ma * 100，ma <= 0 時為 0)"""
+    price = np.asarray(price, dtype=float)
+    ma = np.asarray(ma, dtype=float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        dist = np.where(ma > 0, (price - ma) / ma * 100, 0.0)
+    return float(dist) if dist.ndim == 0 else dist
+
+
+# ─── ATR / ADX ───
+
+def true_range(highs, lows, closes):
+    """TR 序列 (從第 2 根起，長度 n-1)"""
+    h, one_d = _as_2d(highs)
+    l, _ = _as_2d(lows)
+    c, _ = _as_2d(closes)
+    pc = c[:, :-1]
+    h, l = h[:, 1:], l[:, 1:]
+    tr = np.maximum(np.maximum(h - l, np.abs(h - pc)), np.abs(l - pc))
+    return tr[0] if one_d else tr
+
+
+def atr_series(highs, lows, closes, period=14):
+    """Wilder ATR 序列，與 K 線同長，資料不足處為 NaN"""
+    tr, one_d = _as_2d(true_range(highs, lows, closes))
+    rows, m = tr.shape
+    out = np.full((rows, m + 1), np.nan)
+    if m >= period:
+        seed = tr[:, :period].mean(axis=1)
+        out[:, period] = seed
+        out[:, period + 1:] = _wilder(tr[:, period:], seed, period)
+    return _restore(out, one_d)
+
+
+def atr(highs, lows, closes, period=14, method="wilder"):
+    """
+    最新 ATR
+    method: wilder — Wilder 平滑；sma_first — 最前 period 根 TR 平均 (pullback_alert)；
+            sma_last — 最後 period 根 TR 平均
+    """
+    tr, one_d = _as_2d(true_range(highs, lows, closes))
+    rows, m = tr.shape
+    if method == "wilder":
+        value = np.atleast_2d(atr_series(highs, lows, closes, period))[:, -1]
+    elif method == "sma_first":
+        k = min(period, m)
+        value = tr[:, :k].mean(axis=1) if k > 0 else np.zeros(rows)
+    elif method == "sma_last":
+        value = tr[:, -period:].mean(axis=1) if m >= period else np.full(rows, np.nan)
+    else:
+        raise ValueError(f"unknown ATR method: {method}")
+    return float(value[0]) if one_d else value
+
+
+def adx_dmi_series(highs, lows, closes, period=14):
+    """
+    ADX / +DI / -DI 序列 (Wilder 加總平滑，同 backtest_adx.calc_adx_dmi)
+    ATR 或 DI 和為 0 的 K 線不產生 DX (沿用前值)；資料不足處為 NaN
+    Returns: (adx, pdi, ndi) 與 K 線同長
+    """
+    h, one_d = _as_2d(highs)
+    l, _ = _as_2d(lows)
+    c, _ = _as_2d(closes)
+    rows, n = h.shape
+    out = [np.full((rows, n), np.nan) for _ in range(3)]
+    if n < period + 2:
+        return tuple(_restore(o, one_d) for o in out)
+
+    tr = true_range(h, l, c)
+    up = h[:, 1:] - h[:, :-1]
+    down = l[:, :-1] - l[:, 1:]
+    pdm = np.where((up > down) & (up > 0), up, 0.0)
+    ndm = np.where((down > up) & (down > 0), down, 0.0)
+
+    # 加總平滑 s = s - s / period + x (前 period 根直接加總當種子)
+    keep = (period - 1) / period
+    moves = np.concatenate([tr, pdm, ndm])
+    s_tr, s_pdm, s_ndm = np.split(_linear_scan(moves[:, period:], keep, moves[:, :period].sum(axis=1)), 3)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        pdi = (s_pdm / s_tr) * 100
+        ndi = (s_ndm / s_tr) * 100
+        di_sum = pdi + ndi
+        dx = np.abs(pdi - ndi) / di_sum * 100
+    valid = (s_tr != 0) & (di_sum != 0)
+    count = np.cumsum(valid, axis=1)
+
+    # ADX: 前 period 個有效 DX 平均當種子，之後只在有效 DX 時 Wilder 平滑 (無效時 a = 1、x = 0 沿用前值)
+    seed = np.cumsum(np.where(valid & (count <= period), dx, 0.0), axis=1)
+    smooth = valid & (count > period)
+    start = valid & (count == period)
+    x = np.where(smooth, dx / period, np.where(start, seed / period, 0.0))
+    adx = _linear_scan(x, np.where(smooth, keep, 1.0), 0.0)
+
+    # +DI / -DI 沿用最後一個有效值
+    steps = s_tr.shape[1]
+    last = np.maximum.accumulate(np.where(valid, np.arange(steps)[None, :], -1), axis=1)
+    take = np.maximum(last, 0)
+    ready = count >= period
+    for o, v in zip(out, (adx, np.take_along_axis(pdi, take, axis=1), np.take_along_axis(ndi, take, axis=1))):
+        o[:, period + 1:] = np.where(ready, v, np.nan)
+    return tuple(_restore(o, one_d) for o in out)
+
+
+def adx_dmi(highs, lows, closes, period=14):
+    """最新一根的 (adx, pdi, ndi)，資料不足為 NaN"""
+    series = adx_dmi_series(highs, lows, closes, period)
+    if np.ndim(highs) == 1:
+        return tuple(float(s[-1]) for s in series)
+    return tuple(s[:, -1] for s in series)
+
+
+# ─── 增量指標 ───
+# update(): 餵一根「已收盤」K 線的值；peek(): 不改狀態，回傳加上未收盤 K 線後的暫定值
+# value: 目前 (只含收盤 K 線) 的值，資料不足時為預設值 / NaN
+
+class WilderRSI:
+    """增量 Wilder RSI (= rsi(closes, period, "wilder", zero_loss))"""
+    kind = "rsi"
+    field = "close"
+
+    def __init__(self, period=14, zero_loss="max", default=50.0):
+        self.period = period
+        self.zero_loss = zero_loss
+        self.default = float(default)
+        self.prev = None
+        self.seed_gains = []    # 種子期的 gain / loss (np.mean 用)
+        self.seed_losses = []
+        self.avg_gain = None
+        self.avg_loss = None
+
+    def _step(self, close):
+        """回傳 (avg_gain, avg_loss, seed_gains, seed_losses)"""
+        d = close - self.prev
+        g = d if d > 0 else 0.0
+        l = -d if d < 0 else 0.0
+        if self.avg_gain is not None:
+            p = self.period
+            return ((self.avg_gain * (p - 1) + g) / p, (self.avg_loss * (p - 1) + l) / p, None, None)
+        gains, losses = self.seed_gains + [g], self.seed_losses + [l]
+        if len(gains) == self.period:
+            return float(np.mean(gains)), float(np.mean(losses)), None, None
+        return None, None, gains, losses
+
+    def update(self, close):
+        close = float(close)
+        if self.prev is not None:
+            self.avg_gain, self.avg_loss, gains, losses = self._step(close)
+            self.seed_gains, self.seed_losses = gains or [], losses or []
+        self.prev = close
+        return self.value
+
+    def peek(self, close):
+        if self.prev is None:
+            return self.default
+        avg_gain, avg_loss, _, _ = self._step(float(close))
+        if avg_gain is None:
+            return self.default
+        return float(_rsi_from_avg(avg_gain, avg_loss, self.zero_loss))
+
+    @property
+    def value(self):
+        if self.avg_gain is None:
+            return self.default
+        return float(_rsi_from_avg(self.avg_gain, self.avg_loss, self.zero_loss))
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "zero_loss": self.zero_loss,
+                "default": self.default, "prev": self.prev, "seed": [self.seed_gains, self.seed_losses],
+                "avg": None if self.avg_gain is None else [self.avg_gain, self.avg_loss]}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"], d["zero_loss"], d["default"])
+        obj.prev = d["prev"]
+        obj.seed_gains, obj.seed_losses = d["seed"]
+        if d["avg"] is not None:
+            obj.avg_gain, obj.avg_loss = d["avg"]
+        return obj
+
+
+class WilderATR:
+    """增量 Wilder ATR (= atr_series(...)[-1])"""
+    kind = "atr"
+    field = ("high", "low", "close")
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev_close = None
+        self.count = 0          # 已累積的 TR 數
+        self.acc = 0.0          # 種子期 TR 依序加總 / 之後為 ATR
+
+    def _tr(self, high, low):
+        pc = self.prev_close
+        return max(max(high - low, abs(high - pc)), abs(low - pc))
+
+    def _next(self, tr):
+        p = self.period
+        if self.count >= p:
+            return (self.acc * (p - 1) + tr) / p
+        acc = tr if self.count == 0 else self.acc + tr
+        return acc / p if self.count == p - 1 else acc
+
+    def update(self, high, low, close):
+        if self.prev_close is not None:
+            self.acc = self._next(self._tr(float(high), float(low)))
+            self.count += 1
+        self.prev_close = float(close)
+        return self.value
+
+    def peek(self, high, low, close):
+        if self.prev_close is None or self.count + 1 < self.period:
+            return np.nan
+        return self._next(self._tr(float(high), float(low)))
+
+    @property
+    def value(self):
+        return self.acc if self.count >= self.period else np.nan
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "prev_close": self.prev_close,
+                "count": self.count, "acc": self.acc}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"])
+        obj.prev_close, obj.count, obj.acc = d["prev_close"], d["count"], d["acc"]
+        return obj
+
+
+class ADXDMI:
+    """增量 ADX / +DI / -DI (= adx_dmi(...))，value 為 (adx, pdi, ndi)"""
+    kind = "adx"
+    field = ("high", "low", "close")
+
+    def __init__(self, period=14):
+        self.period = period
+        self.prev = None        # (high, low, close)
+        self.n_tr = 0           # 已累積的 TR 數
+        self.sums = [0.0, 0.0, 0.0]   # 平滑後的 TR / +DM / -DM (種子期為依序加總)
+        self.count = 0          # 有效 DX 數
+        self.seed = 0.0
+        self.adx = np.nan
+        self.pdi = np.nan
+        self.ndi = np.nan
+
+    def _step(self, high, low):
+        """回傳下一步的 (n_tr, sums, count, seed, adx, pdi, ndi)"""
+        ph, pl, pc = self.prev
+        tr = max(max(high - low, abs(high - pc)), abs(low - pc))
+        up, down = high - ph, pl - low
+        pdm = up if (up > down and up > 0) else 0.0
+        ndm = down if (down > up and down > 0) else 0.0
+        p = self.period
+        s_tr, s_pdm, s_ndm = self.sums
+        count, seed, adx, pdi_last, ndi_last = self.count, self.seed, self.adx, self.pdi, self.ndi
+        if self.n_tr < p:
+            if self.n_tr == 0:
+                sums = [tr, pdm, ndm]
+            else:
+                sums = [s_tr + tr, s_pdm + pdm, s_ndm + ndm]
+            return self.n_tr + 1, sums, count, seed, adx, pdi_last, ndi_last
+
+        s_tr = s_tr - (s_tr / p) + tr
+        s_pdm = s_pdm - (s_pdm / p) + pdm
+        s_ndm = s_ndm - (s_ndm / p) + ndm
+        if s_tr != 0:
+            pdi = (s_pdm / s_tr) * 100
+            ndi = (s_ndm / s_tr) * 100
+            di_sum = pdi + ndi
+            if di_sum != 0:
+                dx = abs(pdi - ndi) / di_sum * 100
+                count += 1
+                if count <= p:
+                    seed = dx if count == 1 else seed + dx
+                    if count == p:
+                        adx = seed / p
+                else:
+                    adx = (adx * (p - 1) + dx) / p
+                pdi_last, ndi_last = pdi, ndi
+        return self.n_tr + 1, [s_tr, s_pdm, s_ndm], count, seed, adx, pdi_last, ndi_last
+
+    def _output(self, count, adx, pdi, ndi):
+        if count >= self.period:
+            return (adx, pdi, ndi)
+        return (np.nan, np.nan, np.nan)
+
+    def update(self, high, low, close):
+        high, low, close = float(high), float(low), float(close)
+        if self.prev is not None:
+            (self.n_tr, self.sums, self.count, self.seed,
+             self.adx, self.pdi, self.ndi) = self._step(high, low)
+        self.prev = (high, low, close)
+        return self.value
+
+    def peek(self, high, low, close):
+        if self.prev is None:
+            return (np.nan, np.nan, np.nan)
+        _, _, count, _, adx, pdi, ndi = self._step(float(high), float(low))
+        return self._output(count, adx, pdi, ndi)
+
+    @property
+    def value(self):
+        return self._output(self.count, self.adx, self.pdi, self.ndi)
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "prev": self.prev, "n_tr": self.n_tr,
+                "sums": self.sums, "count": self.count, "seed": self.seed,
+                "adx": self.adx, "pdi": self.pdi, "ndi": self.ndi}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"])
+        obj.prev = tuple(d["prev"]) if d["prev"] is not None else None
+        obj.n_tr, obj.sums, obj.count, obj.seed = d["n_tr"], d["sums"], d["count"], d["seed"]
+        obj.adx, obj.pdi, obj.ndi = d["adx"], d["pdi"], d["ndi"]
+        return obj
+
+
+class EMA:
+    """增量 EMA (= ema(values, period, seed))"""
+    kind = "ema"
+    field = "close"
+
+    def __init__(self, period, seed="sma"):
+        if seed not in ("sma", "first"):
+            raise ValueError(f"unknown EMA seed: {seed}")
+        self.period = period
+        self.seed = seed
+        self.count = 0
+        self.acc = 0.0          # sma 種子期為依序加總，之後為 EMA
+
+    def _next(self, x):
+        p = self.period
+        if self.seed == "first" and self.count == 0:
+            return x
+        if self.seed == "sma" and self.count < p:
+            acc = x if self.count == 0 else self.acc + x
+            return acc / p if self.count == p - 1 else acc
+        alpha = 2 / (p + 1)
+        return alpha * x + (1 - alpha) * self.acc
+
+    def _ready(self, count):
+        return count >= (1 if self.seed == "first" else self.period)
+
+    def update(self, x):
+        self.acc = self._next(float(x))
+        self.count += 1
+        return self.value
+
+    def peek(self, x):
+        return self._next(float(x)) if self._ready(self.count + 1) else np.nan
+
+    @property
+    def value(self):
+        return self.acc if self._ready(self.count) else np.nan
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "seed": self.seed,
+                "count": self.count, "acc": self.acc}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"], d["seed"])
+        obj.count, obj.acc = d["count"], d["acc"]
+        return obj
+
+
+class RollingMean:
+    """
+    增量滑動平均 (= sum(values[-period:]) / period，常用於均量)
+    維護視窗和，每滿一輪 period 根重新加總一次，避免累積誤差；
+    資料不足 period 根時用現有根數平均
+    """
+    kind = "mean"
+
+    def __init__(self, period, field="volume"):
+        self.period = period
+        self.field = field
+        self.window = deque(maxlen=period)
+        self.total = 0.0
+        self.count = 0
+
+    def _dropped(self):
+        """下一根進來時會移出視窗的值"""
+        return self.window[0] if len(self.window) == self.period else 0.0
+
+    def update(self, x):
+        x = float(x)
+        self.total += x - self._dropped()
+        self.window.append(x)
+        self.count += 1
+        if self.count % self.period == 0:
+            self.total = sum(self.window)
+        return self.value
+
+    def peek(self, x):
+        n = min(len(self.window) + 1, self.period)
+        return (self.total - self._dropped() + float(x)) / n
+
+    @property
+    def value(self):
+        return self.total / len(self.window) if self.window else np.nan
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "field": self.field,
+                "window": list(self.window)}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"], d["field"])
+        obj.window.extend(d["window"])
+        obj.total = sum(obj.window)
+        return obj
+
+
+class RollingMax:
+    """增量滑動最大值 (= max(values[-period:]))，單調佇列，攤提 O(1)"""
+    kind = "max"
+    sign = 1
+
+    def __init__(self, period, field="high"):
+        self.period = period
+        self.field = field
+        self.count = 0
+        self.queue = deque()    # [(index, value)]，value 依 sign 單調遞減
+
+    def _better(self, a, b):
+        return a * self.sign >= b * self.sign
+
+    def update(self, x):
+        x = float(x)
+        while self.queue and self._better(x, self.queue[-1][1]):
+            self.queue.pop()
+        self.queue.append((self.count, x))
+        self.count += 1
+        while self.queue[0][0] <= self.count - 1 - self.period:
+            self.queue.popleft()
+        return self.value
+
+    def peek(self, x):
+        x = float(x)
+        q = self.queue
+        # 下一根進來時只有 index = count - period 會移出，佇列單調，前兩個就夠
+        head = 1 if q and q[0][0] <= self.count - self.period else 0
+        if len(q) > head and self._better(q[head][1], x):
+            return q[head][1]
+        return x
+
+    @property
+    def value(self):
+        return self.queue[0][1] if self.queue else np.nan
+
+    def to_dict(self):
+        return {"kind": self.kind, "period": self.period, "field": self.field,
+                "count": self.count, "queue": [list(q) for q in self.queue]}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls(d["period"], d["field"])
+        obj.count = d["count"]
+        obj.queue.extend(tuple(q) for q in d["queue"])
+        return obj
+
+
+class RollingMin(RollingMax):
+    """增量滑動最小值 (= min(values[-period:]))"""
+    kind = "min"
+    sign = -1
+
+    def __init__(self, period, field="low"):
+        super().__init__(period, field)
+
+
+_INCREMENTAL = {cls.kind: cls for cls in (WilderRSI, WilderATR, ADXDMI, EMA,
+                                          RollingMean, RollingMax, RollingMin)}
+
+
+def incremental_from_dict(d):
+    return _INCREMENTAL[d["kind"]].from_dict(d)
+
+
+class IndicatorStream:
+    """
+    一組增量指標 (同一 symbol × 時框)
+    update(klines): 最後一根視為未收盤；只餵比上次新的收盤 K 線，
+    第一次或中間斷層時用這批 K 線重建，回傳 {name: 含未收盤 K 線的暫定值}
+    """
+
+    def __init__(self, indicators):
+        self.indicators = dict(indicators)
+        self.specs = {name: ind.to_dict() for name, ind in self.indicators.items()}  # 重建用的初始狀態
+        self.interval_ms = 0
+        self.last_open_time = None
+
+    def reset(self):
+        self.indicators = {name: incremental_from_dict(d) for name, d in self.specs.items()}
+        self.interval_ms = 0
+        self.last_open_time = None
+
+    @staticmethod
+    def _args(ind, k):
+        if isinstance(ind.field, tuple):
+            return [k[f] for f in ind.field]
+        return [k[ind.field]]
+
+    def push(self, k):
+        """餵一根收盤 K 線"""
+        for ind in self.indicators.values():
+            ind.update(*self._args(ind, k))
+        self.last_open_time = k["open_time"]
+
+    def update(self, klines):
+        if len(klines) < 2:
+            return {name: ind.value for name, ind in self.indicators.items()}
+        interval_ms = klines[-1]["open_time"] - klines[-2]["open_time"]
+        closed = klines[:-1]
+        if self.last_open_time is None:
+            new_bars = closed
+        else:
+            new_bars = [k for k in closed if k["open_time"] > self.last_open_time]
+
+        if new_bars and (self.last_open_time is None or interval_ms != self.interval_ms
+                         or new_bars[0]["open_time"] != self.last_open_time + interval_ms):
+            self.reset()
+            new_bars = closed
+        self.interval_ms = interval_ms
+
+        for k in new_bars:
+            self.push(k)
+        forming = klines[-1]
+        return {name: ind.peek(*self._args(ind, forming)) for name, ind in self.indicators.items()}
+
+    def values(self):
+        """只含收盤 K 線的值"""
+        return {name: ind.value for name, ind in self.indicators.items()}
+
+    def to_dict(self):
+        return {"specs": self.specs, "interval_ms": self.interval_ms,
+                "last_open_time": self.last_open_time,
+                "state": {name: ind.to_dict() for name, ind in self.indicators.items()}}
+
+    @classmethod
+    def from_dict(cls, d):
+        obj = cls({})
+        obj.specs = d["specs"]
+        obj.indicators = {name: incremental_from_dict(s) for name, s in d["state"].items()}
+        obj.interval_ms = d["interval_ms"]
+        obj.last_open_time = d["last_open_time"]
+        return obj
+
+
+def load_indicator_streams(filepath):
+    """讀取 IndicatorStream 狀態檔 → {key: stream}"""
+    try:
+        with open(filepath, "r") as f:
+            data = json.load(f)
+        return {key: IndicatorStream.from_dict(d) for key, d in data.items()}
+    except:
+        return {}
+
+
+def save_indicator_streams(filepath, streams):
+    try:
+        with open(filepath, "w") as f:
+            json.dump({key: s.to_dict() for key, s in streams.items()}, f, separators=(",", ":"))
+    except:
+        pass
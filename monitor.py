@@ -4,27 +4,42 @@ Monitor 系統 - Order Block 和 FVG 監控
 """
 import os
 import json
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import numpy as np
 
 # 使用共用模組
 from config import (
     MONITOR_SIGNALS_FILE,
-    OB_STATE_FILE,
+    OB_ENGINE_STATE_FILE,
+    INDICATOR_STREAM_STATE_FILE,
     TW_TIMEZONE,
-    DISCORD_THREAD_TECH
+    DISCORD_THREAD_TECH,
+    MONITOR_SYMBOLS,
+    MONITOR_TOP_N,
+    MONITOR_MAX_WORKERS,
+    EXCLUDED_SYMBOLS
 )
-from exchange_api import get_klines
-from notify import send_discord_message
+from exchange_api import get_klines, get_klines_multi, get_all_tickers
+from notify import send_discord_message, split_message
+from ob_store import OBLifecycleStore, ob_id
+from indicators import rsi as calc_rsi_value
+from indicators import IndicatorStream, WilderRSI, load_indicator_streams, save_indicator_streams
+from indicator_cache import closed_rsi
 from ob_engine import (
+    find_swing_points,
     find_order_blocks_v2,
     filter_and_rank_obs,
     resolve_direction_conflict,
     calc_entry_sl_tp,
-    score_ob
+    score_ob,
+    load_ob_engines,
+    save_ob_engines,
+    get_ob_engine
 )
 
-SYMBOLS = ["BTCUSDT", "ETHUSDT"]
+SYMBOLS = MONITOR_SYMBOLS
 
 CONFIDENCE_TABLE = {
     "rsi_high_bearish": 75,
@@ -52,25 +67,26 @@ def save_json(filepath, data):
 # 注意：get_klines 已從 exchange_api 導入，此處不需要重新定義
 # 如果 exchange_api.get_klines 返回格式不同，在此處轉換
 
-def calculate_rsi(klines, period=14):
+# 1H RSI 走跨腳本快取 (已收盤 K 線，整根 K 線內不變)
+RSI_1H_PARAMS = {"period": 14, "method": "wilder", "zero_loss": "max", "bars": 72}
+
+
+def calculate_rsi(klines, period=14, stream=None):
+    """stream: 該 symbol × 時框的 IndicatorStream，有給就只餵新收盤的 K 線"""
+    if stream is not None:
+        return stream.update(klines)["rsi"]
     if len(klines) < period + 1:
         return 50
-    closes = [k["close"] for k in klines]
-    deltas = np.diff(closes)
-    gains = np.where(deltas > 0, deltas, 0)
-    losses = np.where(deltas < 0, -deltas, 0)
-    
-    avg_gain = np.mean(gains[:period])
-    avg_loss = np.mean(losses[:period])
-    
-    for i in range(period, len(gains)):
-        avg_gain = (avg_gain * (period - 1) + gains[i]) / period
-        avg_loss = (avg_loss * (period - 1) + losses[i]) / period
-    
-    if avg_loss == 0:
-        return 100
-    rs = avg_gain / avg_loss
-    return 100 - (100 / (1 + rs))
+    return calc_rsi_value([k["close"] for k in klines], period, method="wilder", zero_loss="max")
+
+def get_rsi_stream(streams, symbol, tf, period=14):
+    """取得 (symbol, 時框) 的增量 RSI，沒有就建立；streams 為 None 時回傳 None (整段重算)"""
+    if streams is None:
+        return None
+    key = f"{symbol}:{tf}:rsi{period}"
+    if key not in streams:
+        streams[key] = IndicatorStream({"rsi": WilderRSI(period, "max")})
+    return streams[key]
 
 def rsi_emoji(rsi):
     if rsi <= 30: return "🔴"
@@ -85,14 +101,13 @@ def find_order_blocks(klines, swing_length=3):
     avg_vol = np.mean([k["volume"] for k in klines[-50:]]) if len(klines) >= 50 else np.mean([k["volume"] for k in klines])
     closes = [k["close"] for k in klines]
     
-    for i in range(swing_length, len(klines) - swing_length - 1):
-        highs = [k["high"] for k in klines]
-        lows = [k["low"] for k in klines]
-        
-        is_swing_high = all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
-                        all(highs[i] > highs[i+j] for j in range(1, swing_length+1))
-        is_swing_low = all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
-                       all(lows[i] < lows[i+j] for j in range(1, swing_length+1))
+    swing_highs, swing_lows = find_swing_points(
+        [k["high"] for k in klines], [k["low"] for k in klines], swing_length)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
+    
+    for i in sorted(swing_highs | swing_lows):
+        is_swing_high = i in swing_highs
+        is_swing_low = i in swing_lows
         
         vol_ratio = klines[i]["volume"] / avg_vol if avg_vol > 0 else 1
         rsi_at_ob = calculate_rsi(klines[:i+1])
@@ -194,21 +209,24 @@ def get_confidence(ob):
     
     return min(base, 95)
 
-def check_ob_status(symbol, price, bullish_obs, bearish_obs):
-    ob_state = load_json(OB_STATE_FILE)
-    if not isinstance(ob_state, dict):
-        ob_state = {}
+def check_ob_status(symbol, price, bullish_obs, bearish_obs, store=None):
+    """
+    OB 階段追蹤 (watching → testing → defended / broken)
+    store: 共用的 OBLifecycleStore，由呼叫端統一 load / compact / save；
+           沒給就自己讀寫一次，存檔前照樣 compact (本幣只留這次傳入的 OB，其他幣照 TTL)
+    """
+    own_store = store is None
+    if own_store:
+        store = OBLifecycleStore().load()
 
     base = symbol.replace("USDT", "")
-    if base not in ob_state:
-        ob_state[base] = {}
-
+    now = time.time()
     alerts = []
 
     for ob in bullish_obs:
-        ob_key = f"bull_{ob['tf']}_{ob['bottom']:.0f}_{ob['top']:.0f}"
-        prev = ob_state[base].get(ob_key, {"stage": "watching"})
-        stage = prev.get("stage", "watching")
+        ob_key = ob_id(ob)
+        stage = store.get_stage(base, ob_key)
+        store.touch(base, ob_key, now)
 
         in_zone = price <= ob["top"] and price >= ob["bottom"]
         above = price > ob["top"]
@@ -219,43 +237,43 @@ def check_ob_status(symbol, price, bullish_obs, bearish_obs):
                 "type": "TEST", "ob_type": "bullish", "symbol": base, "price": price, "ob": ob,
                 "message": f"⚠️ {base} ${price:,.0f} 測試支撐 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "testing"}
+            store.set_stage(base, ob_key, "testing", now)
 
         elif stage == "testing" and above:
             alerts.append({
                 "type": "DEFEND", "ob_type": "bullish", "symbol": base, "price": price, "ob": ob,
                 "message": f"✅ {base} ${price:,.0f} 守住支撐 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "defended"}
+            store.set_stage(base, ob_key, "defended", now)
 
         elif stage == "testing" and below:
             alerts.append({
                 "type": "BREAK", "ob_type": "bullish", "symbol": base, "price": price, "ob": ob,
                 "message": f"❌ {base} ${price:,.0f} 跌破支撐 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "broken"}
+            store.set_stage(base, ob_key, "broken", now)
 
         elif stage == "defended" and in_zone:
-            ob_state[base][ob_key] = {"stage": "testing"}
+            store.set_stage(base, ob_key, "testing", now)
 
         elif stage == "defended" and below:
             alerts.append({
                 "type": "BREAK", "ob_type": "bullish", "symbol": base, "price": price, "ob": ob,
                 "message": f"❌ {base} ${price:,.0f} 跌破支撐 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "broken"}
+            store.set_stage(base, ob_key, "broken", now)
 
         elif stage == "broken" and above:
             alerts.append({
                 "type": "RECLAIM", "ob_type": "bullish", "symbol": base, "price": price, "ob": ob,
                 "message": f"🔄 {base} ${price:,.0f} 收復支撐 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "defended"}
+            store.set_stage(base, ob_key, "defended", now)
 
     for ob in bearish_obs:
-        ob_key = f"bear_{ob['tf']}_{ob['bottom']:.0f}_{ob['top']:.0f}"
-        prev = ob_state[base].get(ob_key, {"stage": "watching"})
-        stage = prev.get("stage", "watching")
+        ob_key = ob_id(ob)
+        stage = store.get_stage(base, ob_key)
+        store.touch(base, ob_key, now)
 
         in_zone = price >= ob["bottom"] and price <= ob["top"]
         below = price < ob["bottom"]
@@ -266,50 +284,42 @@ def check_ob_status(symbol, price, bullish_obs, bearish_obs):
                 "type": "TEST", "ob_type": "bearish", "symbol": base, "price": price, "ob": ob,
                 "message": f"⚠️ {base} ${price:,.0f} 測試阻力 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "testing"}
+            store.set_stage(base, ob_key, "testing", now)
 
         elif stage == "testing" and below:
             alerts.append({
                 "type": "DEFEND", "ob_type": "bearish", "symbol": base, "price": price, "ob": ob,
                 "message": f"✅ {base} ${price:,.0f} 守住阻力 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "defended"}
+            store.set_stage(base, ob_key, "defended", now)
 
         elif stage == "testing" and above:
             alerts.append({
                 "type": "BREAK", "ob_type": "bearish", "symbol": base, "price": price, "ob": ob,
                 "message": f"❌ {base} ${price:,.0f} 突破阻力 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "broken"}
+            store.set_stage(base, ob_key, "broken", now)
 
         elif stage == "defended" and in_zone:
-            ob_state[base][ob_key] = {"stage": "testing"}
+            store.set_stage(base, ob_key, "testing", now)
 
         elif stage == "defended" and above:
             alerts.append({
                 "type": "BREAK", "ob_type": "bearish", "symbol": base, "price": price, "ob": ob,
                 "message": f"❌ {base} ${price:,.0f} 突破阻力 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "broken"}
+            store.set_stage(base, ob_key, "broken", now)
 
         elif stage == "broken" and below:
             alerts.append({
                 "type": "RECLAIM", "ob_type": "bearish", "symbol": base, "price": price, "ob": ob,
                 "message": f"🔄 {base} ${price:,.0f} 收復阻力 OB [{ob['tf']}] ${ob['bottom']:,.0f}-${ob['top']:,.0f}"
             })
-            ob_state[base][ob_key] = {"stage": "defended"}
-
-    stale = []
-    for k in ob_state[base]:
-        if k.startswith("bull_") or k.startswith("bear_"):
-            all_keys = [f"bull_{o['tf']}_{o['bottom']:.0f}_{o['top']:.0f}" for o in bullish_obs]
-            all_keys += [f"bear_{o['tf']}_{o['bottom']:.0f}_{o['top']:.0f}" for o in bearish_obs]
-            if k not in all_keys:
-                stale.append(k)
-    for k in stale:
-        del ob_state[base][k]
-
-    save_json(OB_STATE_FILE, ob_state)
+            store.set_stage(base, ob_key, "defended", now)
+
+    if own_store:
+        store.compact({base: {ob_id(ob) for ob in bullish_obs + bearish_obs}}, now)
+        store.save()
     return alerts
 
 _signal_cooldown = {}  # 冷卻追蹤: key -> timestamp
@@ -445,11 +455,19 @@ def log_signals(signals):
     save_json(MONITOR_SIGNALS_FILE, logs)
     print(f"已記錄 {len(signals)} 個訊號")
 
-def analyze_symbol(symbol):
-    klines_15m = get_klines(symbol, "15m", 96)
-    klines_30m = get_klines(symbol, "30m", 96)
-    klines_1h = get_klines(symbol, "1H", 72)
-    klines_4h = get_klines(symbol, "4H", 42)
+def analyze_symbol(symbol, engines=None, streams=None):
+    """
+    engines: {key: IncrementalOBEngine}，有給就用增量 OB 引擎，否則整段重算
+    streams: {key: IndicatorStream}，有給就用增量 RSI
+    """
+    # 一次抓 15m，本地合成 30m / 1H / 4H
+    tf_klines = get_klines_multi(symbol, "15m", {
+        "15m": ("15m", 96), "30m": ("30m", 96), "1H": ("1H", 72), "4H": ("4H", 42)
+    })
+    klines_15m = tf_klines["15m"]
+    klines_30m = tf_klines["30m"]
+    klines_1h = tf_klines["1H"]
+    klines_4h = tf_klines["4H"]
     
     if not klines_15m and not klines_1h:
         return None
@@ -457,18 +475,25 @@ def analyze_symbol(symbol):
     klines_main = klines_15m or klines_1h
     current_price = klines_main[-1]["close"]
     
-    rsi_15m = calculate_rsi(klines_15m) if klines_15m else 50
-    rsi_30m = calculate_rsi(klines_30m) if klines_30m else 50
-    rsi_1h = calculate_rsi(klines_1h) if klines_1h else 50
-    rsi_4h = calculate_rsi(klines_4h) if klines_4h else 50
+    rsi_15m = calculate_rsi(klines_15m, stream=get_rsi_stream(streams, symbol, "15m")) if klines_15m else 50
+    rsi_30m = calculate_rsi(klines_30m, stream=get_rsi_stream(streams, symbol, "30m")) if klines_30m else 50
+    rsi_1h = closed_rsi(symbol, "1h", klines_1h, RSI_1H_PARAMS) if klines_1h else None
+    if rsi_1h is None:
+        rsi_1h = 50
+    rsi_4h = calculate_rsi(klines_4h, stream=get_rsi_stream(streams, symbol, "4h")) if klines_4h else 50
     
     # ─── V2 OB 偵測 (含失效過濾 + 品質評分) ───
     all_obs = []
     all_fvgs = []
+    ob_ids = []  # 所有仍有效的 OB (過濾前)，給 OB 狀態淘汰用
     for tf_name, klines, swing in [("15M", klines_15m, 2), ("1H", klines_1h, 3), ("4H", klines_4h, 3)]:
         if not klines:
             continue
-        raw_obs = find_order_blocks_v2(klines, swing)
+        if engines is not None:
+            raw_obs = get_ob_engine(engines, symbol, tf_name, swing).update(klines)
+        else:
+            raw_obs = find_order_blocks_v2(klines, swing)
+        ob_ids.extend(ob_id(dict(ob, tf=tf_name)) for ob in raw_obs)
         bull, bear = filter_and_rank_obs(raw_obs, current_price, tf=tf_name, max_distance_pct=5.0)
         for ob in bull + bear:
             ob["tf"] = tf_name
@@ -507,9 +532,35 @@ def analyze_symbol(symbol):
         "bullish_obs": bullish_obs,
         "bearish_obs": bearish_obs,
         "bullish_fvgs": bullish_fvgs,
-        "bearish_fvgs": bearish_fvgs
+        "bearish_fvgs": bearish_fvgs,
+        "ob_ids": ob_ids
     }
 
+def get_universe(top_n=MONITOR_TOP_N):
+    """監控清單: top_n > 0 取 24h 成交額前 N 名，取不到就用固定清單"""
+    if top_n > 0:
+        tickers = [t for t in get_all_tickers() if t["symbol"] not in EXCLUDED_SYMBOLS]
+        tickers.sort(key=lambda t: t.get("volume_24h", 0), reverse=True)
+        symbols = [t["symbol"] for t in tickers[:top_n]]
+        if symbols:
+            return symbols
+    return list(SYMBOLS)
+
+def _analyze_safe(symbol, engines, streams):
+    try:
+        return analyze_symbol(symbol, engines, streams)
+    except Exception as e:
+        print(f"  {symbol} 分析失敗: {e}")
+        return None
+
+def analyze_all(symbols, engines=None, streams=None, max_workers=MONITOR_MAX_WORKERS):
+    """
+    並行抓 K 線 + 分析，回傳與 symbols 同順序的結果 (失敗為 None)
+    OB 狀態、訊號冷卻等有副作用的步驟留給呼叫端依序處理
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(symbols) or 1))) as ex:
+        return list(ex.map(lambda s: _analyze_safe(s, engines, streams), symbols))
+
 def format_message(analyses):
     tw_tz = TW_TIMEZONE
     now = datetime.now(tw_tz).strftime("%m/%d %H:%M")
@@ -578,7 +629,8 @@ def format_message(analyses):
 
 def send_discord(message):
     """發送 Discord 訊息（使用共用 notify 模組）"""
-    success = send_discord_message(message, thread_id=DISCORD_THREAD_TECH)
+    success = all([send_discord_message(chunk, thread_id=DISCORD_THREAD_TECH)
+                   for chunk in split_message(message)])
     if success:
         print("Discord: 200 OK")
     else:
@@ -649,10 +701,17 @@ def main():
     analyses = []
     all_signals = []
     ob_alerts = []
+    engines = load_ob_engines(OB_ENGINE_STATE_FILE)
+    streams = load_indicator_streams(INDICATOR_STREAM_STATE_FILE)
+    store = OBLifecycleStore().load()
+    active_ids = {}
+    
+    symbols = get_universe()
+    print(f"Analyzing {len(symbols)} symbols ({MONITOR_MAX_WORKERS} workers)...")
+    results = analyze_all(symbols, engines, streams)
     
-    for symbol in SYMBOLS:
-        print(f"Analyzing {symbol}...")
-        result = analyze_symbol(symbol)
+    # 依清單順序處理，報表與 OB 狀態更新不受完成順序影響
+    for symbol, result in zip(symbols, results):
         if result:
             analyses.append(result)
             signals = detect_signals(result)
@@ -662,12 +721,20 @@ def main():
                 symbol, 
                 result["price"], 
                 result["bullish_obs"], 
-                result["bearish_obs"]
+                result["bearish_obs"],
+                store
             )
             ob_alerts.extend(ob_status)
+            active_ids[symbol.replace("USDT", "")] = set(result["ob_ids"])
             
-            print(f"  OK: ${result['price']:,.2f}, {len(signals)} 訊號, {len(ob_status)} OB狀態")
-    
+            print(f"  {symbol} OK: ${result['price']:,.2f}, {len(signals)} 訊號, {len(ob_status)} OB狀態")
+    
+    save_ob_engines(OB_ENGINE_STATE_FILE, engines)
+    # 只保留本輪清單內的幣，掉出 top N 的不再累積
+    save_indicator_streams(INDICATOR_STREAM_STATE_FILE,
+                           {key: s for key, s in streams.items() if key.split(":")[0] in symbols})
+    store.compact(active_ids)
+    store.save()
     log_signals(all_signals)
     
     # 智能通知控制
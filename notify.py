@@ -76,6 +76,20 @@ def send_discord_message(
     return False
 
 
+def split_message(message: str, limit: int = 1900) -> list:
+    """依行切割超過 Discord 長度限制的訊息"""
+    chunks = []
+    current = ""
+    for line in message.split("\n"):
+        if current and len(current) + len(line) + 1 > limit:
+            chunks.append(current.rstrip("\n"))
+            current = ""
+        current += line + "\n"
+    if current.strip():
+        chunks.append(current.rstrip("\n"))
+    return chunks
+
+
 def send_alert(
     title: str,
     message: str,
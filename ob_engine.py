@@ -8,8 +8,10 @@ V3 改動:
 3. 1H 預設 swing=2 增加靈敏度
 4. max_distance_pct 預設放寬到 10%
 """
+import json
 import numpy as np
 from datetime import datetime
+from numpy.lib.stride_tricks import sliding_window_view
 
 # ─── 品質評分權重 ───
 TF_WEIGHT = {"4H": 70, "1H": 55, "15M": 40, "1D": 80}
@@ -21,6 +23,40 @@ AGE_DECAY = {"4H": 12, "1H": 48, "15M": 72, "1D": 14}
 SWING_LENGTH = {"4H": 3, "1H": 2, "15M": 2, "1D": 3}
 
 
+def find_swing_points(highs, lows, swing_length=3):
+    """
+    向量化 swing high / swing low 偵測 (sliding window)
+
+    i 為 swing high: highs[i] 嚴格大於左右各 swing_length 根的 high
+    i 為 swing low : lows[i]  嚴格小於左右各 swing_length 根的 low
+    與原本逐根 all(...) 判斷結果一致，i 的範圍同為
+    [swing_length, len - swing_length - 1)，最後一根 (未收盤) 不當中心
+
+    Returns: (swing_high_idx, swing_low_idx) 兩個遞增的 int ndarray
+    """
+    highs = np.asarray(highs, dtype=float)
+    lows = np.asarray(lows, dtype=float)
+    n = len(highs)
+    empty = np.empty(0, dtype=np.intp)
+    if n - 2 * swing_length - 1 <= 0:
+        return empty, empty
+    if swing_length == 0:
+        idx = np.arange(n - 1, dtype=np.intp)
+        return idx, idx.copy()
+
+    width = 2 * swing_length + 1
+    # 每個視窗的中心 = 視窗起點 + swing_length，去掉最後一個中心 (n - swing_length - 1)
+    hw = sliding_window_view(highs, width)[:-1]
+    lw = sliding_window_view(lows, width)[:-1]
+
+    h_mid = hw[:, swing_length]
+    l_mid = lw[:, swing_length]
+    is_high = (h_mid > hw[:, :swing_length].max(axis=1)) & (h_mid > hw[:, swing_length + 1:].max(axis=1))
+    is_low = (l_mid < lw[:, :swing_length].min(axis=1)) & (l_mid < lw[:, swing_length + 1:].min(axis=1))
+
+    return np.flatnonzero(is_high) + swing_length, np.flatnonzero(is_low) + swing_length
+
+
 def find_order_blocks_v2(klines, swing_length=3):
     """
     偵測 Order Block，含 mitigation 追蹤
@@ -40,14 +76,22 @@ def find_order_blocks_v2(klines, swing_length=3):
     if avg_vol == 0:
         avg_vol = 1
     
-    highs = [k["high"] for k in klines]
-    lows = [k["low"] for k in klines]
+    highs = np.array([k["high"] for k in klines], dtype=float)
+    lows = np.array([k["low"] for k in klines], dtype=float)
+    closes = np.array([k["close"] for k in klines], dtype=float)
+    # 後綴極值: suffix_max[k] = max(closes[k:])，用來 O(1) 判斷失效與最深穿入
+    suffix_max = np.maximum.accumulate(closes[::-1])[::-1]
+    suffix_min = np.minimum.accumulate(closes[::-1])[::-1]
+    
+    swing_highs, swing_lows = find_swing_points(highs, lows, swing_length)
+    swing_highs, swing_lows = set(swing_highs.tolist()), set(swing_lows.tolist())
     
-    for i in range(swing_length, len(klines) - swing_length - 1):
-        is_swing_high = all(highs[i] > highs[i-j] for j in range(1, swing_length+1)) and \
-                        all(highs[i] > highs[i+j] for j in range(1, swing_length+1))
-        is_swing_low = all(lows[i] < lows[i-j] for j in range(1, swing_length+1)) and \
-                       all(lows[i] < lows[i+j] for j in range(1, swing_length+1))
+    # 測試次數離線批次計算: (ob, 起始 index, 門檻)
+    bear_tests, bull_tests = [], []
+    
+    for i in sorted(swing_highs | swing_lows):
+        is_swing_high = i in swing_highs
+        is_swing_low = i in swing_lows
         
         vol_ratio = klines[i]["volume"] / avg_vol if avg_vol > 0 else 1
         
@@ -58,40 +102,33 @@ def find_order_blocks_v2(klines, swing_length=3):
                     ob_top = klines[i-j]["high"]
                     ob_bottom = klines[i-j]["low"]
                     ob_range = ob_top - ob_bottom
+                    max_close = float(suffix_max[i+1])
                     
-                    # Mitigation 追蹤
-                    max_penetration = 0  # 最深穿入比例
-                    test_count = 0
-                    fully_invalidated = False
+                    # 完全失效：之後任一收盤穿過 ob_top 且遠離
+                    if max_close > ob_top + ob_range * 0.5:
+                        break
                     
-                    for k in range(i+1, len(klines)):
-                        # 測試：high 碰到 ob_bottom
-                        if klines[k]["high"] >= ob_bottom:
-                            test_count += 1
-                        
-                        # 穿入深度：用 close 來算
-                        if klines[k]["close"] > ob_bottom and ob_range > 0:
-                            penetration = min((klines[k]["close"] - ob_bottom) / ob_range * 100, 100)
-                            max_penetration = max(max_penetration, penetration)
-                        
-                        # 完全失效：收盤穿過 ob_top 且遠離
-                        if klines[k]["close"] > ob_top + ob_range * 0.5:
-                            fully_invalidated = True
-                            break
+                    # 穿入深度：用 close 來算，最深 = 最高收盤
+                    max_penetration = 0
+                    if max_close > ob_bottom and ob_range > 0:
+                        max_penetration = min((max_close - ob_bottom) / ob_range * 100, 100)
+                        if max_penetration == 100:
+                            max_penetration = _full_penetration(closes[i+1:] - ob_bottom, ob_range)
                     
-                    if not fully_invalidated:
-                        has_fvg = _check_fvg(klines, i, "bearish")
-                        obs.append({
-                            "type": "bearish",
-                            "top": ob_top,
-                            "bottom": ob_bottom,
-                            "vol_ratio": vol_ratio,
-                            "index": i,
-                            "tests": test_count,
-                            "mitigation_pct": round(max_penetration, 1),
-                            "age": len(klines) - 1 - i,
-                            "fvg": has_fvg
-                        })
+                    ob = {
+                        "type": "bearish",
+                        "top": ob_top,
+                        "bottom": ob_bottom,
+                        "vol_ratio": vol_ratio,
+                        "index": i,
+                        "tests": 0,
+                        "mitigation_pct": round(max_penetration, 1),
+                        "age": len(klines) - 1 - i,
+                        "fvg": _check_fvg(klines, i, "bearish")
+                    }
+                    obs.append(ob)
+                    # 測試：high 碰到 ob_bottom
+                    bear_tests.append((ob, i + 1, ob_bottom))
                     break
         
         # ─── Bullish OB (Swing Low) ───
@@ -101,52 +138,93 @@ def find_order_blocks_v2(klines, swing_length=3):
                     ob_top = klines[i-j]["high"]
                     ob_bottom = klines[i-j]["low"]
                     ob_range = ob_top - ob_bottom
+                    min_close = float(suffix_min[i+1])
                     
-                    # Mitigation 追蹤
-                    max_penetration = 0
-                    test_count = 0
-                    fully_invalidated = False
+                    # 完全失效：收盤穿過 ob_bottom 且遠離
+                    if min_close < ob_bottom - ob_range * 0.5:
+                        break
                     
-                    for k in range(i+1, len(klines)):
-                        if klines[k]["low"] <= ob_top:
-                            test_count += 1
-                        
-                        if klines[k]["close"] < ob_top and ob_range > 0:
-                            penetration = min((ob_top - klines[k]["close"]) / ob_range * 100, 100)
-                            max_penetration = max(max_penetration, penetration)
-                        
-                        # 完全失效：收盤穿過 ob_bottom 且遠離
-                        if klines[k]["close"] < ob_bottom - ob_range * 0.5:
-                            fully_invalidated = True
-                            break
+                    max_penetration = 0
+                    if min_close < ob_top and ob_range > 0:
+                        max_penetration = min((ob_top - min_close) / ob_range * 100, 100)
+                        if max_penetration == 100:
+                            max_penetration = _full_penetration(ob_top - closes[i+1:], ob_range)
                     
-                    if not fully_invalidated:
-                        has_fvg = _check_fvg(klines, i, "bullish")
-                        obs.append({
-                            "type": "bullish",
-                            "top": ob_top,
-                            "bottom": ob_bottom,
-                            "vol_ratio": vol_ratio,
-                            "index": i,
-                            "tests": test_count,
-                            "mitigation_pct": round(max_penetration, 1),
-                            "age": len(klines) - 1 - i,
-                            "fvg": has_fvg
-                        })
+                    ob = {
+                        "type": "bullish",
+                        "top": ob_top,
+                        "bottom": ob_bottom,
+                        "vol_ratio": vol_ratio,
+                        "index": i,
+                        "tests": 0,
+                        "mitigation_pct": round(max_penetration, 1),
+                        "age": len(klines) - 1 - i,
+                        "fvg": _check_fvg(klines, i, "bullish")
+                    }
+                    obs.append(ob)
+                    # 測試：low 碰到 ob_top (取負號轉成 >= 查詢)
+                    bull_tests.append((ob, i + 1, -ob_top))
                     break
     
+    for values, pending in ((highs, bear_tests), (-lows, bull_tests)):
+        if not pending:
+            continue
+        counts = suffix_count_ge(values, [p[1] for p in pending], [p[2] for p in pending])
+        for (ob, _, _), c in zip(pending, counts):
+            ob["tests"] = c
+    
     return obs
 
 
+def _full_penetration(depths, ob_range):
+    """
+    穿入達 100% 時沿用逐根 max() 的結果: 第一根達標的是剛好 100.0 還是被截斷的 100
+    """
+    pen = depths / ob_range * 100
+    first = int(np.argmax(pen >= 100))
+    return 100.0 if pen[first] == 100 else 100
+
+
+def suffix_count_ge(values, starts, thresholds):
+    """
+    離線批次計數 (OB 測試次數，ob_engine 與 backtest_ob_v2 共用): 第 q 個查詢回傳 values[starts[q]:] 中 >= thresholds[q] 的個數
+    由後往前把 values 依值排名加入 Fenwick tree，總計 O((n + q) log n)
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    sorted_vals = np.sort(values)
+    ranks = (np.searchsorted(sorted_vals, values, side="left") + 1).tolist()
+    # 門檻排名: 小於門檻的值的個數
+    below = np.searchsorted(sorted_vals, np.asarray(thresholds, dtype=float), side="left").tolist()
+    
+    tree = [0] * (n + 1)
+    result = [0] * len(starts)
+    pos, added = n, 0
+    for q in sorted(range(len(starts)), key=lambda q: starts[q], reverse=True):
+        while pos > starts[q]:
+            pos -= 1
+            r = ranks[pos]
+            while r <= n:
+                tree[r] += 1
+                r += r & -r
+            added += 1
+        r, cnt = below[q], 0
+        while r > 0:
+            cnt += tree[r]
+            r -= r & -r
+        result[q] = added - cnt
+    return result
+
+
 def _check_fvg(klines, index, direction):
     """檢查 OB 附近有沒有 FVG"""
     if index < 2 or index >= len(klines) - 1:
         return None
-    
-    prev = klines[index - 1]
-    curr = klines[index]
-    nxt = klines[index + 1]
-    
+    return _fvg_between(klines[index - 1], klines[index + 1], direction)
+
+
+def _fvg_between(prev, nxt, direction):
+    """prev / nxt 之間的 FVG 缺口"""
     if direction == "bullish":
         gap_top = prev["low"]
         gap_bottom = nxt["high"]
@@ -309,3 +387,201 @@ def calc_entry_sl_tp(ob, direction):
         "risk": risk,
         "rr": rr
     }
+
+
+# ─── 增量 OB 引擎 ───
+
+def _apply_ob_bar(ob, bar):
+    """用一根 K 線更新 OB 的 tests / 穿入深度，回傳 False = 完全失效"""
+    top, bottom = ob["top"], ob["bottom"]
+    ob_range = top - bottom
+    if ob["type"] == "bearish":
+        if bar["high"] >= bottom:
+            ob["tests"] += 1
+        if bar["close"] > bottom and ob_range > 0:
+            ob["max_pen"] = max(ob["max_pen"], min((bar["close"] - bottom) / ob_range * 100, 100))
+        return not bar["close"] > top + ob_range * 0.5
+    else:
+        if bar["low"] <= top:
+            ob["tests"] += 1
+        if bar["close"] < top and ob_range > 0:
+            ob["max_pen"] = max(ob["max_pen"], min((top - bar["close"]) / ob_range * 100, 100))
+        return not bar["close"] < bottom - ob_range * 0.5
+
+
+class IncrementalOBEngine:
+    """
+    增量 Order Block 引擎 (每個 symbol × 時框一個)
+
+    - 只吃新收盤的 K 線，swing 右側 swing_length 根收齊才確認
+    - tests / mitigation / 失效只用新 K 線更新，失效即移除
+    - vol_ratio、age 與未收盤 K 線在 update() 輸出時才套用，
+      K 線相同時輸出與 find_order_blocks_v2 一致
+    - to_dict() / from_dict() 持久化，OB 歷史不受抓取根數限制
+    """
+    BUFFER_SIZE = 60  # 保留的收盤 K 線 (swing 判斷 + 50 根均量)
+
+    def __init__(self, swing_length=3, max_age=200):
+        self.swing_length = swing_length
+        self.max_age = max_age
+        self.interval_ms = 0
+        self.bar_count = 0          # 已處理的收盤 K 線數，下一根的全域 index
+        self.last_open_time = None
+        self.bars = []              # 最近 BUFFER_SIZE 根收盤 K 線
+        self.obs = []               # 未失效的 OB (依確認順序)
+
+    def reset(self):
+        self.interval_ms = 0
+        self.bar_count = 0
+        self.last_open_time = None
+        self.bars = []
+        self.obs = []
+
+    def update(self, klines):
+        """
+        餵入最新抓到的 K 線 (最後一根視為未收盤)
+        Returns: 與 find_order_blocks_v2 相同格式的 OB list (另附 time = OB K 線開盤時間)
+        """
+        if len(klines) < 2:
+            return []
+        interval_ms = klines[-1]["open_time"] - klines[-2]["open_time"]
+        closed = klines[:-1]
+        if self.last_open_time is None:
+            new_bars = closed
+        else:
+            new_bars = [k for k in closed if k["open_time"] > self.last_open_time]
+        
+        if new_bars and (self.last_open_time is None or interval_ms != self.interval_ms
+                         or new_bars[0]["open_time"] != self.last_open_time + interval_ms):
+            # 第一次或中間斷層 → 用這批 K 線重建
+            self.reset()
+            self.interval_ms = interval_ms
+            new_bars = closed
+        
+        for k in new_bars:
+            self._push(k)
+        return self._snapshot(klines[-1], len(klines))
+
+    def _bar(self, idx):
+        return self.bars[idx - (self.bar_count - len(self.bars))]
+
+    def _push(self, k):
+        bar = {f: k[f] for f in ("open_time", "open", "high", "low", "close", "volume")}
+        self.bars.append(bar)
+        if len(self.bars) > self.BUFFER_SIZE:
+            del self.bars[0]
+        self.bar_count += 1
+        self.last_open_time = bar["open_time"]
+        
+        self.obs = [ob for ob in self.obs
+                    if self.bar_count - 1 - ob["index"] <= self.max_age and _apply_ob_bar(ob, bar)]
+        
+        center = self.bar_count - 1 - self.swing_length
+        if center >= self.swing_length:
+            self._confirm(center)
+
+    def _confirm(self, i):
+        """右側收齊，確認 i 是否為 swing 並建立 OB"""
+        L = self.swing_length
+        mid = self._bar(i)
+        around = [self._bar(i + d) for d in range(-L, L + 1) if d]
+        is_swing_high = all(mid["high"] > b["high"] for b in around)
+        is_swing_low = all(mid["low"] < b["low"] for b in around)
+        
+        for direction, is_swing in (("bearish", is_swing_high), ("bullish", is_swing_low)):
+            if not is_swing:
+                continue
+            for j in range(1, min(5, i + 1)):
+                c = self._bar(i - j)
+                if (c["close"] > c["open"]) if direction == "bearish" else (c["close"] < c["open"]):
+                    fvg = _fvg_between(self._bar(i - 1), self._bar(i + 1), direction) if i >= 2 else None
+                    ob = {
+                        "type": direction,
+                        "top": c["high"],
+                        "bottom": c["low"],
+                        "index": i,
+                        "volume": mid["volume"],
+                        "tests": 0,
+                        "max_pen": 0,
+                        "fvg": fvg,
+                        "time": c["open_time"],
+                    }
+                    if all(_apply_ob_bar(ob, self._bar(k)) for k in range(i + 1, self.bar_count)):
+                        self.obs.append(ob)
+                    break
+
+    def _snapshot(self, forming, n):
+        """套用未收盤 K 線 + 即時均量，輸出 OB list"""
+        now = self.bar_count  # 未收盤 K 線的全域 index
+        avg_vol = np.mean([b["volume"] for b in self.bars[-49:]] + [forming["volume"]])
+        if avg_vol == 0:
+            avg_vol = 1
+        
+        result = []
+        for state in self.obs:
+            ob = dict(state)
+            if not _apply_ob_bar(ob, forming):
+                continue
+            vol_ratio = ob["volume"] / avg_vol if avg_vol > 0 else 1
+            if vol_ratio <= 0.5:
+                continue
+            result.append({
+                "type": ob["type"],
+                "top": ob["top"],
+                "bottom": ob["bottom"],
+                "vol_ratio": vol_ratio,
+                "index": ob["index"] - (now - (n - 1)),
+                "tests": ob["tests"],
+                "mitigation_pct": round(ob["max_pen"], 1),
+                "age": now - ob["index"],
+                "fvg": ob["fvg"],
+                "time": ob["time"],
+            })
+        return result
+
+    def to_dict(self):
+        return {
+            "swing_length": self.swing_length,
+            "max_age": self.max_age,
+            "interval_ms": self.interval_ms,
+            "bar_count": self.bar_count,
+            "last_open_time": self.last_open_time,
+            "bars": self.bars,
+            "obs": self.obs,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        engine = cls(data.get("swing_length", 3), data.get("max_age", 200))
+        engine.interval_ms = data.get("interval_ms", 0)
+        engine.bar_count = data.get("bar_count", 0)
+        engine.last_open_time = data.get("last_open_time")
+        engine.bars = data.get("bars", [])
+        engine.obs = data.get("obs", [])
+        return engine
+
+
+def load_ob_engines(filepath):
+    """讀取 IncrementalOBEngine 狀態檔 → {key: engine}"""
+    try:
+        with open(filepath, "r") as f:
+            data = json.load(f)
+        return {key: IncrementalOBEngine.from_dict(d) for key, d in data.items()}
+    except:
+        return {}
+
+
+def save_ob_engines(filepath, engines):
+    try:
+        with open(filepath, "w") as f:
+            json.dump({key: e.to_dict() for key, e in engines.items()}, f)
+    except:
+        pass
+
+
+def get_ob_engine(engines, symbol, tf, swing_length):
+    """取得 (symbol, 時框, swing) 對應的引擎，沒有就建立"""
+    key = f"{symbol}:{tf}:{swing_length}"
+    if key not in engines:
+        engines[key] = IncrementalOBEngine(swing_length)
+    return engines[key]
@@ -0,0 +1,98 @@
+"""
+OB 生命週期狀態儲存 — 供 monitor.check_ob_status 使用
+
+- OB 用穩定 ID 識別: {bull|bear}_{tf}_{OB K 線開盤時間}
+  (沒有時間欄位才退回價位 key)
+- 一次執行只 load / save 一次，所有幣種的階段變化在記憶體批次處理
+- 已失效 (引擎不再追蹤)、太久沒出現 (TTL)、超過每幣上限 (LRU) 的 OB 自動淘汰
+"""
+import json
+import time
+
+from config import OB_STATE_FILE, OB_STATE_TTL_HOURS, OB_STATE_MAX_PER_SYMBOL
+
+
+def ob_id(ob):
+    """OB 穩定 ID"""
+    side = "bull" if ob["type"] == "bullish" else "bear"
+    tf = ob.get("tf", "")
+    if ob.get("time") is not None:
+        return f"{side}_{tf}_{ob['time']}"
+    return f"{side}_{tf}_{ob['bottom']:.8g}_{ob['top']:.8g}"
+
+
+class OBLifecycleStore:
+    """{base: {ob_id: {"stage", "seen", "updated"}}}"""
+
+    def __init__(self, filepath=OB_STATE_FILE, ttl_hours=OB_STATE_TTL_HOURS,
+                 max_per_symbol=OB_STATE_MAX_PER_SYMBOL):
+        self.filepath = filepath
+        self.ttl = ttl_hours * 3600
+        self.max_per_symbol = max_per_symbol
+        self.state = {}
+        self.dirty = False
+
+    def load(self):
+        try:
+            with open(self.filepath, "r") as f:
+                data = json.load(f)
+        except:
+            data = {}
+        self.state = data if isinstance(data, dict) else {}
+        # 舊格式沒有 seen → 視為剛看到，交給 TTL / 失效淘汰
+        now = time.time()
+        for entries in self.state.values():
+            for entry in entries.values():
+                entry.setdefault("seen", now)
+        return self
+
+    def save(self):
+        if not self.dirty:
+            return
+        try:
+            with open(self.filepath, "w") as f:
+                json.dump(self.state, f, indent=2)
+            self.dirty = False
+        except:
+            pass
+
+    def get_stage(self, base, key):
+        return self.state.get(base, {}).get(key, {}).get("stage", "watching")
+
+    def touch(self, base, key, now=None):
+        """標記本次有看到這個 OB (LRU / TTL 用)"""
+        now = now or time.time()
+        entry = self.state.setdefault(base, {}).setdefault(key, {"stage": "watching"})
+        entry["seen"] = now
+        self.dirty = True
+
+    def set_stage(self, base, key, stage, now=None):
+        now = now or time.time()
+        entry = self.state.setdefault(base, {}).setdefault(key, {})
+        entry.update({"stage": stage, "seen": now, "updated": now})
+        self.dirty = True
+
+    def compact(self, active_ids=None, now=None):
+        """
+        淘汰:
+        - active_ids[base] 有給時，不在其中的 OB (已失效 / 超齡) 直接移除
+        - 超過 TTL 沒出現的 OB
+        - 每幣超過上限時，留最近看到的
+        """
+        now = now or time.time()
+        active_ids = active_ids or {}
+        for base in list(self.state):
+            entries = self.state[base]
+            active = active_ids.get(base)
+            keep = {k: v for k, v in entries.items()
+                    if now - v.get("seen", 0) <= self.ttl
+                    and (active is None or k in active)}
+            if len(keep) > self.max_per_symbol:
+                recent = sorted(keep, key=lambda k: keep[k]["seen"], reverse=True)[:self.max_per_symbol]
+                keep = {k: keep[k] for k in recent}
+            if len(keep) != len(entries):
+                self.dirty = True
+            if keep:
+                self.state[base] = keep
+            else:
+                del self.state[base]
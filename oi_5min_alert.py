@@ -34,6 +34,7 @@ from exchange_api import (
     get_exchange_info
 )
 from notify import send_discord_message
+from indicators import rsi as calc_rsi_value
 
 
 def get_trading_symbols():
@@ -60,18 +61,7 @@ def calc_rsi(symbol, period=14):
         if not klines or len(klines) < period + 1:
             return None
         
-        closes = [k["close"] for k in klines]
-        deltas = [closes[i] - closes[i-1] for i in range(1, len(closes))]
-        gains = [d if d > 0 else 0 for d in deltas[-period:]]
-        losses = [-d if d < 0 else 0 for d in deltas[-period:]]
-        
-        avg_gain = sum(gains) / period
-        avg_loss = sum(losses) / period
-        
-        if avg_loss == 0:
-            return 100
-        rs = avg_gain / avg_loss
-        return 100 - (100 / (1 + rs))
+        return calc_rsi_value([k["close"] for k in klines], period, method="sma_last", zero_loss="max")
     except:
         return None
 
@@ -5,6 +5,7 @@ from datetime import datetime, timezone, timedelta
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from config import DISCORD_THREAD_TECH
 from notify import send_discord_message
+from indicators import rsi as calc_rsi_value, sma, ma_distance as calc_ma_distance
 
 STATE_FILE = os.path.expanduser("~/.openclaw/oi_state_local_v2.json")
 SIGNAL_LOG = os.path.expanduser("~/.openclaw/oi_signals_local_v2.json")
@@ -319,20 +320,10 @@ def get_market_phase(symbol):
         closes = [float(k[4]) for k in data]
         current_price = closes[-1]
         
-        ma7 = sum(closes[-7:]) / 7
-        ma25 = sum(closes[-25:]) / 25
-        
-        gains, losses = [], []
-        for i in range(1, min(15, len(closes))):
-            diff = closes[i] - closes[i-1]
-            gains.append(diff if diff > 0 else 0)
-            losses.append(-diff if diff < 0 else 0)
-        avg_gain = sum(gains) / len(gains) if gains else 0
-        avg_loss = sum(losses) / len(losses) if losses else 0.0001
-        rs = avg_gain / avg_loss if avg_loss > 0 else 100
-        rsi = 100 - (100 / (1 + rs))
-        
-        ma_distance = (current_price - ma25) / ma25 * 100 if ma25 > 0 else 0
+        ma7 = sma(closes, 7)
+        ma25 = sma(closes, 25)
+        rsi = calc_rsi_value(closes, 14, method="sma_first", zero_loss="cap")
+        ma_distance = calc_ma_distance(current_price, ma25)
         
         high_24h = max(closes[-24:])
         low_24h = min(closes[-24:])
@@ -841,22 +832,10 @@ def main():
         send_discord(message)
         
         try:
-            from paper_trader import process_signal, check_and_close
+            from paper_trader import process_signals, check_and_close
             
             check_and_close()
-            
-            for a in filtered_alerts:
-                if a["signal"] in ["LONG", "SHORT"]:
-                    process_signal(
-                        a["symbol"],
-                        a["signal"],
-                        a["price"],
-                        a.get("phase", ""),
-                        a.get("rsi", 50),
-                        a.get("strength_score", 0),
-                        a.get("strength_grade", ""),
-                        a.get("1h_vol_ratio", 1)
-                    )
+            process_signals(filtered_alerts)
         except Exception as e:
             print(f"Paper trading error: {e}")
     else:
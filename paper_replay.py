@@ -0,0 +1,253 @@
+"""
+Paper trader 歷史重播
+
+用 OI 信號紀錄 + 歷史 1m K 線，在模擬時間跑 paper_trader 原本的
+should_open_position / open_position / check_positions (含資金與 max_positions 競爭)，
+輸出和 paper_state.json 相同格式的 positions / closed / capital，另附權益曲線。
+
+- 時鐘 / 行情 / 持久化透過 paper_trader.install_hooks() 換成 SimMarket，規則程式碼不動
+- 未收盤 K 線只看得到開盤價 (不偷看未來)
+- 順序比照 oi_scanner: 每批信號前先 check_positions，批內依 signal_priority 開倉；
+  信號之間每 check_minutes 分鐘檢查一次
+- 歷史上沒有的資料: Grafana 快照為空、資金費率用當時最後一次結算值 (沒有為 0)
+
+用法: python paper_replay.py [--signals path] [--days 7] [--check-min 15] [--out path]
+"""
+import argparse
+import bisect
+import json
+import os
+import time
+from datetime import datetime, timedelta, timezone
+
+import paper_trader as pt
+from config import OI_SIGNAL_LOG, STATE_DIR, PAPER_CONFIG
+from exchange_api import get_klines_range, get_funding_rate_history, resample_klines, interval_to_ms
+from indicators import rsi as calc_rsi_value
+
+TW = timezone(timedelta(hours=8))
+REPLAY_CACHE_DIR = os.path.join(STATE_DIR, "replay_cache")
+MINUTE_MS = 60000
+
+
+class SimMarket:
+    """
+    模擬時間下的行情 (提供 paper_trader 的 hook 函式)
+    klines: {幣: 1m K 線 list (依時間排序)}；funding: {幣: [{"time", "rate"}]}
+    """
+
+    def __init__(self, klines, funding=None):
+        self.klines = {s.replace("USDT", ""): k for s, k in klines.items()}
+        self.times = {s: [k["open_time"] for k in ks] for s, ks in self.klines.items()}
+        self.funding = {}
+        for s, rows in (funding or {}).items():
+            rows = sorted(rows, key=lambda x: x["time"])
+            self.funding[s.replace("USDT", "")] = ([x["time"] for x in rows], [x["rate"] for x in rows])
+        self.now_ms = 0
+        self._btc_cache = {}
+
+    # ─── 內部 ───
+
+    def _closed_count(self, base):
+        """open_time + 1 分鐘 <= now 的 K 線數"""
+        return bisect.bisect_right(self.times.get(base, ()), self.now_ms - MINUTE_MS)
+
+    def _forming(self, base):
+        """目前這一分鐘的 K 線 (只看得到開盤價)"""
+        i = self._closed_count(base)
+        bars = self.klines.get(base, [])
+        if i < len(bars) and bars[i]["open_time"] <= self.now_ms:
+            k = bars[i]
+            return {"open_time": k["open_time"], "open": k["open"], "high": k["open"], "low": k["open"],
+                    "close": k["open"], "volume": 0.0, "close_time": k["open_time"] + MINUTE_MS - 1}
+        return None
+
+    # ─── hook ───
+
+    def now_tw(self):
+        return (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(milliseconds=self.now_ms)).astimezone(TW)
+
+    def get_klines(self, symbol, interval, limit=100):
+        base = symbol.replace("USDT", "")
+        i = self._closed_count(base)
+        forming = self._forming(base)
+        if interval == "1m":
+            bars = self.klines.get(base, [])[max(0, i - limit + 1):i]
+            return bars + [forming] if forming else bars
+        span = (limit + 1) * interval_to_ms(interval) // MINUTE_MS
+        bars = self.klines.get(base, [])[max(0, i - span):i] + ([forming] if forming else [])
+        return resample_klines(bars, interval)[-limit:]
+
+    def get_price(self, symbol):
+        base = symbol.replace("USDT", "")
+        forming = self._forming(base)
+        if forming:
+            return forming["open"]
+        i = self._closed_count(base)
+        return self.klines[base][i - 1]["close"] if i else None
+
+    def get_prices(self, symbols, max_age=None):
+        result = {}
+        for symbol in symbols:
+            price = self.get_price(symbol)
+            if price:
+                result[symbol] = {"price": price, "age": 0.0, "stale": False, "source": "replay"}
+        return result
+
+    def get_funding_rate(self, symbol):
+        times, rates = self.funding.get(symbol.replace("USDT", ""), ([], []))
+        i = bisect.bisect_right(times, self.now_ms)
+        return rates[i - 1] if i else 0.0
+
+    def get_grafana_data(self, symbol):
+        return {}
+
+    def get_btc_context(self):
+        hour = self.now_ms // 3600000
+        if hour not in self._btc_cache:
+            klines = self.get_klines("BTC", "1h", 15)
+            btc_rsi = None
+            if len(klines) >= 15:
+                btc_rsi = round(calc_rsi_value([k["close"] for k in klines], 14,
+                                               method="sma_last", zero_loss="max"), 1)
+            self._btc_cache[hour] = btc_rsi
+        return {"btc_price": self.get_price("BTC"), "btc_rsi": self._btc_cache[hour]}
+
+    def fetch_intrabar_klines(self, positions, now):
+        starts = {}
+        for pos in positions:
+            start = pt._path_start_ms(pos)
+            starts[pos["symbol"]] = min(start, starts.get(pos["symbol"], start))
+        return {symbol: self.get_klines(symbol, "1m", max(1, (self.now_ms - start) // MINUTE_MS + 1))
+                for symbol, start in starts.items()}
+
+    def hooks(self):
+        return {"now_tw": self.now_tw, "get_price": self.get_price, "get_prices": self.get_prices,
+                "get_klines": self.get_klines, "get_funding_rate": self.get_funding_rate,
+                "get_grafana_data": self.get_grafana_data, "get_btc_context": self.get_btc_context,
+                "fetch_intrabar_klines": self.fetch_intrabar_klines, "save_state": lambda state: None}
+
+
+def _ts_ms(ts):
+    return int(datetime.fromisoformat(ts).timestamp() * 1000)
+
+
+def replay(signals, market, check_minutes=15, end_ms=None, capital=None):
+    """
+    依時間重播信號 → {"positions", "closed", "capital", "equity_curve", "skipped"}
+    equity_curve: [[時間, 已實現資金]]，每次資金變動記一點
+    """
+    state = {"positions": [], "closed": [], "capital": capital or PAPER_CONFIG["capital"]}
+    batches = {}
+    for s in signals:
+        if s.get("signal") in ("LONG", "SHORT"):
+            batches.setdefault(_ts_ms(s["ts"]), []).append(s)
+    if not batches:
+        return dict(state, equity_curve=[], skipped={})
+
+    times = sorted(batches)
+    end_ms = end_ms or max(t[-1]["open_time"] + MINUTE_MS for t in market.klines.values() if t)
+    step = check_minutes * MINUTE_MS
+    checks = range(times[0] - times[0] % step + step, end_ms + 1, step)
+    events = sorted([(t, 0) for t in times] + [(t, 1) for t in checks if t not in batches])
+
+    equity = [[datetime.fromtimestamp(times[0] / 1000, TW).isoformat(), state["capital"]]]
+    skipped = {}
+    previous = pt.install_hooks(**market.hooks())
+    try:
+        for t, is_check in events:
+            if is_check and not state["positions"] and t > times[-1]:
+                break
+            market.now_ms = t
+            capital_before = state["capital"]
+            pt.check_positions(state)
+            for s in ([] if is_check else sorted(batches[t], key=pt.signal_priority)):
+                pos, reason = pt.open_position(state, s["symbol"], s["signal"], s["entry_price"],
+                                               s.get("phase", ""), s.get("rsi", 50),
+                                               s.get("strength_grade", ""), s.get("vol_ratio", 1))
+                if pos:
+                    pos["strength_score"] = s.get("strength_score", 0)
+                    pos["strength_grade"] = s.get("strength_grade", "")
+                    pos["vol_ratio"] = s.get("vol_ratio", 1)
+                else:
+                    key = reason.split(":")[0].split("(")[0]
+                    skipped[key] = skipped.get(key, 0) + 1
+            if state["capital"] != capital_before:
+                equity.append([market.now_tw().isoformat(), state["capital"]])
+    finally:
+        pt.install_hooks(**previous)
+    return dict(state, equity_curve=equity, skipped=skipped)
+
+
+# ─── 歷史資料 ───
+
+def _cached(name, fetch):
+    os.makedirs(REPLAY_CACHE_DIR, exist_ok=True)
+    path = os.path.join(REPLAY_CACHE_DIR, name)
+    try:
+        with open(path, "r") as f:
+            return json.load(f)
+    except:
+        pass
+    data = fetch()
+    if data:
+        with open(path, "w") as f:
+            json.dump(data, f)
+    return data
+
+
+def load_market(symbols, start_ms, end_ms):
+    """抓 (並快取) 每個幣的 1m K 線與資金費率歷史"""
+    start_ms -= start_ms % MINUTE_MS
+    klines, funding = {}, {}
+    for symbol in sorted(set(symbols) | {"BTC"}):
+        tag = f"{symbol}_{start_ms}_{end_ms}"
+        klines[symbol] = _cached(f"{tag}_1m.json",
+                                 lambda: get_klines_range(symbol, "1m", start_ms, end_ms))
+        funding[symbol] = _cached(f"{tag}_fr.json",
+                                  lambda: get_funding_rate_history(symbol, start_ms - 8 * 3600000, end_ms))
+    return SimMarket(klines, funding)
+
+
+def summarize(result):
+    closed = result["closed"]
+    wins = sum(1 for t in closed if t["pnl_usd"] > 0)
+    return (f"trades {len(closed)} | WR {wins / len(closed) * 100 if closed else 0:.1f}% | "
+            f"capital ${result['capital']:.0f} | open {len(result['positions'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--signals", default=OI_SIGNAL_LOG)
+    parser.add_argument("--days", type=float, default=7)
+    parser.add_argument("--check-min", type=int, default=15)
+    parser.add_argument("--out", default=os.path.join(STATE_DIR, "paper_replay.json"))
+    args = parser.parse_args()
+
+    with open(args.signals, "r") as f:
+        signals = json.load(f)
+    now_ms = int(time.time() * 1000)
+    start_ms = now_ms - int(args.days * 86400000)
+    signals = [s for s in signals if s.get("signal") in ("LONG", "SHORT") and _ts_ms(s["ts"]) >= start_ms]
+    if not signals:
+        print("沒有可重播的信號")
+        return
+    start_ms = min(_ts_ms(s["ts"]) for s in signals)
+    print(f"載入 {len({s['symbol'] for s in signals})} 個幣的歷史 K 線...")
+    market = load_market({s["symbol"] for s in signals}, start_ms, now_ms)
+
+    t0 = time.perf_counter()
+    result = replay(signals, market, args.check_min)
+    elapsed = time.perf_counter() - t0
+    print(f"重播 {len(signals)} 個信號: {elapsed:.2f}s ({len(signals) / elapsed:.0f} signals/s)")
+    print(summarize(result))
+    if result["skipped"]:
+        print("未開倉: " + ", ".join(f"{k} {v}" for k, v in sorted(result["skipped"].items(), key=lambda x: -x[1])))
+
+    with open(args.out, "w") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+    print(f"結果 → {args.out}")
+
+
+if __name__ == "__main__":
+    main()
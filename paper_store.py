@@ -0,0 +1,366 @@
+"""
+Paper trading 狀態儲存 — 事件紀錄 + 定期快照
+
+- PAPER_EVENT_LOG (JSONL)：每行一個不可變事件 {"seq", "ts", "type", ...}
+    open          — 開倉 (position)
+    update        — 持倉欄位變動 (changes / removed)
+    checkpoint    — 30m / 3h 檢查旗標
+    trail_update  — 只動到 trailing_sl
+    partial_close — 分批平倉 (record + 持倉變動)
+    close         — 持倉移除 (record)
+    capital       — 只有資金變動
+    truncate      — 平倉紀錄只留前 closed_count 筆 (reset 指令、改到舊紀錄時之後的紀錄重新 append)
+    reset         — 整份狀態 (只有 bootstrap 舊 paper_state.json 時寫一次)
+  有 capital 欄位的事件代表套用後的資金
+- PAPER_SNAPSHOT_FILE：持倉 + 資金 + 平倉筆數 + 最近 PAPER_RECENT_CLOSED 筆平倉紀錄 + 已套用到的 seq / log 位移，
+  每 PAPER_SNAPSHOT_EVERY 個事件重建
+- 寫入端 (load_open / save)：快照 + 快照之後的事件，state["closed"] 只有最近幾筆，
+  state["closed_offset"] = 前面省略的筆數；save() 只和上次寫入的狀態比對後 append 事件
+- 讀取端 (load_paper_state / PaperProjection.catch_up)：常駐 projection 從上次的位移接著讀，只處理新事件
+"""
+import copy
+import json
+import os
+from datetime import datetime
+
+from config import (
+    PAPER_STATE_FILE, PAPER_EVENT_LOG_FILE, PAPER_SNAPSHOT_FILE,
+    PAPER_SNAPSHOT_EVERY, PAPER_RECENT_CLOSED, PAPER_CONFIG, TW_TIMEZONE
+)
+
+
+def position_key(pos):
+    """持倉 ID (同幣同時只會有一筆持倉，加進場時間區分前後兩筆)"""
+    return f"{pos['symbol']}@{pos.get('entry_time', '')}"
+
+
+def record_key(record):
+    """平倉紀錄對應的持倉 ID"""
+    return f"{record['symbol']}@{record.get('opened_at', '')}"
+
+
+class PaperProjection:
+    """
+    事件 → positions / closed / capital
+    keep_closed：只留最近 keep_closed 筆平倉紀錄 (closed_base = 前面丟掉的筆數)，None = 全部
+    """
+
+    def __init__(self, keep_closed=None):
+        self.keep_closed = keep_closed
+        self.positions = {}     # key → position (保持開倉順序)
+        self.closed = []
+        self.closed_base = 0
+        self.capital = PAPER_CONFIG["capital"]
+        self.seq = 0
+        self.offset = 0         # 已讀到的 log 位移 (bytes)
+
+    @property
+    def closed_count(self):
+        return self.closed_base + len(self.closed)
+
+    def apply(self, event):
+        kind = event["type"]
+        if kind == "reset":
+            self.positions = {position_key(p): p for p in event["positions"]}
+            self.closed = list(event["closed"])
+            self.closed_base = 0
+        elif kind == "truncate":
+            keep = event["closed_count"]
+            if keep >= self.closed_base:
+                del self.closed[keep - self.closed_base:]
+            else:
+                self.closed = []
+                self.closed_base = keep
+        elif kind == "open":
+            self.positions[position_key(event["position"])] = event["position"]
+        elif kind in ("update", "checkpoint", "trail_update", "partial_close"):
+            pos = self.positions.get(event["key"])
+            if pos is not None:
+                pos.update(event.get("changes", {}))
+                for field in event.get("removed", []):
+                    pos.pop(field, None)
+        elif kind == "close":
+            self.positions.pop(event["key"], None)
+        if event.get("record") is not None:
+            self.closed.append(event["record"])
+        if self.keep_closed is not None and len(self.closed) > 2 * self.keep_closed:
+            drop = len(self.closed) - self.keep_closed
+            del self.closed[:drop]
+            self.closed_base += drop
+        if "capital" in event:
+            self.capital = event["capital"]
+        self.seq = event["seq"]
+
+    def catch_up(self, log_path=PAPER_EVENT_LOG_FILE):
+        """讀 offset 之後的完整行並套用，回傳新事件 (log 被截短時從頭重建)"""
+        try:
+            if os.path.getsize(log_path) < self.offset:
+                self.__init__(self.keep_closed)
+            with open(log_path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read()
+        except:
+            return []
+        end = data.rfind(b"\n") + 1     # 寫到一半的最後一行下次再讀
+        events = []
+        for line in data[:end].splitlines():
+            if line.strip():
+                event = json.loads(line)
+                self.apply(event)
+                events.append(event)
+        self.offset += end
+        return events
+
+    def state(self):
+        return {"positions": list(self.positions.values()),
+                "closed": self.closed,
+                "capital": self.capital}
+
+
+def _diff(old, new):
+    changes = {k: v for k, v in new.items() if k not in old or old[k] != v}
+    removed = [k for k in old if k not in new]
+    return changes, removed
+
+
+def _change_type(changes, removed):
+    if not removed and set(changes) == {"trailing_sl"}:
+        return "trail_update"
+    if any(k.startswith("checkpoint") for k in changes):
+        return "checkpoint"
+    return "update"
+
+
+class PaperEventStore:
+    def __init__(self, log_path=PAPER_EVENT_LOG_FILE, snapshot_path=PAPER_SNAPSHOT_FILE,
+                 legacy_path=PAPER_STATE_FILE, snapshot_every=PAPER_SNAPSHOT_EVERY):
+        self.log_path = log_path
+        self.snapshot_path = snapshot_path
+        self.legacy_path = legacy_path
+        self.snapshot_every = snapshot_every
+        self.projection = PaperProjection()
+        self.snapshot_seq = 0
+        self.loaded = False
+
+    # ─── 讀 ───
+
+    def load(self, bootstrap=True):
+        """
+        完整 state dict (positions / 全部 closed / capital，呼叫端可任意修改)：第一次從頭重播事件紀錄
+        沒有事件紀錄時用舊的 paper_state.json 建立 reset 事件 (bootstrap=False 只讀不寫)
+        """
+        if not self.loaded or self.projection.keep_closed is not None:
+            self._start(PaperProjection(), bootstrap)
+        else:
+            self.projection.catch_up(self.log_path)  # 其他程序寫入的事件
+        return self._state()
+
+    def load_open(self, bootstrap=True):
+        """
+        寫入端用：持倉 + 資金 + 最近的平倉紀錄 (closed_offset = 前面省略的筆數)
+        讀快照再補快照之後的事件，不必重播整份紀錄 (舊快照沒有平倉紀錄 → 從頭重播)
+        """
+        if not self.loaded:
+            snap = self._read_snapshot()
+            projection = PaperProjection(keep_closed=PAPER_RECENT_CLOSED)
+            if "closed_tail" in snap:
+                projection.positions = {position_key(p): p for p in snap["positions"]}
+                projection.closed = list(snap["closed_tail"])
+                projection.closed_base = snap["closed_count"] - len(projection.closed)
+                projection.capital = snap["capital"]
+                projection.seq = snap["seq"]
+                projection.offset = snap["offset"]
+            self._start(projection, bootstrap)
+        else:
+            self.projection.catch_up(self.log_path)
+        return self._state()
+
+    def _start(self, projection, bootstrap):
+        self.projection = projection
+        self.projection.catch_up(self.log_path)
+        self.snapshot_seq = self._read_snapshot().get("seq", 0)
+        self.loaded = True
+        if self.projection.seq == 0:
+            legacy = self._read_legacy()
+            if legacy and bootstrap:
+                self._append([legacy])
+            elif legacy:
+                self.projection.apply(dict(legacy, seq=0))
+
+    def _state(self):
+        p = self.projection
+        return {"positions": copy.deepcopy(list(p.positions.values())),
+                "closed": copy.deepcopy(p.closed),
+                "capital": p.capital,
+                "closed_offset": p.closed_base}
+
+    def _read_snapshot(self):
+        try:
+            with open(self.snapshot_path, "r") as f:
+                return json.load(f)
+        except:
+            return {}
+
+    def _read_legacy(self):
+        """舊的 paper_state.json → reset 事件"""
+        try:
+            with open(self.legacy_path, "r") as f:
+                legacy = json.load(f)
+        except:
+            return None
+        return {"type": "reset", "source": os.path.basename(self.legacy_path),
+                "positions": legacy.get("positions", []),
+                "closed": legacy.get("closed", []),
+                "capital": legacy.get("capital", PAPER_CONFIG["capital"])}
+
+    # ─── 寫 ───
+
+    def _common_closed(self, closed, offset):
+        """state 的平倉紀錄和上次寫入的前幾筆相同 (只比雙方都有的部分；寫入端只有最近幾筆)"""
+        prev = self.projection
+        end = min(prev.closed_count, offset + len(closed))
+        for i in range(max(offset, prev.closed_base), end):
+            if closed[i - offset] != prev.closed[i - prev.closed_base]:
+                return i
+        return end
+
+    def save(self, state):
+        """和上次寫入的狀態比對，append 對應事件"""
+        if not self.loaded:
+            self.load_open()
+        self.projection.catch_up(self.log_path)
+        prev = self.projection
+        events = []
+        closed = state.get("closed", [])
+        offset = state.get("closed_offset", 0)
+        n_prev = self._common_closed(closed, offset)
+        if n_prev < prev.closed_count:
+            # 平倉紀錄不是單純往後加 (reset 指令等) → 截掉不同的部分再重新 append
+            events.append({"type": "truncate", "closed_count": n_prev})
+
+        current = {position_key(p): p for p in state.get("positions", [])}
+        changes = {}
+        for key, pos in current.items():
+            if key in prev.positions:
+                diff = _diff(prev.positions[key], pos)
+                if diff[0] or diff[1]:
+                    changes[key] = diff
+        removed = [key for key in prev.positions if key not in current]
+
+        # 平倉紀錄：持倉已移除的最後一筆 = close，其餘 = partial_close (帶持倉最終變動)
+        new_records = closed[max(n_prev - offset, 0):]
+        last_idx = {record_key(r): i for i, r in enumerate(new_records)}
+        for i, record in enumerate(new_records):
+            key = record_key(record)
+            if key in removed and last_idx[key] == i:
+                events.append({"type": "close", "key": key, "record": record})
+                removed.remove(key)
+            else:
+                event = {"type": "partial_close", "key": key, "record": record}
+                if last_idx[key] == i and key in changes:
+                    event["changes"], event["removed"] = changes.pop(key)
+                events.append(event)
+        for key in removed:
+            events.append({"type": "close", "key": key, "record": None})
+        for key, (diff, gone) in changes.items():
+            events.append({"type": _change_type(diff, gone), "key": key, "changes": diff, "removed": gone})
+        for key, pos in current.items():
+            if key not in prev.positions:
+                events.append({"type": "open", "position": pos})
+
+        capital = state.get("capital", prev.capital)
+        if capital != prev.capital:
+            if not events:
+                events.append({"type": "capital"})
+            events[-1]["capital"] = capital
+        self._append(events)
+
+    def _append(self, events):
+        if not events:
+            return
+        ts = datetime.now(TW_TIMEZONE).isoformat()
+        seq = self.projection.seq
+        lines = []
+        for event in events:
+            seq += 1
+            event = dict(event, seq=seq, ts=ts)
+            if not event.get("removed"):
+                event.pop("removed", None)
+            lines.append(json.dumps(event, ensure_ascii=False))
+        os.makedirs(os.path.dirname(self.log_path) or ".", exist_ok=True)
+        with open(self.log_path, "a") as f:
+            f.write("\n".join(lines) + "\n")
+        # 自己寫的事件直接讀回套用 (深拷貝，呼叫端之後改 state 不影響)
+        self.projection.catch_up(self.log_path)
+        if self.projection.seq - self.snapshot_seq >= self.snapshot_every:
+            self.write_snapshot()
+
+    def write_snapshot(self):
+        p = self.projection
+        snap = {"seq": p.seq, "offset": p.offset, "capital": p.capital,
+                "closed_count": p.closed_count, "closed_tail": p.closed[-PAPER_RECENT_CLOSED:],
+                "positions": list(p.positions.values())}
+        tmp = self.snapshot_path + ".tmp"
+        try:
+            with open(tmp, "w") as f:
+                json.dump(snap, f, ensure_ascii=False)
+            os.replace(tmp, self.snapshot_path)
+            self.snapshot_seq = p.seq
+        except:
+            pass
+
+
+_default = None
+_reader = None
+
+
+def get_store():
+    global _default
+    if _default is None:
+        _default = PaperEventStore()
+    return _default
+
+
+class PaperReader:
+    """
+    讀取端常駐 projection：每次只讀新 append 的事件
+    已讀部分的最後 TAIL_BYTES bytes 對不上 (log 被整個換掉) → 從頭重讀
+    """
+    TAIL_BYTES = 64
+
+    def __init__(self, log_path=PAPER_EVENT_LOG_FILE, legacy_path=PAPER_STATE_FILE):
+        self.log_path = log_path
+        self.legacy_path = legacy_path
+        self.projection = PaperProjection()
+        self.tail = b""
+
+    def _read_tail(self):
+        start = max(0, self.projection.offset - self.TAIL_BYTES)
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(start)
+                return f.read(self.projection.offset - start)
+        except:
+            return b""
+
+    def load(self):
+        if self._read_tail() != self.tail:
+            self.projection = PaperProjection()
+        self.projection.catch_up(self.log_path)
+        self.tail = self._read_tail()
+        p = self.projection
+        if p.seq == 0:
+            legacy = PaperEventStore(self.log_path, legacy_path=self.legacy_path)._read_legacy()
+            if legacy:
+                return {"positions": legacy["positions"], "closed": legacy["closed"], "capital": legacy["capital"]}
+        return {"positions": copy.deepcopy(list(p.positions.values())),
+                "closed": list(p.closed),
+                "capital": p.capital}
+
+
+def load_paper_state():
+    """讀取端：完整 paper state (與舊 paper_state.json 相同格式，不寫入)，同一程序內共用一個 PaperReader"""
+    global _reader
+    if _reader is None:
+        _reader = PaperReader()
+    return _reader.load()
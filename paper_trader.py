@@ -1,30 +1,58 @@
 import json
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone, timedelta
+import numpy as np
 
 # 使用共用模組
 from config import (
-    PAPER_STATE_FILE, PAPER_CONFIG, DYNAMIC_TP_CONFIG, VOL_RATIO_MULTIPLIERS,
+    PAPER_CONFIG, DYNAMIC_TP_CONFIG, VOL_RATIO_MULTIPLIERS,
     FUNDING_RATE_THRESHOLD_LONG, FUNDING_RATE_THRESHOLD_SHORT,
     RSI_EXTREME_HIGH, RSI_HIGH, RSI_EXTREME_LOW, RSI_LOW,
-    DISCORD_THREAD_PAPER, DISCORD_PING_USER_ID, DISCORD_MAIN_CHANNEL_ID
+    DISCORD_THREAD_PAPER, DISCORD_PING_USER_ID, DISCORD_MAIN_CHANNEL_ID,
+    PAPER_INTRABAR_INTERVAL, PAPER_INTRABAR_MAX_BARS
 )
-from exchange_api import get_price, get_funding_rate, get_klines
+from exchange_api import get_price, get_prices, get_funding_rate, get_funding_rates, get_klines
 from notify import send_discord_message, send_trade_update
-STATE_FILE = PAPER_STATE_FILE
+from indicators import rsi as calc_rsi_value
+from indicator_cache import closed_closes
+from paper_store import get_store
+from grafana_client import get_grafana_data
 CONFIG = PAPER_CONFIG
 
-def load_state():
+# ─── Hook：時鐘 / 行情 / 持久化 ───
+# 預設是即時行情 + 事件紀錄；paper_replay 用 install_hooks() 換成模擬時鐘與歷史行情
+
+def now_tw():
+    """目前時間 (UTC+8)"""
+    return datetime.now(timezone(timedelta(hours=8)))
+
+
+_HOOKS = ("now_tw", "get_price", "get_prices", "get_klines", "get_funding_rate",
+          "get_grafana_data", "get_btc_context", "fetch_intrabar_klines", "save_state")
+
+
+def install_hooks(**hooks):
+    """替換上面列出的模組函式，回傳被換掉的原函式 (再傳回 install_hooks 即還原)"""
+    previous = {}
+    for name, fn in hooks.items():
+        if name not in _HOOKS:
+            raise ValueError(f"unknown hook: {name}")
+        previous[name] = globals()[name]
+        globals()[name] = fn
+    return previous
+
+def load_state(full=False):
+    """預設只讀快照 + 之後的事件 (持倉、資金、最近的平倉紀錄)；full=True 才重播全部平倉紀錄"""
     try:
-        with open(STATE_FILE, "r") as f:
-            return json.load(f)
+        store = get_store()
+        return store.load() if full else store.load_open()
     except:
         return {"positions": [], "closed": [], "capital": CONFIG["capital"]}
 
 def save_state(state):
-    os.makedirs(os.path.dirname(STATE_FILE), exist_ok=True)
-    with open(STATE_FILE, "w") as f:
-        json.dump(state, f, indent=2)
+    """和上次寫入的狀態比對，append 事件到 paper_events.jsonl (見 paper_store)"""
+    get_store().save(state)
 
 def get_dynamic_tp(strength_grade="", vol_ratio=1.0):
     """動態 TP/SL（基於信號強度和成交量倍數）"""
@@ -61,54 +89,24 @@ def get_6h_price_move(symbol):
         pass
     return None
 
-def get_grafana_data(symbol):
-    """從 Grafana OI Dashboard 抓取即時數據"""
-    try:
-        from config import GRAFANA_OI_URL
-        import requests
-        r = requests.get(GRAFANA_OI_URL, timeout=10)
-        if r.status_code == 200:
-            for coin in r.json().get("data", []):
-                if coin.get("symbol") == symbol:
-                    return {
-                        "fr": coin.get("FR"),
-                        "lsur": coin.get("LSUR"),
-                        "ps_bias": coin.get("PS_Bias"),
-                        "idi_1h": coin.get("iDI_1h"),
-                        "adi_1h": coin.get("aDI_1h"),
-                        "oi_usd": coin.get("OI$M"),
-                        "oi_1h": coin.get("OI_1h"),
-                        "oi_4h": coin.get("OI_4h"),
-                        "ls_1h": coin.get("LS_1h"),
-                        "ls_4h": coin.get("LS_4h"),
-                    }
-    except:
-        pass
-    return {}
-
 def get_btc_context():
-    """抓 BTC 當前價格和 RSI 作為大盤環境指標"""
+    """抓 BTC 當前價格和 RSI (最近 15 根已收盤 1h，和 dump_warning 共用收盤價快取) 作為大盤環境指標"""
     try:
         btc_price = get_price("BTC")
-        klines = get_klines("BTC", "1h", 15)
-        if klines and len(klines) >= 14:
-            closes = [k["close"] for k in klines]
-            gains, losses = [], []
-            for i in range(1, len(closes)):
-                d = closes[i] - closes[i-1]
-                gains.append(max(d, 0))
-                losses.append(max(-d, 0))
-            avg_g = sum(gains[-14:]) / 14
-            avg_l = sum(losses[-14:]) / 14
-            btc_rsi = 100 - (100 / (1 + avg_g / avg_l)) if avg_l > 0 else 100
+        closes = closed_closes("BTC", "1h", lambda limit: get_klines("BTC", "1h", limit))
+        if closes and len(closes) >= 15:
+            btc_rsi = calc_rsi_value(closes[-15:], 14, method="sma_last", zero_loss="max")
             return {"btc_price": btc_price, "btc_rsi": round(btc_rsi, 1)}
     except:
         pass
     return {"btc_price": get_price("BTC"), "btc_rsi": None}
 
-def should_open_position(signal, phase, rsi, strength_grade="", vol_ratio=0, symbol=""):
-    # 資金費率過濾（順勢策略 — 回測證實趨勢>反轉）
-    fr = get_funding_rate(symbol) if symbol else 0
+def should_open_position(signal, phase, rsi, strength_grade="", vol_ratio=0, symbol="", funding_rate=None):
+    # 資金費率過濾（順勢策略 — 回測證實趨勢>反轉）；funding_rate 沒給才即時查
+    if funding_rate is not None:
+        fr = funding_rate
+    else:
+        fr = get_funding_rate(symbol) if symbol else 0
     fr_pct = fr * 100  # 轉成百分比
     
     if signal == "LONG":
@@ -133,10 +131,9 @@ def should_open_position(signal, phase, rsi, strength_grade="", vol_ratio=0, sym
     
     return True, "符合條件"
 
-def build_closed_record(pos, exit_price, pnl_pct, pnl_usd, reason):
-    """統一建立平倉紀錄，包含開倉/平倉完整數據"""
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz)
+def build_closed_record(pos, exit_price, pnl_pct, pnl_usd, reason, now=None):
+    """統一建立平倉紀錄，包含開倉/平倉完整數據 (now: 平倉時間，預設現在)"""
+    now = now or now_tw()
     
     # 平倉時的市場快照
     exit_grafana = get_grafana_data(pos["symbol"])
@@ -174,7 +171,12 @@ def build_closed_record(pos, exit_price, pnl_pct, pnl_usd, reason):
     }
     return record
 
-def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade="", vol_ratio=0):
+def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade="", vol_ratio=0,
+                  funding_rate=None, btc_ctx=None):
+    """
+    判斷並開倉 (只改 state，不存檔 — 呼叫端處理完一批後自己 save_state)
+    funding_rate / btc_ctx：批次預抓的資金費率與 BTC 環境，沒給才即時查
+    """
     if len(state["positions"]) >= CONFIG["max_positions"]:
         return None, "已達最大持倉數"
     
@@ -183,8 +185,7 @@ def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade
             return None, "已有持倉"
     
     # SL 冷卻：同幣被 SL 出場後 3 小時內不再開倉（SL再進場 23.3% WR）
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz)
+    now = now_tw()
     for t in state.get("closed", [])[-50:]:  # 只查最近 50 筆
         if t.get("symbol") == symbol and "SL" in t.get("reason", ""):
             closed_at = t.get("closed_at", "")
@@ -208,7 +209,7 @@ def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade
     if daily_losses >= 2:
         return None, f"同幣當日已虧{daily_losses}次，黑名單"
     
-    should_open, reason = should_open_position(signal, phase, rsi, strength_grade, vol_ratio, symbol)
+    should_open, reason = should_open_position(signal, phase, rsi, strength_grade, vol_ratio, symbol, funding_rate)
     if not should_open:
         return None, f"不開倉: {reason}"
     
@@ -231,12 +232,12 @@ def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade
         tp1 = entry_price * (1 - tp1_pct / 100)
         tp2 = entry_price * (1 - tp2_pct / 100)
     
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz)
+    now = now_tw()
     
     # 記錄開倉時的完整市場數據（供回測用）
     grafana = get_grafana_data(symbol)
-    btc_ctx = get_btc_context()
+    if btc_ctx is None:
+        btc_ctx = get_btc_context()
     
     position = {
         "symbol": symbol,
@@ -266,245 +267,464 @@ def open_position(state, symbol, signal, entry_price, phase, rsi, strength_grade
     }
     
     state["positions"].append(position)
-    save_state(state)
     
     return position, reason
 
-def check_positions(state):
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz)
-    
-    closed = []
-    remaining = []
-    
-    for pos in state["positions"]:
-        symbol = pos["symbol"]
-        current_price = get_price(symbol)
+def evaluate_position(state, pos, current_price, now, closed):
+    """
+    用一個價格點判斷單一持倉的 TP / SL / 鎖利 / 追蹤 / 時間出場
+    now: 這個價格的時間；平倉紀錄 append 到 closed
+    Returns: True = 仍持倉
+    """
+    entry_time = datetime.fromisoformat(pos["entry_time"])
+    hours_held = (now - entry_time).total_seconds() / 3600
+    
+    exit_reason = None
+    exit_price = current_price
+    
+    tp2_hit = pos.get("tp2_hit", False)
+    trailing_sl = pos.get("trailing_sl", 0)
+    remaining_pct = pos.get("remaining_pct", 100)
+    
+    if pos["direction"] == "LONG":
+        pnl_pct = (current_price - pos["entry_price"]) / pos["entry_price"] * 100
         
-        if not current_price:
-            remaining.append(pos)
-            continue
+        # 30min checkpoint：進場 30 分鐘後虧 >3% → 砍半倉
+        if not pos.get("checkpoint_30m") and 0.5 <= hours_held <= 1.0 and pnl_pct < -3:
+            pos["checkpoint_30m"] = True
+            cp_usd = pos["size"] * 0.5 * pnl_pct / 100
+            state["capital"] += cp_usd
+            pos["size"] = pos["size"] * 0.5
+            pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, cp_usd, "30min檢查(半倉)", now))
+            state["closed"].append(closed[-1])
+            return True
         
-        entry_time = datetime.fromisoformat(pos["entry_time"])
-        hours_held = (now - entry_time).total_seconds() / 3600
+        # A. 3h 中途檢查：虧>3%全砍，盈>2%全平
+        if not pos.get("checkpoint_3h") and 3.0 <= hours_held <= 4.0 and not tp2_hit:
+            pos["checkpoint_3h"] = True
+            if pnl_pct < -3:
+                exit_reason = "3h檢查(止損)"
+            elif pnl_pct >= 2:
+                exit_reason = "3h檢查(鎖利)"
         
-        exit_reason = None
-        exit_price = current_price
+        # B. 中間鎖利層：浮盈到5%時鎖40%利潤（防止TRAIL_FULL回吐）
+        if not pos.get("lock_5pct") and not tp2_hit and pnl_pct >= 5:
+            pos["lock_5pct"] = True
+            lock_usd = pos["size"] * 0.4 * pnl_pct / 100
+            state["capital"] += lock_usd
+            pos["size"] = pos["size"] * 0.6
+            pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.6)
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(40%@5%)", now))
+            state["closed"].append(closed[-1])
+            return True
         
-        tp2_hit = pos.get("tp2_hit", False)
-        trailing_sl = pos.get("trailing_sl", 0)
-        remaining_pct = pos.get("remaining_pct", 100)
+        # B. BREAKEVEN 鎖利層：浮盈到3%時鎖20%（防止全部回吐）
+        if not pos.get("lock_3pct") and not tp2_hit and not pos.get("lock_5pct") and pnl_pct >= 3:
+            pos["lock_3pct"] = True
+            lock_usd = pos["size"] * 0.2 * pnl_pct / 100
+            state["capital"] += lock_usd
+            pos["size"] = pos["size"] * 0.8
+            pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.8)
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(20%@3%)", now))
+            state["closed"].append(closed[-1])
+            return True
         
-        if pos["direction"] == "LONG":
-            pnl_pct = (current_price - pos["entry_price"]) / pos["entry_price"] * 100
-            
-            # 30min checkpoint：進場 30 分鐘後虧 >3% → 砍半倉
-            if not pos.get("checkpoint_30m") and 0.5 <= hours_held <= 1.0 and pnl_pct < -3:
-                pos["checkpoint_30m"] = True
-                cp_usd = pos["size"] * 0.5 * pnl_pct / 100
-                state["capital"] += cp_usd
+        if tp2_hit:
+            if trailing_sl > 0 and current_price <= trailing_sl:
+                exit_reason = "TRAIL"
+            else:
+                new_trail = current_price * 0.95
+                if new_trail > trailing_sl:
+                    pos["trailing_sl"] = new_trail
+        elif current_price <= pos["sl"]:
+            if not pos.get("sl_half_hit"):
+                # 分批止損：第一次碰 SL，先砍 50%
+                sl_pnl = pnl_pct
+                sl_usd = pos["size"] * 0.5 * sl_pnl / 100
+                state["capital"] += sl_usd
                 pos["size"] = pos["size"] * 0.5
+                pos["sl_half_hit"] = True
                 pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, cp_usd, "30min檢查(半倉)"))
+                # 第二批的 SL 設在 -10%
+                pos["sl"] = pos["entry_price"] * 0.9
+                closed.append(build_closed_record(pos, exit_price, sl_pnl, sl_usd, "SL(半倉)", now))
                 state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            # A. 3h 中途檢查：虧>3%全砍，盈>2%全平
-            if not pos.get("checkpoint_3h") and 3.0 <= hours_held <= 4.0 and not tp2_hit:
-                pos["checkpoint_3h"] = True
-                if pnl_pct < -3:
-                    exit_reason = "3h檢查(止損)"
-                elif pnl_pct >= 2:
-                    exit_reason = "3h檢查(鎖利)"
-            
-            # B. 中間鎖利層：浮盈到5%時鎖40%利潤（防止TRAIL_FULL回吐）
-            if not pos.get("lock_5pct") and not tp2_hit and pnl_pct >= 5:
-                pos["lock_5pct"] = True
-                lock_usd = pos["size"] * 0.4 * pnl_pct / 100
-                state["capital"] += lock_usd
-                pos["size"] = pos["size"] * 0.6
-                pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.6)
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(40%@5%)"))
-                state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            # B. BREAKEVEN 鎖利層：浮盈到3%時鎖20%（防止全部回吐）
-            if not pos.get("lock_3pct") and not tp2_hit and not pos.get("lock_5pct") and pnl_pct >= 3:
-                pos["lock_3pct"] = True
-                lock_usd = pos["size"] * 0.2 * pnl_pct / 100
-                state["capital"] += lock_usd
-                pos["size"] = pos["size"] * 0.8
-                pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.8)
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(20%@3%)"))
-                state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            if tp2_hit:
-                if trailing_sl > 0 and current_price <= trailing_sl:
-                    exit_reason = "TRAIL"
-                else:
-                    new_trail = current_price * 0.95
-                    if new_trail > trailing_sl:
-                        pos["trailing_sl"] = new_trail
-            elif current_price <= pos["sl"]:
-                if not pos.get("sl_half_hit"):
-                    # 分批止損：第一次碰 SL，先砍 50%
-                    sl_pnl = pnl_pct
-                    sl_usd = pos["size"] * 0.5 * sl_pnl / 100
-                    state["capital"] += sl_usd
-                    pos["size"] = pos["size"] * 0.5
-                    pos["sl_half_hit"] = True
-                    pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
-                    # 第二批的 SL 設在 -10%
-                    pos["sl"] = pos["entry_price"] * 0.9
-                    closed.append(build_closed_record(pos, exit_price, sl_pnl, sl_usd, "SL(半倉)"))
-                    state["closed"].append(closed[-1])
-                else:
-                    exit_reason = "SL(清倉)"
-            elif current_price >= pos["tp2"] and not tp2_hit:
-                pos["tp2_hit"] = True
-                pos["trailing_sl"] = current_price * 0.95
-                tp2_pnl = pnl_pct
-                tp2_usd = pos["size"] * 0.5 * tp2_pnl / 100
-                state["capital"] += tp2_usd
-                pos["size"] = pos["size"] * 0.5
-                pos["remaining_pct"] = 50
-                closed.append(build_closed_record(pos, exit_price, tp2_pnl, tp2_usd, "TP2(50%平)"))
-                state["closed"].append(closed[-1])
-            elif current_price >= pos["tp1"] and not pos.get("tp1_hit"):
-                pos["tp1_hit"] = True
-                pos["sl"] = pos["entry_price"]
-        else:
-            pnl_pct = (pos["entry_price"] - current_price) / pos["entry_price"] * 100
-            
-            # 30min checkpoint：進場 30 分鐘後虧 >3% → 砍半倉
-            if not pos.get("checkpoint_30m") and 0.5 <= hours_held <= 1.0 and pnl_pct < -3:
-                pos["checkpoint_30m"] = True
-                cp_usd = pos["size"] * 0.5 * pnl_pct / 100
-                state["capital"] += cp_usd
+            else:
+                exit_reason = "SL(清倉)"
+        elif current_price >= pos["tp2"] and not tp2_hit:
+            pos["tp2_hit"] = True
+            pos["trailing_sl"] = current_price * 0.95
+            tp2_pnl = pnl_pct
+            tp2_usd = pos["size"] * 0.5 * tp2_pnl / 100
+            state["capital"] += tp2_usd
+            pos["size"] = pos["size"] * 0.5
+            pos["remaining_pct"] = 50
+            closed.append(build_closed_record(pos, exit_price, tp2_pnl, tp2_usd, "TP2(50%平)", now))
+            state["closed"].append(closed[-1])
+        elif current_price >= pos["tp1"] and not pos.get("tp1_hit"):
+            pos["tp1_hit"] = True
+            pos["sl"] = pos["entry_price"]
+    else:
+        pnl_pct = (pos["entry_price"] - current_price) / pos["entry_price"] * 100
+        
+        # 30min checkpoint：進場 30 分鐘後虧 >3% → 砍半倉
+        if not pos.get("checkpoint_30m") and 0.5 <= hours_held <= 1.0 and pnl_pct < -3:
+            pos["checkpoint_30m"] = True
+            cp_usd = pos["size"] * 0.5 * pnl_pct / 100
+            state["capital"] += cp_usd
+            pos["size"] = pos["size"] * 0.5
+            pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, cp_usd, "30min檢查(半倉)", now))
+            state["closed"].append(closed[-1])
+            return True
+        
+        # A. 3h 中途檢查（SHORT）
+        if not pos.get("checkpoint_3h") and 3.0 <= hours_held <= 4.0 and not tp2_hit:
+            pos["checkpoint_3h"] = True
+            if pnl_pct < -3:
+                exit_reason = "3h檢查(止損)"
+            elif pnl_pct >= 2:
+                exit_reason = "3h檢查(鎖利)"
+        
+        # B. 中間鎖利層（SHORT）
+        if not pos.get("lock_5pct") and not tp2_hit and pnl_pct >= 5:
+            pos["lock_5pct"] = True
+            lock_usd = pos["size"] * 0.4 * pnl_pct / 100
+            state["capital"] += lock_usd
+            pos["size"] = pos["size"] * 0.6
+            pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.6)
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(40%@5%)", now))
+            state["closed"].append(closed[-1])
+            return True
+        
+        # B. BREAKEVEN 鎖利層（SHORT）
+        if not pos.get("lock_3pct") and not tp2_hit and not pos.get("lock_5pct") and pnl_pct >= 3:
+            pos["lock_3pct"] = True
+            lock_usd = pos["size"] * 0.2 * pnl_pct / 100
+            state["capital"] += lock_usd
+            pos["size"] = pos["size"] * 0.8
+            pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.8)
+            closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(20%@3%)", now))
+            state["closed"].append(closed[-1])
+            return True
+        
+        if tp2_hit:
+            if trailing_sl > 0 and current_price >= trailing_sl:
+                exit_reason = "TRAIL"
+            else:
+                new_trail = current_price * 1.05
+                if trailing_sl == 0 or new_trail < trailing_sl:
+                    pos["trailing_sl"] = new_trail
+        elif current_price >= pos["sl"]:
+            if not pos.get("sl_half_hit"):
+                sl_pnl = pnl_pct
+                sl_usd = pos["size"] * 0.5 * sl_pnl / 100
+                state["capital"] += sl_usd
                 pos["size"] = pos["size"] * 0.5
+                pos["sl_half_hit"] = True
                 pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, cp_usd, "30min檢查(半倉)"))
-                state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            # A. 3h 中途檢查（SHORT）
-            if not pos.get("checkpoint_3h") and 3.0 <= hours_held <= 4.0 and not tp2_hit:
-                pos["checkpoint_3h"] = True
-                if pnl_pct < -3:
-                    exit_reason = "3h檢查(止損)"
-                elif pnl_pct >= 2:
-                    exit_reason = "3h檢查(鎖利)"
-            
-            # B. 中間鎖利層（SHORT）
-            if not pos.get("lock_5pct") and not tp2_hit and pnl_pct >= 5:
-                pos["lock_5pct"] = True
-                lock_usd = pos["size"] * 0.4 * pnl_pct / 100
-                state["capital"] += lock_usd
-                pos["size"] = pos["size"] * 0.6
-                pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.6)
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(40%@5%)"))
-                state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            # B. BREAKEVEN 鎖利層（SHORT）
-            if not pos.get("lock_3pct") and not tp2_hit and not pos.get("lock_5pct") and pnl_pct >= 3:
-                pos["lock_3pct"] = True
-                lock_usd = pos["size"] * 0.2 * pnl_pct / 100
-                state["capital"] += lock_usd
-                pos["size"] = pos["size"] * 0.8
-                pos["remaining_pct"] = int(pos.get("remaining_pct", 100) * 0.8)
-                closed.append(build_closed_record(pos, exit_price, pnl_pct, lock_usd, "鎖利(20%@3%)"))
-                state["closed"].append(closed[-1])
-                remaining.append(pos)
-                continue
-            
-            if tp2_hit:
-                if trailing_sl > 0 and current_price >= trailing_sl:
-                    exit_reason = "TRAIL"
-                else:
-                    new_trail = current_price * 1.05
-                    if trailing_sl == 0 or new_trail < trailing_sl:
-                        pos["trailing_sl"] = new_trail
-            elif current_price >= pos["sl"]:
-                if not pos.get("sl_half_hit"):
-                    sl_pnl = pnl_pct
-                    sl_usd = pos["size"] * 0.5 * sl_pnl / 100
-                    state["capital"] += sl_usd
-                    pos["size"] = pos["size"] * 0.5
-                    pos["sl_half_hit"] = True
-                    pos["remaining_pct"] = pos.get("remaining_pct", 100) // 2
-                    pos["sl"] = pos["entry_price"] * 1.1
-                    closed.append(build_closed_record(pos, exit_price, sl_pnl, sl_usd, "SL(半倉)"))
-                    state["closed"].append(closed[-1])
-                else:
-                    exit_reason = "SL(清倉)"
-            elif current_price <= pos["tp2"] and not tp2_hit:
-                pos["tp2_hit"] = True
-                pos["trailing_sl"] = current_price * 1.05
-                tp2_pnl = pnl_pct
-                tp2_usd = pos["size"] * 0.5 * tp2_pnl / 100
-                state["capital"] += tp2_usd
-                pos["size"] = pos["size"] * 0.5
-                pos["remaining_pct"] = 50
-                closed.append(build_closed_record(pos, exit_price, tp2_pnl, tp2_usd, "TP2(50%平)"))
+                pos["sl"] = pos["entry_price"] * 1.1
+                closed.append(build_closed_record(pos, exit_price, sl_pnl, sl_usd, "SL(半倉)", now))
                 state["closed"].append(closed[-1])
-            elif current_price <= pos["tp1"] and not pos.get("tp1_hit"):
-                pos["tp1_hit"] = True
-                pos["sl"] = pos["entry_price"]
+            else:
+                exit_reason = "SL(清倉)"
+        elif current_price <= pos["tp2"] and not tp2_hit:
+            pos["tp2_hit"] = True
+            pos["trailing_sl"] = current_price * 1.05
+            tp2_pnl = pnl_pct
+            tp2_usd = pos["size"] * 0.5 * tp2_pnl / 100
+            state["capital"] += tp2_usd
+            pos["size"] = pos["size"] * 0.5
+            pos["remaining_pct"] = 50
+            closed.append(build_closed_record(pos, exit_price, tp2_pnl, tp2_usd, "TP2(50%平)", now))
+            state["closed"].append(closed[-1])
+        elif current_price <= pos["tp1"] and not pos.get("tp1_hit"):
+            pos["tp1_hit"] = True
+            pos["sl"] = pos["entry_price"]
+    
+    # 全倉追蹤止盈 + 保本邏輯（未碰 TP2 的持倉）
+    if not tp2_hit and not exit_reason:
+        peak = pos.get("peak_pnl", 0)
+        if pnl_pct > peak:
+            pos["peak_pnl"] = pnl_pct
+            peak = pnl_pct
         
-        # 全倉追蹤止盈 + 保本邏輯（未碰 TP2 的持倉）
-        if not tp2_hit and not exit_reason:
-            peak = pos.get("peak_pnl", 0)
-            if pnl_pct > peak:
-                pos["peak_pnl"] = pnl_pct
-                peak = pnl_pct
-            
-            # 浮盈 >= 3% 啟動保本線
-            if peak >= 3 and not pos.get("breakeven_active"):
-                pos["breakeven_active"] = True
-            
-            # 浮盈 >= 5% 啟動全倉追蹤止盈（回撤 40% 出場）
-            if peak >= 5:
-                trail_exit_pnl = peak * 0.6  # 保留 60% 的最高浮盈
-                if pnl_pct <= trail_exit_pnl:
-                    exit_reason = "TRAIL_FULL"
-            
-            # 保本出場：曾浮盈 >= 3% 但跌回 0.5% 以下
-            if pos.get("breakeven_active") and pnl_pct <= 0.5 and not exit_reason:
-                exit_reason = "BREAKEVEN"
-            
-            # 時間到期
-            if hours_held >= CONFIG["time_exit_hours"] and not exit_reason:
-                exit_reason = "TIME"
+        # 浮盈 >= 3% 啟動保本線
+        if peak >= 3 and not pos.get("breakeven_active"):
+            pos["breakeven_active"] = True
         
-        if tp2_hit and hours_held >= CONFIG["time_exit_hours"] * 2 and not exit_reason:
-            exit_reason = "TIME(尾倉)"
+        # 浮盈 >= 5% 啟動全倉追蹤止盈（回撤 40% 出場）
+        if peak >= 5:
+            trail_exit_pnl = peak * 0.6  # 保留 60% 的最高浮盈
+            if pnl_pct <= trail_exit_pnl:
+                exit_reason = "TRAIL_FULL"
         
-        if exit_reason:
-            pnl_usd = pos["size"] * pnl_pct / 100
-            state["capital"] += pnl_usd
-            
-            trail_tag = f"(尾倉{remaining_pct}%)" if tp2_hit else ""
-            closed.append(build_closed_record(pos, exit_price, pnl_pct, pnl_usd, f"{exit_reason}{trail_tag}"))
-            
-            state["closed"].append(closed[-1])
+        # 保本出場：曾浮盈 >= 3% 但跌回 0.5% 以下
+        if pos.get("breakeven_active") and pnl_pct <= 0.5 and not exit_reason:
+            exit_reason = "BREAKEVEN"
+        
+        # 時間到期
+        if hours_held >= CONFIG["time_exit_hours"] and not exit_reason:
+            exit_reason = "TIME"
+    
+    if tp2_hit and hours_held >= CONFIG["time_exit_hours"] * 2 and not exit_reason:
+        exit_reason = "TIME(尾倉)"
+    
+    if exit_reason:
+        pnl_usd = pos["size"] * pnl_pct / 100
+        state["capital"] += pnl_usd
+        
+        trail_tag = f"(尾倉{remaining_pct}%)" if tp2_hit else ""
+        closed.append(build_closed_record(pos, exit_price, pnl_pct, pnl_usd, f"{exit_reason}{trail_tag}", now))
+        
+        state["closed"].append(closed[-1])
+        return False
+    return True
+
+# ─── 1m K 線路徑重播 ───
+# 兩次 cron 之間的價格用 1m K 線 O-L-H-C (陽線) / O-H-L-C 路徑重建，
+# 所有持倉的觸價條件一次用矩陣算出「下一個事件點」，只在事件點呼叫 evaluate_position，
+# 事件之間只有 peak_pnl / trailing_sl 這種累積量會變，直接用區段極值更新
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_PATH_OFFSETS_MS = np.array([0, 20000, 40000, 59999])  # O / 第一極值 / 第二極值 / C 在 K 線內的時間
+
+
+def _to_us(dt):
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _from_us(us, tz):
+    return (_EPOCH + timedelta(microseconds=int(us))).astimezone(tz)
+
+
+def _path_start_ms(pos):
+    """這個持倉還沒重播完的第一根 1m K 線開盤時間 (上次檢查時還沒收盤的那根要重抓)"""
+    if pos.get("last_check_us"):
+        return pos["last_check_us"] // 1000 // 60000 * 60000
+    if pos.get("last_check"):
+        return pos["last_check"]  # 舊欄位：上次未收盤那根的開盤時間
+    entry_us = _to_us(datetime.fromisoformat(pos["entry_time"]))
+    return -(-entry_us // 60000000) * 60000  # 進場後第一根完整 K 線
+
+
+def fetch_intrabar_klines(positions, now):
+    """每個幣抓一次 1m K 線 (涵蓋所有持倉的重播區間) → {symbol: klines}"""
+    now_ms = _to_us(now) // 1000
+    starts = {}
+    for pos in positions:
+        start = _path_start_ms(pos)
+        starts[pos["symbol"]] = min(start, starts.get(pos["symbol"], start))
+    if not starts:
+        return {}
+    
+    def fetch(symbol):
+        limit = min(PAPER_INTRABAR_MAX_BARS, max(1, (now_ms - starts[symbol]) // 60000 + 1))
+        try:
+            return symbol, get_klines(symbol, PAPER_INTRABAR_INTERVAL, limit)
+        except:
+            return symbol, []
+    
+    with ThreadPoolExecutor(max_workers=min(8, len(starts))) as pool:
+        return dict(pool.map(fetch, starts))
+
+
+def build_intrabar_path(klines, start_ms, end_us, after_us=None):
+    """
+    K 線 → 時間序列價格路徑 (times_us, prices)
+    只取開盤時間 >= start_ms 的 K 線；時間不超過 end_us
+    after_us: 上次已判斷到的時間，這個時間 (含) 以前的點丟掉，路徑不會倒退
+    """
+    bars = [k for k in klines if k["open_time"] >= start_ms]
+    if not bars:
+        return np.zeros(0, dtype=np.int64), np.zeros(0)
+    o = np.array([k["open"] for k in bars])
+    h = np.array([k["high"] for k in bars])
+    l = np.array([k["low"] for k in bars])
+    c = np.array([k["close"] for k in bars])
+    t = np.array([k["open_time"] for k in bars], dtype=np.int64)
+    green = c > o
+    prices = np.stack([o, np.where(green, l, h), np.where(green, h, l), c], axis=1).ravel()
+    times = np.minimum((t[:, None] + _PATH_OFFSETS_MS[None, :]).ravel() * 1000, end_us)
+    if after_us is not None:
+        keep = times > after_us
+        return times[keep], prices[keep]
+    return times, prices
+
+
+def _position_vectors(positions):
+    """持倉狀態 → 各欄一個向量"""
+    flag = lambda key: np.array([bool(p.get(key)) for p in positions])
+    num = lambda key, default=0: np.array([float(p.get(key, default) or 0) for p in positions])
+    return {
+        "long": np.array([p["direction"] == "LONG" for p in positions]),
+        "entry": num("entry_price"), "sl": num("sl"), "tp1": num("tp1"), "tp2": num("tp2"),
+        "peak": num("peak_pnl"), "trail": num("trailing_sl"),
+        "entry_us": np.array([_to_us(datetime.fromisoformat(p["entry_time"])) for p in positions]),
+        "cp30": flag("checkpoint_30m"), "cp3h": flag("checkpoint_3h"),
+        "lock5": flag("lock_5pct"), "lock3": flag("lock_3pct"),
+        "tp1_hit": flag("tp1_hit"), "tp2_hit": flag("tp2_hit"), "be": flag("breakeven_active"),
+    }
+
+
+def _next_events(positions, P, T, valid, cursor):
+    """
+    每個持倉從 cursor 起第一個「evaluate_position 可能改變離散狀態」的路徑點
+    (條件取 evaluate_position 的超集，多判到只是多呼叫一次)；沒有事件為 -1
+    """
+    v = _position_vectors(positions)
+    col = np.arange(P.shape[1])[None, :]
+    active = valid & (col >= cursor[:, None])
+    long = v["long"][:, None]
+    entry = v["entry"][:, None]
+    with np.errstate(invalid="ignore"):
+        pnl = np.where(long, (P - entry) / entry * 100, (entry - P) / entry * 100)
+        hours = ((T - v["entry_us"][:, None]).astype(float) / 1e6) / 3600
+        
+        # 累積量: 未碰 TP2 的 peak_pnl、碰 TP2 後的 trailing_sl (各點判斷時用的是前一點為止的值)
+        peak = np.maximum(v["peak"][:, None],
+                          np.maximum.accumulate(np.where(active, pnl, -np.inf), axis=1))
+        trail_up = np.maximum.accumulate(np.where(active, P * 0.95, -np.inf), axis=1)
+        trail_dn = np.minimum.accumulate(np.where(active, P * 1.05, np.inf), axis=1)
+        trail_up = np.concatenate([np.full((len(P), 1), -np.inf), trail_up[:, :-1]], axis=1)
+        trail_dn = np.concatenate([np.full((len(P), 1), np.inf), trail_dn[:, :-1]], axis=1)
+        trail0 = v["trail"][:, None]
+        trail_long = np.maximum(trail0, trail_up)
+        trail_short = np.where(trail0 > 0, np.minimum(trail0, trail_dn), trail_dn)
+        trail_exit = np.where(long, (trail_long > 0) & (P <= trail_long),
+                              np.isfinite(trail_short) & (trail_short > 0) & (P >= trail_short))
+        
+        time_exit = CONFIG["time_exit_hours"]
+        no_tp2 = ~v["tp2_hit"][:, None]
+        cp30 = ~v["cp30"][:, None] & (hours >= 0.5) & (hours <= 1.0) & (pnl < -3)
+        cp3h = no_tp2 & ~v["cp3h"][:, None] & (hours >= 3.0) & (hours <= 4.0)
+        lock5, lock3 = v["lock5"][:, None], v["lock3"][:, None]
+        locks = no_tp2 & ((~lock5 & (pnl >= 5)) | (~lock3 & ~lock5 & (pnl >= 3)))
+        sl, tp1, tp2 = v["sl"][:, None], v["tp1"][:, None], v["tp2"][:, None]
+        levels = no_tp2 & (np.where(long, P <= sl, P >= sl) | np.where(long, P >= tp2, P <= tp2)
+                           | (~v["tp1_hit"][:, None] & np.where(long, P >= tp1, P <= tp1)))
+        be = v["be"][:, None]
+        guards = no_tp2 & ((~be & (peak >= 3)) | ((peak >= 5) & (pnl <= peak * 0.6))
+                           | (be & (pnl <= 0.5)) | (hours >= time_exit))
+        tail = ~no_tp2 & (trail_exit | (hours >= time_exit * 2))
+        event = active & (cp30 | cp3h | locks | levels | guards | tail)
+    return np.where(event.any(axis=1), event.argmax(axis=1), -1)
+
+
+def _advance(pos, prices):
+    """事件之間 (不會出場的點) 的累積量更新：peak_pnl 或 trailing_sl"""
+    if len(prices) == 0:
+        return
+    entry = pos["entry_price"]
+    if pos.get("tp2_hit", False):
+        trailing_sl = pos.get("trailing_sl", 0)
+        if pos["direction"] == "LONG":
+            new_trail = float((prices * 0.95).max())
+            if new_trail > trailing_sl:
+                pos["trailing_sl"] = new_trail
+        else:
+            new_trail = float((prices * 1.05).min())
+            if trailing_sl == 0 or new_trail < trailing_sl:
+                pos["trailing_sl"] = new_trail
+        return
+    if pos["direction"] == "LONG":
+        pnl = float(((prices - entry) / entry * 100).max())
+    else:
+        pnl = float(((entry - prices) / entry * 100).max())
+    if pnl > pos.get("peak_pnl", 0):
+        pos["peak_pnl"] = pnl
+
+
+def evaluate_intrabar(state, paths, closed, tz):
+    """
+    paths: [(pos, times_us, prices)]，依時間順序重播
+    全部持倉的事件點一起算，每次處理時間最早的一個事件 → 平倉紀錄依時間排序
+    Returns: {id(pos): 是否仍持倉}
+    """
+    if not paths:
+        return {}
+    positions = [p for p, _, _ in paths]
+    width = max(len(prices) for _, _, prices in paths)
+    P = np.full((len(paths), width), np.nan)
+    T = np.zeros((len(paths), width), dtype=np.int64)
+    valid = np.zeros((len(paths), width), dtype=bool)
+    for r, (_, times, prices) in enumerate(paths):
+        P[r, :len(prices)] = prices
+        T[r, :len(times)] = times
+        valid[r, :len(prices)] = True
+    
+    cursor = np.zeros(len(paths), dtype=int)
+    open_ = np.ones(len(paths), dtype=bool)
+    events = _next_events(positions, P, T, valid, cursor)
+    while True:
+        pending = np.flatnonzero(open_ & (events >= 0))
+        if len(pending) == 0:
+            break
+        r = pending[np.argmin(T[pending, events[pending]])]
+        e = events[r]
+        pos = positions[r]
+        _advance(pos, P[r, cursor[r]:e])
+        cursor[r] = e + 1
+        if not evaluate_position(state, pos, float(P[r, e]), _from_us(T[r, e], tz), closed):
+            open_[r] = False
+            continue
+        c = cursor[r]  # 只重算這一列 cursor 之後
+        nxt = _next_events([pos], P[r:r + 1, c:], T[r:r + 1, c:], valid[r:r + 1, c:], np.zeros(1, dtype=int))[0]
+        events[r] = nxt + c if nxt >= 0 else -1
+    
+    for r in np.flatnonzero(open_):
+        n = int(valid[r].sum())
+        _advance(positions[r], P[r, cursor[r]:n])
+    return {id(pos): bool(open_[r]) for r, pos in enumerate(positions)}
+
+
+def check_positions(state):
+    """
+    持倉檢查：從上次檢查起的 1m K 線路徑 + 目前價格依序重播
+    抓不到 K 線的持倉退回只用目前價格判斷
+    """
+    now = now_tw()
+    now_us = _to_us(now)
+    
+    closed = []
+    prices = get_prices([pos["symbol"] for pos in state["positions"]])
+    klines_map = fetch_intrabar_klines(state["positions"], now)
+    
+    paths = []
+    keep = {}
+    for pos in state["positions"]:
+        symbol = pos["symbol"]
+        quote = prices.get(symbol)
+        current_price = quote["price"] if quote else None
+        if quote and quote["stale"]:
+            print(f"⚠️ {symbol} 價格過舊 ({quote['age']:.0f}s，ticker 也抓不到)，仍用最後成交價判斷出場")
+        
+        klines = klines_map.get(symbol) or []
+        times, path = build_intrabar_path(klines, _path_start_ms(pos), now_us, pos.get("last_check_us"))
+        if current_price:
+            times = np.append(times, now_us)
+            path = np.append(path, current_price)
+        if klines:
+            pos["last_check_us"] = now_us  # 已判斷到的時間；未收盤那根下次重抓，只取這之後的點
+            pos.pop("last_check", None)
+        
+        if len(path):
+            paths.append((pos, times, path))
         else:
-            remaining.append(pos)
+            keep[id(pos)] = True
     
-    state["positions"] = remaining
+    keep.update(evaluate_intrabar(state, paths, closed, now.tzinfo))
+    state["positions"] = [pos for pos in state["positions"] if keep[id(pos)]]
     save_state(state)
     
     return closed
 
-def get_summary(state):
+def get_summary(state, prices=None):
     closed = state["closed"]
     positions = state.get("positions", [])
+    if prices is None:
+        prices = get_prices([p["symbol"] for p in positions])
     
     wins = [t for t in closed if t["pnl_pct"] > 0]
     losses = [t for t in closed if t["pnl_pct"] <= 0]
@@ -515,7 +735,7 @@ def get_summary(state):
     
     unrealized_pnl = 0
     for p in positions:
-        current = get_price(p["symbol"])
+        current = prices[p["symbol"]]["price"] if p["symbol"] in prices else None
         if current:
             if p["direction"] == "LONG":
                 pnl = (current - p["entry_price"]) / p["entry_price"] * 100
@@ -539,8 +759,7 @@ def get_summary(state):
     }
 
 def format_trade_msg(action, data):
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz).strftime("%m/%d %H:%M")
+    now = now_tw().strftime("%m/%d %H:%M")
     
     if action == "OPEN":
         pos, reason = data
@@ -598,8 +817,7 @@ def format_trade_msg(action, data):
 
 def format_main_brief(action, data):
     """主頻道精簡版通知（僅開/平倉）"""
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz).strftime("%H:%M")
+    now = now_tw().strftime("%H:%M")
     ping = f"<@{DISCORD_PING_USER_ID}> " if DISCORD_PING_USER_ID else ""
     if action == "OPEN":
         pos, _ = data
@@ -670,15 +888,48 @@ def send_discord(msg, pin=False):
             pass
 
 def process_signal(symbol, signal, price, phase, rsi, strength_score=0, strength_grade="", vol_ratio=1):
-    state = load_state()
+    """單一信號 (等同只有一個 alert 的 process_signals)"""
+    alert = {"symbol": symbol, "signal": signal, "price": price, "phase": phase, "rsi": rsi,
+             "strength_score": strength_score, "strength_grade": strength_grade, "1h_vol_ratio": vol_ratio}
+    results = process_signals([alert])
+    return results[0][1:] if results else (False, "非 LONG/SHORT 信號")
+
+def signal_priority(alert):
+    """同一輪信號的開倉順序：strength_score 高→低，同分依 symbol"""
+    return (-alert.get("strength_score", 0), alert["symbol"])
+
+def process_signals(alerts):
+    """
+    批次處理 oi_scanner 的 alert：讀一次 state、資金費率 (premiumIndex) 和 BTC 環境一次預抓，
+    依 strength_score 高→低 (同分依 symbol) 開倉 (先到先佔 max_positions)，最後只存一次
+    Returns: [(symbol, 是否開倉, reason)]，依處理順序
+    """
+    candidates = sorted((a for a in alerts if a["signal"] in ("LONG", "SHORT")), key=signal_priority)
+    if not candidates:
+        return []
     
-    pos, reason = open_position(state, symbol, signal, price, phase, rsi, strength_grade, vol_ratio)
+    state = load_state()
+    rates = get_funding_rates([a["symbol"] for a in candidates])
+    btc_ctx = get_btc_context()
     
-    if pos:
-        pos["strength_score"] = strength_score
-        pos["strength_grade"] = strength_grade
-        pos["vol_ratio"] = vol_ratio
+    results, opened = [], []
+    for a in candidates:
+        vol_ratio = a.get("1h_vol_ratio", 1)
+        pos, reason = open_position(state, a["symbol"], a["signal"], a["price"], a.get("phase", ""),
+                                    a.get("rsi", 50), a.get("strength_grade", ""), vol_ratio,
+                                    funding_rate=rates.get(a["symbol"]), btc_ctx=btc_ctx)
+        if pos:
+            pos["strength_score"] = a.get("strength_score", 0)
+            pos["strength_grade"] = a.get("strength_grade", "")
+            pos["vol_ratio"] = vol_ratio
+            opened.append((pos, reason))
+        else:
+            print(f"⏭️ {a['symbol']}: {reason}")
+        results.append((a["symbol"], pos is not None, reason))
+    if opened:
         save_state(state)
+    
+    for pos, reason in opened:
         msg = format_trade_msg("OPEN", (pos, reason))
         print(msg)
         send_discord(msg, pin=True)
@@ -686,10 +937,7 @@ def process_signal(symbol, signal, price, phase, rsi, strength_score=0, strength
         brief = format_main_brief("OPEN", (pos, reason))
         if brief:
             send_main_discord(brief, pin=True)
-        return True, reason
-    else:
-        print(f"⏭️ {symbol}: {reason}")
-        return False, reason
+    return results
 
 def check_and_close():
     state = load_state()
@@ -707,19 +955,20 @@ def check_and_close():
     return closed
 
 def show_status():
-    state = load_state()
+    state = load_state(full=True)
     
-    tw_tz = timezone(timedelta(hours=8))
-    now = datetime.now(tw_tz).strftime("%m/%d %H:%M")
+    now = now_tw().strftime("%m/%d %H:%M")
     
-    summary = get_summary(state)
+    prices = get_prices([p["symbol"] for p in state["positions"]])
+    summary = get_summary(state, prices)
     lines = [format_trade_msg("SUMMARY", summary)]
     
     if state["positions"]:
         lines.append("")
         lines.append("**持倉明細：**")
         for p in state["positions"]:
-            current = get_price(p["symbol"])
+            quote = prices.get(p["symbol"])
+            current = quote["price"] if quote else None
             if current:
                 if p["direction"] == "LONG":
                     pnl = (current - p["entry_price"]) / p["entry_price"] * 100
@@ -728,7 +977,8 @@ def show_status():
                 emoji = "📈" if pnl > 0 else "📉"
                 pnl_usd = p["size"] * pnl / 100
                 dir_emoji = "🟢" if p["direction"] == "LONG" else "🔴"
-                lines.append(f"• {dir_emoji} {p['symbol']} {p['direction']}: ${p['entry_price']:.4g} → ${current:.4g} ({pnl:+.1f}% ${pnl_usd:+.1f}) {emoji}")
+                stale = f" ⚠️價格{quote['age']:.0f}s前" if quote["stale"] else ""
+                lines.append(f"• {dir_emoji} {p['symbol']} {p['direction']}: ${p['entry_price']:.4g} → ${current:.4g} ({pnl:+.1f}% ${pnl_usd:+.1f}) {emoji}{stale}")
     
     if state["closed"]:
         lines.append("")
@@ -10,42 +10,55 @@ from datetime import datetime
 from config import (
     POSITIONS,
     POSITION_ALERT_LEVELS,
+    ADVISOR_OB_ENGINE_STATE_FILE,
     TW_TIMEZONE,
     DISCORD_THREAD_ADVISOR
 )
-from exchange_api import get_price, get_klines
+from exchange_api import get_price, get_klines, get_klines_multi
 from notify import send_discord_message
-from ob_engine import find_order_blocks_v2, filter_and_rank_obs, score_ob
+from indicators import rsi as calc_rsi_value
+from indicator_cache import closed_rsi
+from ob_engine import (
+    find_order_blocks_v2, filter_and_rank_obs, score_ob,
+    load_ob_engines, save_ob_engines, get_ob_engine
+)
+
+
+# 1H RSI 走跨腳本快取 (已收盤 K 線，整根 K 線內不變)
+RSI_1H_PARAMS = {"period": 14, "method": "sma_first", "zero_loss": "floor", "bars": 100}
 
 
 def calc_rsi(klines):
     """計算 RSI"""
     if len(klines) < 15:
         return 50
-    closes = [k["close"] for k in klines]
-    gains, losses = [], []
-    for i in range(1, min(15, len(closes))):
-        diff = closes[i] - closes[i-1]
-        gains.append(diff if diff > 0 else 0)
-        losses.append(-diff if diff < 0 else 0)
-    avg_gain = sum(gains) / len(gains)
-    avg_loss = sum(losses) / len(losses) if sum(losses) > 0 else 0.001
-    return 100 - (100 / (1 + avg_gain / avg_loss))
+    return calc_rsi_value([k["close"] for k in klines], 14, method="sma_first", zero_loss="floor")
 
 
-def analyze_levels(symbol):
-    """分析多時間週期的支撐/壓力 (V3: mitigation + swing靈敏度)"""
+def analyze_levels(symbol, engines=None):
+    """
+    分析多時間週期的支撐/壓力 (V3: mitigation + swing靈敏度)
+    engines: {key: IncrementalOBEngine}，有給就用增量 OB 引擎
+    """
     result = {}
+    # 1h 抓一次本地合成 4h；1D 需 2400 根 1h 超過單次上限，維持直接抓
+    tf_klines = get_klines_multi(symbol, "1h", {"1h": ("1h", 100), "4h": ("4h", 100)})
+    tf_klines["1d"] = get_klines(symbol, "1D", 100)
     for interval, label, swing in [("1h","1H",2), ("4h","4H",3), ("1d","1D",3)]:
-        klines = get_klines(symbol, interval if "h" in interval else "1D", 100)
+        klines = tf_klines[interval]
         if not klines:
             continue
         
         current = klines[-1]["close"]
-        rsi = calc_rsi(klines)
+        rsi = calc_rsi(klines) if interval != "1h" else closed_rsi(symbol, "1h", klines, RSI_1H_PARAMS)
+        if rsi is None:
+            rsi = 50
         
         # V2 OB 偵測
-        raw_obs = find_order_blocks_v2(klines, swing)
+        if engines is not None:
+            raw_obs = get_ob_engine(engines, symbol, label, swing).update(klines)
+        else:
+            raw_obs = find_order_blocks_v2(klines, swing)
         bull_obs, bear_obs = filter_and_rank_obs(raw_obs, current, tf=label, max_distance_pct=5.0)
         
         recent = klines[-24:] if len(klines) >= 24 else klines
@@ -285,13 +298,15 @@ def main():
     
     # 分析每個倉位
     results = []
+    engines = load_ob_engines(ADVISOR_OB_ENGINE_STATE_FILE)
     for pos in POSITIONS:
         price = prices.get(pos["symbol"], 0)
         if price > 0:
             print(f"分析 {pos['name']}...")
-            levels = analyze_levels(pos["symbol"])
+            levels = analyze_levels(pos["symbol"], engines)
             result = get_action_advice(pos, price, levels)
             results.append(result)
+    save_ob_engines(ADVISOR_OB_ENGINE_STATE_FILE, engines)
     
     # 智能通知: 共用 monitor 的 notify_state，波動 >2% 即時，否則 30 分鐘
     import json as _json
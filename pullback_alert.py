@@ -16,6 +16,7 @@ from config import (
 CHANNEL_ID = DISCORD_THREAD_TECH
 from exchange_api import get_klines
 from notify import send_discord_message
+from indicators import rsi as calc_rsi_value, atr
 
 
 
@@ -75,25 +76,15 @@ def send_discord(message, pin=False):
 
 def calc_atr(candles, period=14):
     """計算 ATR"""
-    trs = []
-    for i in range(1, min(period+1, len(candles))):
-        h, l, pc = candles[i]["h"], candles[i]["l"], candles[i-1]["c"]
-        trs.append(max(h-l, abs(h-pc), abs(l-pc)))
-    return sum(trs)/len(trs) if trs else 0
+    if len(candles) < 2:
+        return 0
+    return atr([c["h"] for c in candles], [c["l"] for c in candles], [c["c"] for c in candles],
+               period, method="sma_first")
 
 
 def calc_rsi(closes, period=14):
     """計算 RSI"""
-    gains, losses = [], []
-    for i in range(1, min(period+1, len(closes))):
-        d = closes[i] - closes[i-1]
-        gains.append(d if d > 0 else 0)
-        losses.append(-d if d < 0 else 0)
-    ag = sum(gains)/len(gains) if gains else 0
-    al = sum(losses)/len(losses) if losses else 0.001
-    if al == 0:
-        return 100
-    return 100-(100/(1+ag/al))
+    return calc_rsi_value(closes, period, method="sma_first", zero_loss="max")
 
 
 def check_1h_structure(symbol):